@@ -1,19 +1,289 @@
 import sqlite3
-from sqlmodel import create_engine, Session
-from sqlalchemy import event, Engine
-from dotenv import load_dotenv
-import logging
+import itertools
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Iterator, List, Optional
+from fastapi import Request, Response
+from sqlmodel import create_engine, Session
+from sqlalchemy import event, Engine, URL, make_url
+from sqlalchemy.engine.interfaces import CacheStats
+from sqlalchemy.exc import DisconnectionError, IntegrityError, OperationalError
+from services.metrics import registry
+from settings import Settings
+
+# o engine só é criado no primeiro uso (get_engine), nada conecta no import
+_settings: Optional[Settings] = None
+_engine: Optional[Engine] = None
+# pool de conexões somente leitura do perfil "performance" do SQLite
+_read_engine: Optional[Engine] = None
+_engine_lock = threading.Lock()
+replica_router: Optional["ReplicaRouter"] = None
+
+# depois de uma escrita, o cliente lê do primário por alguns segundos (read-your-writes)
+READ_PRIMARY_COOKIE = "tcg_read_primary_until"
+READ_PRIMARY_HEADER = "X-Read-Primary"
+
+
+class ReplicaRouter:
+    """Chooses the engine for read-only sessions among the configured replicas.
+
+    Replicas that fail to connect are skipped for ``cooldown`` seconds; with no
+    healthy replica, reads go to the primary. ``RoutingSession`` connects when it
+    picks the engine, so a dead replica is skipped before the request's first
+    query runs on it.
+    """
+
+    def __init__(
+        self,
+        primary: Engine,
+        replica_urls: List[str],
+        strategy: str = "round_robin",
+        cooldown: float = 30.0,
+        **engine_kwargs,
+    ):
+        self.primary = primary
+        self.replicas = [create_engine(url, pool_pre_ping=True, **engine_kwargs) for url in replica_urls]
+        self.strategy = strategy
+        self.cooldown = cooldown
+        self._unhealthy_until = {}
+        self._lock = threading.Lock()
+        self._round_robin = itertools.count()
+
+        self._replica_reads = registry.counter("db_replica_reads_total", "Read-only sessions bound to a replica")
+        self._primary_reads = registry.counter("db_primary_reads_total", "Read-only sessions bound to the primary")
+        self._failures = registry.counter("db_replica_failures_total", "Replica errors that started a cooldown")
+        registry.gauge("db_replicas_healthy", "Replicas currently accepting reads", fn=lambda: len(self.healthy_replicas()))
+
+        for replica in self.replicas:
+            event.listen(replica, "handle_error", self._on_error)
+
+    def _on_error(self, context) -> None:
+        if context.is_disconnect or isinstance(context.sqlalchemy_exception, (OperationalError, DisconnectionError)):
+            self.mark_unhealthy(context.engine)
+
+    def mark_unhealthy(self, replica: Engine) -> None:
+        with self._lock:
+            # o erro de conexão pode chegar aqui pelo handle_error e pelo RoutingSession
+            if self._unhealthy_until.get(replica, 0) > time.monotonic():
+                return
+            self._unhealthy_until[replica] = time.monotonic() + self.cooldown
+        self._failures.inc()
+
+    def healthy_replicas(self) -> List[Engine]:
+        now = time.monotonic()
+        return [r for r in self.replicas if self._unhealthy_until.get(r, 0) <= now]
+
+    def read_engine(self) -> Engine:
+        healthy = self.healthy_replicas()
+        if not healthy:
+            self._primary_reads.inc()
+            return self.primary
+
+        self._replica_reads.inc()
+        if self.strategy == "least_loaded":
+            return min(healthy, key=lambda r: r.pool.checkedout())
+        return healthy[next(self._round_robin) % len(healthy)]
+
+
+def configure(settings: Settings) -> None:
+    """Use ``settings`` for the engines created from now on, dropping the current ones"""
+    global _settings
+    dispose()
+    _settings = settings
+
+
+def get_settings() -> Settings:
+    global _settings
+    if _settings is None:
+        _settings = Settings.from_env()
+    return _settings
+
+
+def _sqlite_performance_engines(url: URL, settings: Settings):
+    """Single writer connection plus a pool of read-only connections, both in WAL mode.
+
+    All writes queue for the one writer connection (pool_size=1), so SQLite
+    never sees two writers fighting over the lock; readers never block on it.
+    """
+    common = {
+        "mmap_size": settings.sqlite_mmap_size,
+        "cache_size": settings.sqlite_cache_size,
+        "busy_timeout": settings.sqlite_busy_timeout_ms,
+        "temp_store": "MEMORY",
+    }
+    writer = create_engine(
+        url,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=settings.sqlite_write_queue_timeout,
+        query_cache_size=settings.db_query_cache_size,
+    )
+    event.listen(writer, "connect", partial(_apply_pragmas, pragmas={"journal_mode": "WAL", "synchronous": "NORMAL", **common}))
+
+    # o WAL fica gravado no arquivo; conecta o writer antes para os leitores já abrirem em WAL
+    with writer.connect():
+        pass
+
+    path = os.path.abspath(url.database)
+    reader = create_engine(
+        url.set(database=f"file:{path}", query={"mode": "ro", "uri": "true"}),
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        query_cache_size=settings.db_query_cache_size,
+    )
+    event.listen(reader, "connect", partial(_apply_pragmas, pragmas=common))
+    return writer, reader
+
+
+def _apply_pragmas(dbapi_connection, connection_record, pragmas: dict) -> None:
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def get_engine() -> Engine:
+    global _engine, _read_engine, replica_router
+    if _engine is not None:
+        return _engine
 
-load_dotenv()
+    with _engine_lock:
+        if _engine is None:
+            settings = get_settings()
+            if not settings.database_url:
+                raise RuntimeError("DATABASE_URL não está configurada")
 
-logging.basicConfig()
-logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO)
+            url = make_url(settings.database_url)
+            sqlite_memory = url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+            engine_kwargs = {"query_cache_size": settings.db_query_cache_size}
+            if not sqlite_memory:
+                engine_kwargs.update(pool_size=settings.db_pool_size, max_overflow=settings.db_max_overflow)
 
-engine = create_engine(os.getenv("DATABASE_URL"))
+            if url.get_backend_name() == "sqlite" and not sqlite_memory and settings.sqlite_profile == "performance":
+                engine, _read_engine = _sqlite_performance_engines(url, settings)
+            else:
+                engine = create_engine(settings.database_url, **engine_kwargs)
+            if settings.database_replica_urls:
+                replica_router = ReplicaRouter(
+                    engine,
+                    settings.database_replica_urls,
+                    strategy=settings.database_replica_strategy,
+                    cooldown=settings.database_replica_cooldown,
+                    **engine_kwargs,
+                )
+            _engine = engine
+    return _engine
 
-def get_session() -> Session:
-    return Session(engine)
+
+def __getattr__(name: str):
+    # compatibilidade com `from database import engine`
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(name)
+
+
+def prewarm(connections: int) -> int:
+    """Open up to ``connections`` pooled connections (per engine) so the first requests find them ready"""
+    engines = [get_engine()] + ([_read_engine] if _read_engine else []) + (replica_router.replicas if replica_router else [])
+    opened = 0
+    for target in engines:
+        count = min(connections, target.pool.size()) if hasattr(target.pool, "size") else connections
+        if count <= 0:
+            continue
+
+        def open_connection(_):
+            conn = target.connect()
+            conn.exec_driver_sql("SELECT 1")
+            return conn
+
+        # abre em paralelo: com Postgres remoto cada conexão paga TLS + autenticação
+        with ThreadPoolExecutor(max_workers=count) as executor:
+            conns = list(executor.map(open_connection, range(count)))
+        for conn in conns:
+            conn.close()
+        opened += len(conns)
+    return opened
+
+
+def dispose() -> None:
+    global _engine, _read_engine, replica_router
+    with _engine_lock:
+        if replica_router is not None:
+            for replica in replica_router.replicas:
+                replica.dispose()
+        for engine in (_engine, _read_engine):
+            if engine is not None:
+                engine.dispose()
+        _engine, _read_engine, replica_router = None, None, None
+
+
+class RoutingSession(Session):
+    """Session that sends read-only work to a replica (or the SQLite read pool) and everything else to the primary"""
+
+    def __init__(self, *args, read_only: bool = False, **kwargs):
+        super().__init__(get_engine(), *args, **kwargs)
+        self.info["read_only"] = read_only
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if not self.info["read_only"]:
+            return get_engine()
+        if replica_router is None:
+            return _read_engine or get_engine()
+        # uma sessão fica no mesmo banco do começo ao fim
+        if "read_bind" not in self.info:
+            self.info["read_bind"] = self._connect_for_read()
+        return self.info["read_bind"]
+
+    def _connect_for_read(self) -> Engine:
+        # conecta já na escolha (com pre-ping): réplica fora do ar entra em cooldown
+        # e a leitura vai para a próxima ou para o primário, sem o cliente ver o erro
+        while True:
+            engine = replica_router.read_engine()
+            try:
+                self.connection(bind_arguments={"bind": engine})
+                return engine
+            except (OperationalError, DisconnectionError):
+                if engine is replica_router.primary:
+                    raise
+                replica_router.mark_unhealthy(engine)
+
+
+def _reads_from_primary(request: Request) -> bool:
+    if request.headers.get(READ_PRIMARY_HEADER):
+        return True
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def get_session(request: Request, response: Response) -> Iterator[Session]:
+    # logo após uma escrita do cliente: réplicas e cópias em memória (ex.: colunas do catálogo) podem estar atrasadas
+    fresh_reads = _reads_from_primary(request)
+    # sem réplicas, o pool de leitura do SQLite já enxerga tudo que foi commitado
+    read_only = request.method in ("GET", "HEAD") and not (fresh_reads and replica_router is not None)
+
+    if request.method not in ("GET", "HEAD", "OPTIONS"):
+        sticky = get_settings().read_your_writes_seconds
+        response.set_cookie(READ_PRIMARY_COOKIE, str(time.time() + sticky), max_age=int(sticky) + 1)
+
+    with RoutingSession(read_only=read_only) as session:
+        session.info["fresh_reads"] = fresh_reads
+        yield session
+
+
+def violated_constraint(error: IntegrityError) -> Optional[str]:
+    """``"unique"`` or ``"foreign_key"`` for the constraint behind an IntegrityError (SQLite or Postgres)"""
+    code = getattr(error.orig, "sqlstate", None) or getattr(error.orig, "pgcode", None)
+    message = str(error.orig)
+    if code == "23505" or message.startswith("UNIQUE constraint failed"):
+        return "unique"
+    if code == "23503" or message.startswith("FOREIGN KEY constraint failed"):
+        return "foreign_key"
+    return None
 
 
 @event.listens_for(Engine, "connect")
@@ -22,3 +292,36 @@ def set_sqlite_pragma(dbapi_connection, connection_record):
         cursor = dbapi_connection.cursor()
         cursor.execute("PRAGMA foreign_keys=ON")
         cursor.close()
+
+
+# quantas execuções reaproveitaram o SQL compilado; hit ratio baixo indica
+# consultas montadas de um jeito que muda a cache key a cada requisição
+_cache_hits = registry.counter("sql_compiled_cache_hits_total", "Executions that reused cached compiled SQL")
+_cache_misses = registry.counter("sql_compiled_cache_misses_total", "Executions that compiled and cached new SQL")
+_cache_bypassed = registry.counter(
+    "sql_compiled_cache_bypassed_total", "Executions that cannot use the cache (raw SQL, no cache key or cache disabled)"
+)
+
+
+def _cache_hit_ratio() -> float:
+    cached = _cache_hits.value + _cache_misses.value
+    return _cache_hits.value / cached if cached else 0.0
+
+
+registry.gauge("sql_compiled_cache_hit_ratio", "Cache hits over cacheable executions", fn=_cache_hit_ratio)
+registry.gauge(
+    "sql_compiled_cache_entries",
+    "Compiled statements cached by the primary engine",
+    fn=lambda: len(_engine._compiled_cache) if _engine is not None and _engine._compiled_cache is not None else 0,
+)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_compiled_cache(conn, cursor, statement, parameters, context, executemany):
+    outcome = getattr(context, "cache_hit", None)
+    if outcome is CacheStats.CACHE_HIT:
+        _cache_hits.inc()
+    elif outcome is CacheStats.CACHE_MISS:
+        _cache_misses.inc()
+    else:
+        _cache_bypassed.inc()
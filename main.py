@@ -1,13 +1,153 @@
+import logging
+from contextlib import asynccontextmanager
+from typing import Optional
 from fastapi import FastAPI
-from routes import decks, users, cards, collections
+from starlette.concurrency import run_in_threadpool
+import database
+from routes import decks, users, cards, collections, metrics, catalog, changes, jobs, profiles
+from services.admission import (
+    AdmissionControlMiddleware, ConcurrencyGate, RateLimiter, RouteGroup, client_key, configure_threadpool, header_key,
+    runs_in_threadpool,
+)
+from services.autocomplete import autocomplete_index
+from services.card_columns import card_columns
+from services.catalog_snapshot import snapshot_store
+from services.coalescing import stats_cache, user_summary_cache
+from services.jobs import job_runner
+from services.popularity import popularity
+from services.profiling import ProfilingMiddleware, instrument_routes, profile_store
+from services.security import hashing_pool
+from services.simulator import simulation_cache, simulation_pool
+from services.write_batcher import write_batcher
+from settings import Settings
 
-app = FastAPI()
 
-@app.get("/")
-def read_root():
-    return {"message": "Tcg API is running"}
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    """Build the API; no database connection is opened until startup"""
+    settings = settings or Settings.from_env()
+    database.configure(settings)
+    hashing_pool.configure(settings.hash_pool_workers, settings.hash_pool_max_queue)
+    simulation_pool.configure(settings.simulation_pool_workers, settings.simulation_pool_max_queue)
+    simulation_cache.max_entries = settings.simulation_cache_size
+    snapshot_store.debounce = settings.catalog_snapshot_debounce
+    snapshot_store.directory = settings.catalog_snapshot_dir or None
+    stats_cache.ttl = settings.stats_cache_ttl
+    stats_cache.stale_ttl = settings.stats_cache_stale_ttl
+    user_summary_cache.ttl = settings.user_summary_cache_ttl
+    user_summary_cache.max_entries = settings.user_summary_cache_max_entries
+    job_runner.workers = settings.job_workers
+    job_runner.max_pending = settings.job_max_pending
+    job_runner.drain_timeout = settings.job_drain_timeout
+    job_runner.lease_seconds = settings.job_lease_seconds
+    job_runner.interrupt_timeout = settings.job_interrupt_timeout
+    write_batcher.enabled = settings.write_batching
+    write_batcher.window = settings.write_batch_window_ms / 1000
+    write_batcher.max_batch = max(settings.write_batch_max_ops, 1)
+    autocomplete_index.max_entries = settings.autocomplete_max_entries
+    autocomplete_index.reload_interval = settings.autocomplete_reload_seconds
+    popularity.top_k = settings.popularity_top_k
+    popularity.resync_interval = settings.popularity_resync_seconds
+    popularity.refresh_interval = settings.popularity_refresh_seconds
+    card_columns.debounce = settings.card_columns_debounce
+    card_columns.directory = settings.card_columns_dir or None
+    card_columns.check_interval = settings.card_columns_check_seconds
 
-app.include_router(decks.router)
-app.include_router(users.router)
-app.include_router(cards.router)
-app.include_router(collections.router)
+    if settings.sql_echo:
+        logging.basicConfig()
+        logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        configure_threadpool(settings.worker_threads)
+        # abre as conexões antes de aceitar tráfego, para as primeiras requisições não pagarem o connect
+        await run_in_threadpool(database.prewarm, settings.db_prewarm_connections)
+        snapshot_store.start()
+        card_columns.start()
+        autocomplete_index.start()
+        popularity.start()
+        job_runner.start()
+        yield
+        await run_in_threadpool(job_runner.stop)
+        await run_in_threadpool(write_batcher.stop)
+        snapshot_store.stop()
+        card_columns.stop()
+        autocomplete_index.stop()
+        popularity.stop()
+        hashing_pool.shutdown()
+        simulation_pool.shutdown()
+        database.dispose()
+
+    app = FastAPI(lifespan=lifespan)
+
+    # rotas pesadas (GROUP BY e ilike) têm um limite próprio de concorrência,
+    # para não esgotarem o pool do banco e o threadpool das rotas simples
+    app.add_middleware(
+        AdmissionControlMiddleware,
+        rate_limiter=(
+            RateLimiter(settings.rate_limit_per_second, settings.rate_limit_burst)
+            if settings.rate_limit_per_second > 0 else None
+        ),
+        groups=[
+            RouteGroup(
+                ConcurrencyGate(
+                    "stats",
+                    limit=settings.stats_max_concurrency,
+                    max_queue=settings.stats_max_queue,
+                    timeout=settings.stats_queue_timeout,
+                ),
+                ("/cards/stats/", "/decks/stats/", "/decks/average-cards-per-deck"),
+            ),
+            RouteGroup(
+                ConcurrencyGate(
+                    "search",
+                    limit=settings.search_max_concurrency,
+                    max_queue=settings.search_max_queue,
+                    timeout=settings.search_queue_timeout,
+                ),
+                ("/cards/search/", "/cards/query", "/decks/search/", "/collections/search/"),
+            ),
+        ],
+        # uma vaga por thread: a fila fica aqui, limitada e com métricas, e não no threadpool;
+        # rotas async (login, simulate) esperam o process pool e não ocupam vaga
+        worker_gate=ConcurrencyGate(
+            "requests",
+            limit=settings.worker_threads,
+            max_queue=settings.request_max_queue,
+            timeout=settings.request_queue_timeout,
+        ),
+        worker_gate_filter=runs_in_threadpool(app.router),
+        exempt_prefixes=("/metrics", "/profiles"),
+        key_func=header_key(settings.rate_limit_key_header) if settings.rate_limit_key_header else client_key,
+    )
+
+    # só entra na pilha quando configurado: sem perfilamento, custo zero
+    profiling = bool(settings.profile_token) or settings.profile_sample_rate > 0
+    if profiling:
+        profile_store.max_profiles = settings.profile_store_size
+        app.add_middleware(
+            ProfilingMiddleware,
+            store=profile_store,
+            token=settings.profile_token,
+            sample_rate=settings.profile_sample_rate,
+            interval=settings.profile_interval_ms / 1000,
+        )
+
+    @app.get("/")
+    def read_root():
+        return {"message": "Tcg API is running"}
+
+    app.include_router(decks.router)
+    app.include_router(users.router)
+    app.include_router(cards.router)
+    app.include_router(collections.router)
+    app.include_router(catalog.router)
+    app.include_router(changes.router)
+    app.include_router(jobs.router)
+    app.include_router(metrics.router)
+    app.include_router(profiles.router)
+    if profiling:
+        instrument_routes(app)
+    return app
+
+
+app = create_app()
@@ -0,0 +1,74 @@
+"""hash user passwords
+
+Revision ID: a3c1f2d9e4b7
+Revises: 67fde0d0d4e4
+Create Date: 2026-10-19 09:12:40.512338
+
+"""
+import base64
+import hashlib
+import os
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c1f2d9e4b7'
+down_revision: Union[str, None] = '67fde0d0d4e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# parâmetros fixos desta revisão, copiados de services/security.py; mudar o código
+# da aplicação não pode mudar o que esta migration grava
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SCRYPT_DKLEN = 32
+SALT_BYTES = 16
+HASH_PREFIX = "scrypt"
+
+
+def _b64(raw: bytes) -> str:
+    return base64.b64encode(raw).decode("ascii")
+
+
+def hash_password(password: str) -> str:
+    """Same ``scrypt$n$r$p$salt$digest`` format that services.security verifies"""
+    salt = os.urandom(SALT_BYTES)
+    digest = hashlib.scrypt(
+        password.encode("utf-8"), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, dklen=SCRYPT_DKLEN
+    )
+    return f"{HASH_PREFIX}${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(digest)}"
+
+
+def is_password_hash(value: str) -> bool:
+    return value.startswith(f"{HASH_PREFIX}$")
+
+
+user_table = sa.table(
+    'user',
+    sa.column('id', sa.Integer()),
+    sa.column('password', sqlmodel.sql.sqltypes.AutoString()),
+)
+
+
+def upgrade() -> None:
+    # senhas antigas estão em texto puro, então trocamos cada uma pelo hash
+    bind = op.get_bind()
+    rows = bind.execute(sa.select(user_table.c.id, user_table.c.password)).all()
+    for user_id, password in rows:
+        if not is_password_hash(password):
+            bind.execute(
+                user_table.update()
+                .where(user_table.c.id == user_id)
+                .values(password=hash_password(password))
+            )
+
+
+def downgrade() -> None:
+    # não tem como recuperar as senhas originais a partir do hash
+    pass
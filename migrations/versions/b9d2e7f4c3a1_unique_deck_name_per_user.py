@@ -0,0 +1,69 @@
+"""unique deck name per user
+
+Revision ID: b9d2e7f4c3a1
+Revises: f1d4c6e8b2a9
+Create Date: 2026-10-19 18:42:51.207316
+
+
+Decks whose name repeats for the same user are renamed before the constraint is
+created: the oldest keeps the name and the others get " (<id>)" appended. Each
+renamed deck is logged (logger "alembic") with its id, user and old/new name.
+To choose the names yourself, list the duplicates before upgrading with
+
+    SELECT id, user_id, name FROM deck
+    WHERE id NOT IN (SELECT min(id) FROM deck GROUP BY user_id, name)
+
+and rename or delete them; the upgrade then renames nothing.
+"""
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9d2e7f4c3a1'
+down_revision: Union[str, None] = 'f1d4c6e8b2a9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger("alembic")
+
+deck_table = sa.table(
+    'deck',
+    sa.column('id', sa.Integer()),
+    sa.column('user_id', sa.Integer()),
+    sa.column('name', sqlmodel.sql.sqltypes.AutoString()),
+)
+
+
+def upgrade() -> None:
+    # a checagem antiga (SELECT antes do INSERT) deixava passar duplicados em
+    # requisições concorrentes; o deck mais antigo mantém o nome e os outros
+    # ganham o id no fim para a constraint poder ser criada
+    bind = op.get_bind()
+    oldest = (
+        sa.select(sa.func.min(deck_table.c.id))
+        .group_by(deck_table.c.user_id, deck_table.c.name)
+        .scalar_subquery()
+    )
+    rows = bind.execute(
+        sa.select(deck_table.c.id, deck_table.c.user_id, deck_table.c.name)
+        .where(deck_table.c.id.not_in(oldest))
+        .order_by(deck_table.c.id)
+    ).all()
+    for deck_id, user_id, name in rows:
+        new_name = f"{name} ({deck_id})"
+        bind.execute(deck_table.update().where(deck_table.c.id == deck_id).values(name=new_name))
+        logger.warning("deck %s do usuário %s renomeado: %r -> %r", deck_id, user_id, name, new_name)
+    if rows:
+        logger.warning("%s deck(s) duplicado(s) renomeado(s)", len(rows))
+    with op.batch_alter_table('deck') as batch_op:
+        batch_op.create_unique_constraint('uq_deck_user_id_name', ['user_id', 'name'])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('deck') as batch_op:
+        batch_op.drop_constraint('uq_deck_user_id_name', type_='unique')
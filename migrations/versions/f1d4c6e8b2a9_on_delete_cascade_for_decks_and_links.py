@@ -0,0 +1,56 @@
+"""on delete cascade for decks and deck card links
+
+Revision ID: f1d4c6e8b2a9
+Revises: e5b8d3c2a6f1
+Create Date: 2026-10-19 15:26:08.334761
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1d4c6e8b2a9'
+down_revision: Union[str, None] = 'e5b8d3c2a6f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# as FKs foram criadas sem nome; no SQLite a convenção abaixo dá nome a elas
+# durante o batch, no Postgres elas têm o nome padrão <tabela>_<coluna>_fkey
+naming_convention = {"fk": "%(table_name)s_%(column_0_name)s_fkey"}
+
+# (tabela, coluna, tabela referenciada), filhos antes dos pais
+foreign_keys = [
+    ('deckcardlink', 'deck_id', 'deck'),
+    ('deckcardlink', 'card_id', 'card'),
+    ('deck', 'user_id', 'user'),
+]
+
+
+def _replace_foreign_keys(ondelete) -> None:
+    if op.get_bind().dialect.name == 'sqlite':
+        for table in ('deckcardlink', 'deck'):
+            with op.batch_alter_table(table, recreate='always', naming_convention=naming_convention) as batch_op:
+                for fk_table, column, referred in foreign_keys:
+                    if fk_table == table:
+                        batch_op.drop_constraint(f'{table}_{column}_fkey', type_='foreignkey')
+                        batch_op.create_foreign_key(
+                            f'{table}_{column}_fkey', referred, [column], ['id'], ondelete=ondelete
+                        )
+        return
+
+    for table, column, referred in foreign_keys:
+        op.drop_constraint(f'{table}_{column}_fkey', table, type_='foreignkey')
+        op.create_foreign_key(f'{table}_{column}_fkey', table, referred, [column], ['id'], ondelete=ondelete)
+
+
+def upgrade() -> None:
+    _replace_foreign_keys('CASCADE')
+
+
+def downgrade() -> None:
+    _replace_foreign_keys(None)
@@ -1,5 +1,6 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from sqlmodel import Field, Relationship, SQLModel
+from sqlalchemy import ForeignKey, Index, JSON, UniqueConstraint
 from datetime import date, datetime
 from enum import Enum
 from typing import TYPE_CHECKING
@@ -30,10 +31,29 @@ class DeckFormat(str, Enum):
     Commander = "Commander"
     Pauper = "Pauper"
 
+#operações registradas no change log
+class ChangeOperation(str, Enum):
+    create = "create"
+    update = "update"
+    delete = "delete"
+
+#estados de um job em background
+class JobStatus(str, Enum):
+    queued = "queued"
+    running = "running"
+    succeeded = "succeeded"
+    failed = "failed"
+    cancelled = "cancelled"
+
 #Aqui a tabela de cards do deck (many-to-many) que precisamos :)
 class DeckCardLink(SQLModel, table=True):
-    deck_id: Optional[int] = Field(default=None, foreign_key="deck.id", primary_key=True)
-    card_id: Optional[int] = Field(default=None, foreign_key="card.id", primary_key=True)
+    # ON DELETE CASCADE: apagar um deck ou carta remove as linhas daqui direto no banco
+    deck_id: Optional[int] = Field(
+        default=None, primary_key=True, sa_column_args=[ForeignKey("deck.id", ondelete="CASCADE")]
+    )
+    card_id: Optional[int] = Field(
+        default=None, primary_key=True, sa_column_args=[ForeignKey("card.id", ondelete="CASCADE")]
+    )
     qty: int = Field(default=1, ge=1, le=3)
 
 # aqui temos a coleção em que as cartas vem
@@ -52,7 +72,9 @@ class Card(SQLModel, table=True):
     text: Optional[str] = Field(default=None)
     collection_id: int = Field(foreign_key="collection.id", nullable=False)
     collection : Collection = Relationship(back_populates="cards")
-    decks: List["Deck"] = Relationship(back_populates="cards", link_model=DeckCardLink)
+    decks: List["Deck"] = Relationship(
+        back_populates="cards", link_model=DeckCardLink, sa_relationship_kwargs={"passive_deletes": True}
+    )
 
 #aqui fazemos a table do User (dono dos decks)
 class User(SQLModel, table=True):
@@ -61,14 +83,50 @@ class User(SQLModel, table=True):
     email : str = Field(nullable=False, unique=True)
     password: str = Field(nullable=False)
     created_at: datetime = Field(default_factory=datetime.now)
-    decks : List["Deck"] = Relationship(back_populates="owner")
+    decks : List["Deck"] = Relationship(
+        back_populates="owner", sa_relationship_kwargs={"cascade": "all, delete-orphan", "passive_deletes": True}
+    )
 
 #
 class Deck(SQLModel, table=True):
+    # um usuário não tem dois decks com o mesmo nome; garantido pelo banco
+    __table_args__ = (UniqueConstraint("user_id", "name", name="uq_deck_user_id_name"),)
     id: Optional[int] = Field(default=None, primary_key=True)
     name : str = Field(nullable=False)
     format: DeckFormat = Field(nullable=False)
     created_at: datetime = Field(default_factory=datetime.now)
-    user_id: int = Field(foreign_key="user.id")
+    user_id: int = Field(sa_column_args=[ForeignKey("user.id", ondelete="CASCADE")])
     owner: User = Relationship(back_populates="decks")
-    cards : List[Card] = Relationship(back_populates="decks", link_model=DeckCardLink)
\ No newline at end of file
+    cards : List[Card] = Relationship(
+        back_populates="decks", link_model=DeckCardLink, sa_relationship_kwargs={"passive_deletes": True}
+    )
+
+#log de alterações (append-only) usado pelo feed /changes
+class ChangeLog(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_changelog_entity", "entity_type", "entity_id"),
+        {"sqlite_autoincrement": True},
+    )
+    seq: Optional[int] = Field(default=None, primary_key=True)
+    entity_type: str = Field(nullable=False)
+    entity_id: int = Field(nullable=False)
+    operation: ChangeOperation = Field(nullable=False)
+    changed_at: datetime = Field(default_factory=datetime.now, index=True)
+
+#jobs executados em background pelo JobRunner
+class Job(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    kind: str = Field(nullable=False)
+    status: JobStatus = Field(default=JobStatus.queued, nullable=False, index=True)
+    params: Optional[Dict[str, Any]] = Field(default=None, sa_type=JSON)
+    progress: int = Field(default=0, nullable=False)
+    total: Optional[int] = Field(default=None)
+    result: Optional[Dict[str, Any]] = Field(default=None, sa_type=JSON)
+    error: Optional[str] = Field(default=None)
+    cancel_requested: bool = Field(default=False, nullable=False)
+    created_at: datetime = Field(default_factory=datetime.now)
+    started_at: Optional[datetime] = Field(default=None)
+    finished_at: Optional[datetime] = Field(default=None)
+    # lease: o worker que está rodando o job renova heartbeat_at; vencido, outro worker o retoma
+    worker_id: Optional[str] = Field(default=None)
+    heartbeat_at: Optional[datetime] = Field(default=None)
@@ -1,37 +1,329 @@
+from datetime import date, datetime, time, timedelta
+from functools import partial
+from typing import List, Optional
 from fastapi import APIRouter, HTTPException, Depends, status, Query
 from sqlmodel import Session, select
 from sqlalchemy.orm import selectinload
-from sqlalchemy import func
-from database import get_session
-from models.models import Card, Collection
-from routes.schemas.cardSchema import CardCreate, CardRead, CardUpdate
+from sqlalchemy import bindparam, func, delete, insert, or_, update, cast, literal, union_all, String
+from sqlalchemy.exc import IntegrityError
+from database import get_session, RoutingSession, violated_constraint
+from models.models import Card, CardRarity, CardType, Collection, Deck, DeckCardLink, DeckFormat, ChangeOperation
+from routes.schemas.cardSchema import CardCreate, CardRead, CardUpdate, CardQueryPage, CardSuggestion, PopularCard
+from routes.schemas.jobSchema import JobEnqueued
+from routes.jobs import enqueue_job
+from routes.params import id_list
+from services.autocomplete import autocomplete_index
+from services.card_columns import CardColumns, card_columns
+from services.catalog_snapshot import snapshot_store
+from services.changelog import record_change, record_changes, record_changes_from
+from services.coalescing import stats_cache
+from services.jobs import JobContext, job_runner
+from services.keyset import InvalidCursorError, decode_cursor, encode_cursor, keyset_condition
+from services.popularity import popularity
+from services.write_batcher import write_batcher
 from pydantic import ValidationError
 
 
 router = APIRouter(prefix="/cards", tags=["Cards"])
 
+# consultas das rotas mais chamadas, montadas uma vez com bindparam: a cache key
+# (e com ela o SQL compilado) é calculada na primeira execução e reaproveitada
+LIST_CARDS = select(Card).offset(bindparam("skip")).limit(bindparam("limit"))
+SEARCH_CARDS = (
+    select(Card).where(Card.name.ilike(bindparam("pattern"))).offset(bindparam("skip")).limit(bindparam("limit"))
+)
+CARDS_BY_COLLECTION = (
+    select(Card)
+    .where(Card.collection_id == bindparam("collection_id"))
+    .offset(bindparam("skip"))
+    .limit(bindparam("limit"))
+)
+CARD_NAMES_BY_PREFIX = (
+    select(Card.id, Card.name).where(Card.name.ilike(bindparam("pattern"))).order_by(Card.name).limit(bindparam("limit"))
+)
+CARDS_PER_COLLECTION = (
+    select(Collection.name, func.count(Card.id).label("total_cards"))
+    .join(Card)
+    .group_by(Collection.id, Collection.name)
+    .order_by(func.count(Card.id).desc())
+)
+CARDS_BY_RARITY = (
+    select(Card.rarity, func.count(Card.id).label("total_cards")).group_by(Card.rarity).order_by(func.count(Card.id).desc())
+)
+CARDS_BY_TYPE = (
+    select(Card.type, func.count(Card.id).label("total_cards")).group_by(Card.type).order_by(func.count(Card.id).desc())
+)
+
 
 @router.post("/", response_model=CardRead, status_code=status.HTTP_201_CREATED)
 def create_card(data: CardCreate, session: Session = Depends(get_session)):
     """Create a new card"""
-    existing = session.exec(select(Card).where(Card.name == data.name)).first()
-
-    if existing:
-        raise HTTPException(status_code=400, detail="Carta com esse nome já existe!")
-
     try:
-        card = Card.model_validate(data)
-        session.add(card)
+        # nome repetido é barrado pela constraint unique, sem SELECT antes
+        card = session.scalars(
+            insert(Card).returning(Card), [Card.model_validate(data).model_dump(exclude={"id"})]
+        ).one()
+        record_change(session, "card", card.id, ChangeOperation.create)
+        # lida antes do commit, que expiraria a carta e custaria um SELECT
+        created = CardRead.model_validate(card)
         session.commit()
-        session.refresh(card)
-        return card
 
     except ValidationError as e:
         raise HTTPException(status_code=422, detail=e.errors())
 
+    except IntegrityError as e:
+        session.rollback()
+        if violated_constraint(e) == "unique":
+            raise HTTPException(status_code=400, detail="Carta com esse nome já existe!")
+        raise HTTPException(status_code=500, detail="Erro ao criar carta!")
+
     except Exception:
         raise HTTPException(status_code=500, detail="Erro ao criar carta!")
 
+    autocomplete_index.upsert(created.id, created.name)
+    snapshot_store.request_rebuild()
+    card_columns.request_rebuild()
+    return created
+
+
+IMPORT_CHUNK_SIZE = 500
+
+
+@job_runner.register("import_cards")
+def import_cards_job(ctx: JobContext, cards: list):
+    """Insert cards in chunks, skipping names that already exist"""
+    created, skipped = 0, []
+    ctx.progress(0, len(cards))
+
+    for start in range(0, len(cards), IMPORT_CHUNK_SIZE):
+        chunk = [CardCreate.model_validate(c) for c in cards[start:start + IMPORT_CHUNK_SIZE]]
+        with ctx.session() as session:
+            seen = set(session.exec(select(Card.name).where(Card.name.in_([c.name for c in chunk]))).all())
+            new_cards = []
+            for data in chunk:
+                if data.name in seen:
+                    skipped.append(data.name)
+                    continue
+                seen.add(data.name)
+                new_cards.append(Card.model_validate(data))
+
+            session.add_all(new_cards)
+            session.flush()
+            for card in new_cards:
+                record_change(session, "card", card.id, ChangeOperation.create)
+            session.commit()
+            autocomplete_index.add_many((card.id, card.name) for card in new_cards)
+
+        created += len(new_cards)
+        ctx.progress(start + len(chunk))
+
+    snapshot_store.request_rebuild()
+    card_columns.request_rebuild()
+    return {"created": created, "skipped": skipped}
+
+
+@router.post("/import", response_model=JobEnqueued, status_code=status.HTTP_202_ACCEPTED)
+def enqueue_cards_import(data: list[CardCreate], session: Session = Depends(get_session)):
+    """Import many cards in the background"""
+    job = enqueue_job(session, "import_cards", {"cards": [c.model_dump(mode="json") for c in data]})
+    return {"job_id": job.id, "status": job.status}
+
+
+SORT_KEYS = {
+    "name": Card.name,
+    "type": Card.type,
+    "rarity": Card.rarity,
+    "collection_id": Card.collection_id,
+    "id": Card.id,
+}
+
+
+def _card_filters(
+    collection_id: Optional[List[int]],
+    type: Optional[List[CardType]],
+    rarity: Optional[List[CardRarity]],
+    q: Optional[str],
+) -> list:
+    filters = []
+    if collection_id:
+        filters.append(Card.collection_id.in_(collection_id))
+    if type:
+        filters.append(Card.type.in_(type))
+    if rarity:
+        filters.append(Card.rarity.in_(rarity))
+    if q:
+        filters.append(or_(Card.name.ilike(f"%{q}%"), Card.text.ilike(f"%{q}%")))
+    return filters
+
+
+def _parse_sort(sort: str) -> List[tuple]:
+    keys, seen = [], set()
+    for item in sort.split(","):
+        item = item.strip()
+        name = item.lstrip("-")
+        if name not in SORT_KEYS or name in seen:
+            raise HTTPException(400, f"Ordenação inválida: {item!r}")
+        seen.add(name)
+        keys.append((name, item.startswith("-")))
+    # id no final deixa a ordem total, o que o cursor precisa
+    if "id" not in seen:
+        keys.append(("id", False))
+    return keys
+
+
+def _columns(session: Session) -> Optional[CardColumns]:
+    """Columnar catalog, skipped right after this client's own write (another worker may not have rebuilt yet)"""
+    if session.info.get("fresh_reads"):
+        return None
+    return card_columns.current
+
+
+def _card_facets(session: Session, filters: list) -> dict:
+    """Counts by type, rarity and collection under ``filters`` in one grouped query"""
+    facets = {"type": {}, "rarity": {}, "collection": {}}
+
+    if session.get_bind().dialect.name == "postgresql":
+        rows = session.exec(
+            select(
+                Card.type, Card.rarity, Card.collection_id, func.count(),
+                func.grouping(Card.type), func.grouping(Card.rarity),
+            )
+            .where(*filters)
+            .group_by(func.grouping_sets(Card.type, Card.rarity, Card.collection_id))
+        ).all()
+        for card_type, rarity, collection_id, count, no_type, no_rarity in rows:
+            if not no_type:
+                facets["type"][card_type.value] = count
+            elif not no_rarity:
+                facets["rarity"][rarity.value] = count
+            else:
+                facets["collection"][collection_id] = count
+        return facets
+
+    # sem GROUPING SETS (SQLite): os três GROUP BY num único UNION ALL
+    def facet(name: str, column):
+        return (
+            select(literal(name, String).label("facet"), cast(column, String).label("value"), func.count().label("total"))
+            .where(*filters)
+            .group_by(column)
+        )
+
+    rows = session.exec(union_all(
+        facet("type", Card.type), facet("rarity", Card.rarity), facet("collection", Card.collection_id)
+    )).all()
+    for name, value, count in rows:
+        facets[name][int(value) if name == "collection" else value] = count
+    return facets
+
+
+@router.get("/query", response_model=CardQueryPage, status_code=status.HTTP_200_OK)
+def query_cards(
+    collection_id: Optional[List[int]] = Query(None),
+    type: Optional[List[CardType]] = Query(None),
+    rarity: Optional[List[CardRarity]] = Query(None),
+    q: Optional[str] = Query(None, min_length=1),
+    sort: str = Query("name", description="Campos separados por vírgula; prefixo '-' para decrescente"),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    facets: bool = True,
+    session: Session = Depends(get_session),
+):
+    """Filter, sort and page cards, with facet counts for the current filter"""
+    keys = _parse_sort(sort)
+    order = [(SORT_KEYS[name], descending) for name, descending in keys]
+    filters = _card_filters(collection_id, type, rarity, q)
+
+    statement = select(Card).where(*filters)
+    if cursor:
+        try:
+            statement = statement.where(keyset_condition(order, decode_cursor(cursor, tag=sort)))
+        except InvalidCursorError:
+            raise HTTPException(400, "Cursor inválido!")
+    statement = statement.order_by(*[column.desc() if descending else column.asc() for column, descending in order])
+
+    cards = session.exec(statement.limit(limit + 1)).all()
+    next_cursor = None
+    if len(cards) > limit:
+        cards = cards[:limit]
+        next_cursor = encode_cursor([getattr(cards[-1], name) for name, _ in keys], tag=sort)
+
+    page = {"cards": cards, "next_cursor": next_cursor}
+    if facets:
+        columns = _columns(session)
+        if columns is not None and not q:
+            mask = columns.mask(collection_id, type, rarity)
+            page["facets"] = {
+                "type": columns.count_by_type(mask),
+                "rarity": columns.count_by_rarity(mask),
+                "collection": columns.count_by_collection(mask),
+            }
+        else:
+            page["facets"] = _card_facets(session, filters)
+        page["total"] = sum(page["facets"]["type"].values())
+    return page
+
+
+@router.get("/autocomplete", response_model=List[CardSuggestion], status_code=status.HTTP_200_OK)
+def autocomplete_cards(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+    session: Session = Depends(get_session),
+):
+    """Card names for typeahead, served from the in-memory index"""
+    if autocomplete_index.ready:
+        return [{"id": card_id, "name": name} for card_id, name in autocomplete_index.search(q, limit)]
+
+    # índice ainda carregando (ou desligado por tamanho): prefixo direto no banco
+    rows = session.exec(CARD_NAMES_BY_PREFIX, params={"pattern": f"{q}%", "limit": limit}).all()
+    return [{"id": card_id, "name": name} for card_id, name in rows]
+
+
+MAX_WINDOW_DAYS = 3650
+
+
+def _parse_window(window: Optional[str]) -> Optional[int]:
+    if window is None or window == "all":
+        return None
+    days = window[:-1]
+    if not window.endswith("d") or not days.isdigit() or not 1 <= int(days) <= MAX_WINDOW_DAYS:
+        raise HTTPException(400, f"Janela inválida: '{window}' (use, por exemplo, 7d, 30d ou all)")
+    return int(days)
+
+
+@router.get("/popular", response_model=List[PopularCard], status_code=status.HTTP_200_OK)
+def popular_cards(
+    format: Optional[DeckFormat] = None,
+    window: Optional[str] = Query(None, description="Only decks created in the last N days, e.g. 30d"),
+    limit: int = Query(20, ge=1, le=100),
+    session: Session = Depends(get_session),
+):
+    """Cards ranked by total copies across decks, answered from the in-memory counters"""
+    window_days = _parse_window(window)
+    if popularity.ready and limit <= popularity.top_k:
+        ranking = popularity.top(format, window_days, limit)
+    else:
+        # contadores ainda carregando: agregação direta no banco
+        query = (
+            select(DeckCardLink.card_id, func.sum(DeckCardLink.qty).label("qty"))
+            .join(Deck, Deck.id == DeckCardLink.deck_id)
+            .group_by(DeckCardLink.card_id)
+            .order_by(func.sum(DeckCardLink.qty).desc(), DeckCardLink.card_id)
+            .limit(limit)
+        )
+        if format:
+            query = query.where(Deck.format == format)
+        if window_days:
+            since = datetime.combine(date.today() - timedelta(days=window_days - 1), time.min)
+            query = query.where(Deck.created_at >= since)
+        ranking = session.exec(query).all()
+
+    card_ids = [card_id for card_id, _ in ranking]
+    names = autocomplete_index.names(card_ids) if autocomplete_index.ready else {}
+    missing = [card_id for card_id in card_ids if card_id not in names]
+    if missing:
+        names.update(session.exec(select(Card.id, Card.name).where(Card.id.in_(missing))).all())
+    return [{"id": card_id, "name": names[card_id], "qty": qty} for card_id, qty in ranking if card_id in names]
+
 
 @router.get("/{card_id}", response_model=CardRead, status_code=status.HTTP_200_OK)
 def get_card_by_id(card_id: int, session: Session = Depends(get_session)):
@@ -50,31 +342,86 @@ def delete_card_by_id(card_id: int, session: Session = Depends(get_session)):
         raise HTTPException(404, f"Carta com ID {card_id} não existe!")
 
     try:
+        # a carta sai dos decks por ON DELETE CASCADE, então esses decks mudaram também
+        record_changes_from(
+            session, "deck", select(DeckCardLink.deck_id).where(DeckCardLink.card_id == card_id), ChangeOperation.update
+        )
         session.delete(card)
+        record_change(session, "card", card_id, ChangeOperation.delete)
         session.commit()
+        autocomplete_index.remove(card_id)
+        snapshot_store.request_rebuild()
+        card_columns.request_rebuild()
+        popularity.request_resync()
     except Exception as e:
         session.rollback()
         raise HTTPException(400, f"Houve um problema ao deletar a Carta com ID {card_id}!")
 
 
-@router.put("/{card_id}", response_model=CardRead, status_code=status.HTTP_200_OK)
-def update_card(card_id: int, updated_card: CardUpdate, session: Session = Depends(get_session)):
-    card = session.get(Card, card_id)
+@router.delete("/", status_code=status.HTTP_200_OK)
+def delete_cards(ids: List[int] = Depends(id_list), session: Session = Depends(get_session)):
+    """Delete many cards in a single statement"""
+    try:
+        record_changes_from(
+            session,
+            "deck",
+            select(DeckCardLink.deck_id).where(DeckCardLink.card_id.in_(ids)).distinct(),
+            ChangeOperation.update,
+        )
+        deleted = session.exec(
+            delete(Card).where(Card.id.in_(ids)).returning(Card.id)
+        ).scalars().all()
+        record_changes(session, "card", deleted, ChangeOperation.delete)
+        session.commit()
+        for card_id in deleted:
+            autocomplete_index.remove(card_id)
+        snapshot_store.request_rebuild()
+        card_columns.request_rebuild()
+        popularity.request_resync()
+        return {"deleted": deleted}
+
+    except Exception as e:
+        session.rollback()
+        raise HTTPException(400, "Houve um problema ao deletar as Cartas!")
+
+
+def _update_card(card_id: int, card_dict: dict, session: Session) -> Card:
+    try:
+        card = session.scalars(
+            update(Card).where(Card.id == card_id).values(**card_dict).returning(Card)
+        ).first()
+    except IntegrityError as e:
+        if violated_constraint(e) == "unique":
+            raise HTTPException(400, "Carta com esse nome já existe!")
+        raise
 
     if not card:
         raise HTTPException(404, f"Carta com ID {card_id} não existe!")
 
+    record_change(session, "card", card_id, ChangeOperation.update)
+    return card
+
+
+@router.put("/{card_id}", response_model=CardRead, status_code=status.HTTP_200_OK)
+def update_card(card_id: int, updated_card: CardUpdate, session: Session = Depends(get_session)):
     card_dict = updated_card.model_dump(exclude_unset=True)
     if not card_dict:
         raise HTTPException(400, "Nenhum campo para atualizar")
 
     try:
-        for key, value in card_dict.items():
-            setattr(card, key, value)
-        session.commit()
-        session.refresh(card)
+        if write_batcher.enabled:
+            card = CardRead.model_validate(write_batcher.submit(partial(_update_card, card_id, card_dict)))
+        else:
+            card = CardRead.model_validate(_update_card(card_id, card_dict, session))
+            session.commit()
+        if "name" in card_dict:
+            autocomplete_index.upsert(card_id, card.name)
+        snapshot_store.request_rebuild()
+        card_columns.request_rebuild()
         return card
 
+    except HTTPException:
+        raise
     except Exception as e:
         session.rollback()
         raise HTTPException(400, f"Não foi possível atualizar Carta com ID {card_id}!")
@@ -87,9 +434,7 @@ def list_cards(
     session: Session = Depends(get_session),
 ):
     try:
-        cards = session.exec(
-            select(Card).offset(skip).limit(limit)
-        ).all()
+        cards = session.exec(LIST_CARDS, params={"skip": skip, "limit": limit}).all()
         return cards
 
     except Exception as e:
@@ -104,12 +449,7 @@ def search_card_by_name(
     session: Session = Depends(get_session)
 ):
     try:
-        cards = session.exec(
-            select(Card)
-            .where(Card.name.ilike(f"%{name}%"))
-            .offset(skip)
-            .limit(limit)
-        ).all()
+        cards = session.exec(SEARCH_CARDS, params={"pattern": f"%{name}%", "skip": skip, "limit": limit}).all()
 
         return cards
 
@@ -125,16 +465,19 @@ def get_cards_by_collection(
     session: Session = Depends(get_session)
 ):
     """Get all cards from a specific collection"""
+    columns = _columns(session)
+    if columns is not None:
+        if not columns.has_collection(collection_id):
+            raise HTTPException(404, f"Collection com ID {collection_id} não existe!")
+        return columns.by_collection(collection_id, skip, limit)
+
     collection = session.get(Collection, collection_id)
     if not collection:
         raise HTTPException(404, f"Collection com ID {collection_id} não existe!")
 
     try:
         cards = session.exec(
-            select(Card)
-            .where(Card.collection_id == collection_id)
-            .offset(skip)
-            .limit(limit)
+            CARDS_BY_COLLECTION, params={"collection_id": collection_id, "skip": skip, "limit": limit}
         ).all()
 
         return cards
@@ -143,77 +486,89 @@ def get_cards_by_collection(
         raise HTTPException(status_code=500, detail="Houve um erro interno no servidor")
 
 
+def _cards_per_collection() -> list:
+    with RoutingSession(read_only=True) as session:
+        rows = session.exec(CARDS_PER_COLLECTION).all()
+
+    return [
+        {
+            "collection_name": row[0],
+            "total_cards": row[1],
+        }
+        for row in rows
+    ]
+
+
+def _cards_by_rarity() -> list:
+    with RoutingSession(read_only=True) as session:
+        rows = session.exec(CARDS_BY_RARITY).all()
+
+    return [
+        {
+            "rarity": row[0],
+            "total_cards": row[1],
+        }
+        for row in rows
+    ]
+
+
+def _cards_by_type() -> list:
+    with RoutingSession(read_only=True) as session:
+        rows = session.exec(CARDS_BY_TYPE).all()
+
+    return [
+        {
+            "type": row[0],
+            "total_cards": row[1],
+        }
+        for row in rows
+    ]
+
+
+def _ranked(counts, label: str) -> list:
+    """``(value, total)`` pairs in the same shape and order as the SQL stats"""
+    return [
+        {label: value, "total_cards": total}
+        for value, total in sorted(counts, key=lambda item: item[1], reverse=True)
+    ]
+
+
 @router.get("/stats/by-collection", status_code=status.HTTP_200_OK)
-def cards_per_collection_stats(session: Session = Depends(get_session)):
+def cards_per_collection_stats():
     """Get statistics of cards count per collection"""
     try:
-        rows = session.exec(
-            select(
-                Collection.name,
-                func.count(Card.id).label("total_cards")
-            )
-            .join(Card)
-            .group_by(Collection.id, Collection.name)
-            .order_by(func.count(Card.id).desc())
-        ).all()
-
-        return [
-            {
-                "collection_name": row[0],
-                "total_cards": row[1],
-            }
-            for row in rows
-        ]
+        columns = card_columns.current
+        if columns is not None:
+            counts = columns.count_by_collection()
+            names = columns.collection_names(counts)
+            return _ranked(((names[collection_id], total) for collection_id, total in counts.items()), "collection_name")
+        return stats_cache.get("cards_per_collection", _cards_per_collection)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail="Houve um erro interno no servidor")
 
 
 @router.get("/stats/by-rarity", status_code=status.HTTP_200_OK)
-def cards_by_rarity_stats(session: Session = Depends(get_session)):
+def cards_by_rarity_stats():
     """Get statistics of cards count by rarity"""
     try:
-        rows = session.exec(
-            select(
-                Card.rarity,
-                func.count(Card.id).label("total_cards")
-            )
-            .group_by(Card.rarity)
-            .order_by(func.count(Card.id).desc())
-        ).all()
-
-        return [
-            {
-                "rarity": row[0],
-                "total_cards": row[1],
-            }
-            for row in rows
-        ]
+        columns = card_columns.current
+        if columns is not None:
+            return _ranked(columns.count_by_rarity().items(), "rarity")
+        return stats_cache.get("cards_by_rarity", _cards_by_rarity)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail="Houve um erro interno no servidor")
 
 
 @router.get("/stats/by-type", status_code=status.HTTP_200_OK)
-def cards_by_type_stats(session: Session = Depends(get_session)):
+def cards_by_type_stats():
     """Get statistics of cards count by type"""
     try:
-        rows = session.exec(
-            select(
-                Card.type,
-                func.count(Card.id).label("total_cards")
-            )
-            .group_by(Card.type)
-            .order_by(func.count(Card.id).desc())
-        ).all()
-
-        return [
-            {
-                "type": row[0],
-                "total_cards": row[1],
-            }
-            for row in rows
-        ]
+        columns = card_columns.current
+        if columns is not None:
+            return _ranked(columns.count_by_type().items(), "type")
+        return stats_cache.get("cards_by_type", _cards_by_type)
 
     except Exception as e:
-        raise HTTPException(status_code=500, detail="Houve um erro interno no servidor")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Houve um erro interno no servidor")
@@ -0,0 +1,50 @@
+from fastapi import APIRouter, HTTPException, Header, Response, status
+from starlette.concurrency import run_in_threadpool
+from services.catalog_snapshot import snapshot_store
+
+
+router = APIRouter(prefix="/catalog", tags=["Catalog"])
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+
+
+def _pick_encoding(accept_encoding: str, available) -> str:
+    accepted = {part.split(";")[0].strip() for part in accept_encoding.split(",")}
+    for encoding in ("br", "gzip"):
+        if encoding in accepted and encoding in available:
+            return encoding
+    return "identity"
+
+
+@router.get("/latest", status_code=status.HTTP_200_OK)
+async def latest_catalog_snapshot(response: Response):
+    """Hash of the current catalog snapshot"""
+    snapshot = snapshot_store.latest
+    if not snapshot:
+        raise HTTPException(503, "Snapshot do catálogo ainda não foi gerado", headers={"Retry-After": "1"})
+
+    response.headers["Cache-Control"] = "no-cache"
+    return {"hash": snapshot.hash}
+
+
+@router.get("/snapshot/{snapshot_hash}", status_code=status.HTTP_200_OK)
+async def get_catalog_snapshot(
+    snapshot_hash: str,
+    accept_encoding: str = Header(""),
+    if_none_match: str = Header(""),
+):
+    """Full catalog (collections and cards) for a given snapshot hash"""
+    # hash de outro worker: lido do diretório compartilhado ou regerado do banco
+    snapshot = snapshot_store.get(snapshot_hash) or await run_in_threadpool(snapshot_store.load, snapshot_hash)
+    if not snapshot:
+        raise HTTPException(404, f"Snapshot {snapshot_hash} não existe!")
+
+    etag = f'"{snapshot.hash}"'
+    headers = {"Cache-Control": IMMUTABLE_CACHE, "ETag": etag, "Vary": "Accept-Encoding"}
+    if if_none_match == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    encoding = _pick_encoding(accept_encoding, snapshot.bodies)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=snapshot.bodies[encoding], media_type="application/json", headers=headers)
@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+from fastapi import APIRouter, HTTPException, Depends, status, Query
+from sqlmodel import Session, select
+from database import get_session
+from models.models import ChangeLog
+from routes.schemas.changeSchema import ChangePage
+from services.changelog import compact_changes
+
+
+router = APIRouter(prefix="/changes", tags=["Changes"])
+
+
+@router.get("/", response_model=ChangePage, status_code=status.HTTP_200_OK)
+def list_changes(
+    since: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    session: Session = Depends(get_session),
+):
+    """Changes with sequence number greater than `since`, oldest first"""
+    try:
+        rows = session.exec(
+            select(ChangeLog)
+            .where(ChangeLog.seq > since)
+            .order_by(ChangeLog.seq)
+            .limit(limit + 1)
+        ).all()
+
+        changes = rows[:limit]
+        return {
+            "changes": changes,
+            "next_since": changes[-1].seq if changes else since,
+            "has_more": len(rows) > limit,
+        }
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Houve um erro interno no servidor")
+
+
+@router.post("/compact", status_code=status.HTTP_200_OK)
+def compact_change_log(
+    older_than_days: int = Query(30, ge=0),
+    session: Session = Depends(get_session),
+):
+    """Remove superseded change log entries older than the given number of days"""
+    try:
+        deleted = compact_changes(session, datetime.now() - timedelta(days=older_than_days))
+        return {"deleted": deleted}
+
+    except Exception as e:
+        session.rollback()
+        raise HTTPException(status_code=500, detail="Houve um erro interno no servidor")
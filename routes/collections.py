@@ -1,35 +1,57 @@
 from fastapi import APIRouter, HTTPException, Depends, status, Query
 from sqlmodel import Session, select
-from database import get_session
-from models.models import Collection
+from sqlalchemy import bindparam, insert, update
+from sqlalchemy.exc import IntegrityError
+from database import get_session, violated_constraint
+from models.models import Collection, ChangeOperation
 from routes.schemas.collectionSchema import CollectionCreate, CollectionRead, CollectionUpdate
+from services.card_columns import card_columns
+from services.catalog_snapshot import snapshot_store
+from services.changelog import record_change
 from pydantic import ValidationError
 
 
 router = APIRouter(prefix="/collections", tags=["Collections"])
 
+# montadas uma vez: a cache key e o SQL compilado são reaproveitados entre requisições
+LIST_COLLECTIONS = (
+    select(Collection).order_by(Collection.release_date.desc()).offset(bindparam("skip")).limit(bindparam("limit"))
+)
+SEARCH_COLLECTIONS = (
+    select(Collection)
+    .where(Collection.name.ilike(bindparam("pattern")))
+    .offset(bindparam("skip"))
+    .limit(bindparam("limit"))
+)
+
 
 @router.post("/", response_model=CollectionRead, status_code=status.HTTP_201_CREATED)
 def create_collection(data: CollectionCreate, session: Session = Depends(get_session)):
     """Create a new collection"""
-    existing = session.exec(select(Collection).where(Collection.name == data.name)).first()
-
-    if existing:
-        raise HTTPException(status_code=400, detail="Collection com esse nome já existe!")
-
     try:
-        collection = Collection.model_validate(data)
-        session.add(collection)
+        collection = session.scalars(
+            insert(Collection).returning(Collection), [Collection.model_validate(data).model_dump(exclude={"id"})]
+        ).one()
+        record_change(session, "collection", collection.id, ChangeOperation.create)
+        created = CollectionRead.model_validate(collection)
         session.commit()
-        session.refresh(collection)
-        return collection
 
     except ValidationError as e:
         raise HTTPException(status_code=422, detail=e.errors())
 
+    except IntegrityError as e:
+        session.rollback()
+        if violated_constraint(e) == "unique":
+            raise HTTPException(status_code=400, detail="Collection com esse nome já existe!")
+        raise HTTPException(status_code=500, detail="Erro ao criar collection!")
+
     except Exception:
         raise HTTPException(status_code=500, detail="Erro ao criar collection!")
 
+    snapshot_store.request_rebuild()
+    card_columns.request_rebuild()
+    return created
+
 
 @router.get("/{collection_id}", response_model=CollectionRead, status_code=status.HTTP_200_OK)
 def get_collection_by_id(collection_id: int, session: Session = Depends(get_session)):
@@ -49,7 +71,10 @@ def delete_collection_by_id(collection_id: int, session: Session = Depends(get_s
 
     try:
         session.delete(collection)
+        record_change(session, "collection", collection_id, ChangeOperation.delete)
         session.commit()
+        snapshot_store.request_rebuild()
+        card_columns.request_rebuild()
     except Exception as e:
         session.rollback()
         raise HTTPException(400, f"Houve um problema ao deletar a Collection com ID {collection_id}!")
@@ -57,26 +82,35 @@ def delete_collection_by_id(collection_id: int, session: Session = Depends(get_s
 
 @router.put("/{collection_id}", response_model=CollectionRead, status_code=status.HTTP_200_OK)
 def update_collection(collection_id: int, updated_collection: CollectionUpdate, session: Session = Depends(get_session)):
-    collection = session.get(Collection, collection_id)
-
-    if not collection:
-        raise HTTPException(404, f"Collection com ID {collection_id} não existe!")
-
     collection_dict = updated_collection.model_dump(exclude_unset=True)
     if not collection_dict:
         raise HTTPException(400, "Nenhum campo para atualizar")
 
     try:
-        for key, value in collection_dict.items():
-            setattr(collection, key, value)
+        collection = session.scalars(
+            update(Collection).where(Collection.id == collection_id).values(**collection_dict).returning(Collection)
+        ).first()
+        if not collection:
+            raise HTTPException(404, f"Collection com ID {collection_id} não existe!")
+        record_change(session, "collection", collection_id, ChangeOperation.update)
+        updated = CollectionRead.model_validate(collection)
         session.commit()
-        session.refresh(collection)
-        return collection
 
+    except HTTPException:
+        raise
+    except IntegrityError as e:
+        session.rollback()
+        if violated_constraint(e) == "unique":
+            raise HTTPException(400, "Collection com esse nome já existe!")
+        raise HTTPException(400, f"Não foi possível atualizar Collection com ID {collection_id}!")
     except Exception as e:
         session.rollback()
         raise HTTPException(400, f"Não foi possível atualizar Collection com ID {collection_id}!")
 
+    snapshot_store.request_rebuild()
+    card_columns.request_rebuild()
+    return updated
+
 
 @router.get("/", response_model=list[CollectionRead], status_code=status.HTTP_200_OK)
 def list_collections(
@@ -85,12 +119,7 @@ def list_collections(
     session: Session = Depends(get_session),
 ):
     try:
-        collections = session.exec(
-            select(Collection)
-            .order_by(Collection.release_date.desc())
-            .offset(skip)
-            .limit(limit)
-        ).all()
+        collections = session.exec(LIST_COLLECTIONS, params={"skip": skip, "limit": limit}).all()
         return collections
 
     except Exception as e:
@@ -106,10 +135,7 @@ def search_collection_by_name(
 ):
     try:
         collections = session.exec(
-            select(Collection)
-            .where(Collection.name.ilike(f"%{name}%"))
-            .offset(skip)
-            .limit(limit)
+            SEARCH_COLLECTIONS, params={"pattern": f"%{name}%", "skip": skip, "limit": limit}
         ).all()
 
         return collections
@@ -1,9 +1,29 @@
+from datetime import datetime
+from functools import partial
+from typing import Dict, List, Optional, Tuple
 from fastapi import APIRouter, HTTPException, Depends, status, Query
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 from sqlmodel import Session, select, func
-from database import get_session
+from database import get_session, get_settings, RoutingSession, violated_constraint
+from sqlalchemy import bindparam, delete, insert, literal, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import selectinload
-from models.models import Deck, DeckCardLink, Card, DeckFormat
-from routes.schemas.deckShema import DeckCreate, DeckRead, DeckUpdate, DeckWithCardsRead, DeckCardsLinkRead
+from models.models import Deck, DeckCardLink, Card, DeckFormat, ChangeOperation, User
+from routes.schemas.deckShema import (
+    DeckCreate, DeckRead, DeckUpdate, DeckWithCardsRead, DeckCardsLinkRead, DecklistImport, DecklistImportResult,
+    DeckCode, DeckFromCode, DeckClone, DeckCloneMany, SimulationRequest, SimulationResult,
+)
+from routes.schemas.cardSchema import CardRead
+from routes.params import id_list
+from services.changelog import record_change, record_changes
+from services.coalescing import stats_cache
+from services.deck_code import DeckCodeError, decode_deck_code, encode_deck_code, encode_deck_codes
+from services.decklist import DecklistParseError, format_decklist, parse_decklist
+from services.popularity import popularity
+from services.process_pool import PoolSaturatedError
+from services.simulator import SimulationError, cache_key, simulate, simulation_cache
+from services.write_batcher import write_batcher
 from pydantic import ValidationError
 
 
@@ -12,34 +32,51 @@ router = APIRouter(
     tags=["Decks"]
 )
 
+MAX_COPIES = 3
+MAX_CLONE_TARGETS = 1000
+
+# consultas prontas desde o import; por requisição só mudam os parâmetros
+DECK_ID = select(Deck.id).where(Deck.id == bindparam("deck_id"))
+CARD_ID = select(Card.id).where(Card.id == bindparam("card_id"))
+DECK_CARD_LINK = select(DeckCardLink).where(
+    DeckCardLink.deck_id == bindparam("deck_id"), DeckCardLink.card_id == bindparam("card_id")
+)
+DECK_WITH_CARDS = select(Deck).where(Deck.id == bindparam("deck_id")).options(selectinload(Deck.cards))
+DECK_CARD_COUNT = select(func.sum(DeckCardLink.qty)).where(DeckCardLink.deck_id == bindparam("deck_id"))
+LIST_DECKS = select(Deck).offset(bindparam("skip")).limit(bindparam("limit"))
+SEARCH_DECKS = (
+    select(Deck).where(Deck.name.ilike(bindparam("pattern"))).offset(bindparam("skip")).limit(bindparam("limit"))
+)
+DECKS_BY_FORMAT = select(Deck.format, func.count(Deck.id).label("total_decks")).group_by(Deck.format)
+
 @router.post("/", response_model=DeckRead, status_code=status.HTTP_201_CREATED)
 def create_deck(data: DeckCreate, session: Session = Depends(get_session)):
     """Create a new user deck"""
-    existing = session.exec(
-        select(Deck).where(
-            Deck.name == data.name, Deck.user_id == data.user_id
-        )
-    ).first()
-
-    if existing:
-        raise HTTPException(
-            status_code=400,
-            detail="Usuário já tem deck com esse nome!"
-        )
-    
     try:
-        deck = Deck.model_validate(data)
-        session.add(deck)
+        # nome repetido é barrado pela constraint (user_id, name), sem SELECT antes
+        deck = session.scalars(
+            insert(Deck).returning(Deck), [Deck.model_validate(data).model_dump(exclude={"id"})]
+        ).one()
+        record_change(session, "deck", deck.id, ChangeOperation.create)
+        # lido antes do commit, que expiraria o deck e custaria um SELECT
+        created = DeckRead.model_validate(deck)
         session.commit()
-        session.refresh(deck)
-        return deck
 
     except ValidationError as e:
         raise HTTPException(status_code=422, detail=e.errors())
 
+    except IntegrityError as e:
+        session.rollback()
+        if violated_constraint(e) == "unique":
+            raise HTTPException(status_code=400, detail="Usuário já tem deck com esse nome!")
+        raise HTTPException(status_code=500, detail="Erro ao criar deck!")
+
     except Exception:
         raise HTTPException(status_code=500, detail="Erro ao criar deck!")
 
+    popularity.register_deck(created.id, created.format, created.created_at)
+    return created
+
 
 
 @router.delete("/{deck_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -51,12 +88,65 @@ def delete_deck_by_id(deck_id: int, session: Session = Depends(get_session)):
 
     try:
         session.delete(deck)
+        record_change(session, "deck", deck_id, ChangeOperation.delete)
         session.commit()
+        popularity.request_resync()
     except Exception as e:
         session.rollback()
         raise HTTPException(400, f"Houve um problema ao deletar o Deck com ID {deck_id}!")
     
 
+@router.delete("/", status_code=status.HTTP_200_OK)
+def delete_decks(ids: List[int] = Depends(id_list), session: Session = Depends(get_session)):
+    """Delete many decks in a single statement"""
+    try:
+        deleted = session.exec(
+            delete(Deck).where(Deck.id.in_(ids)).returning(Deck.id)
+        ).scalars().all()
+        record_changes(session, "deck", deleted, ChangeOperation.delete)
+        session.commit()
+        popularity.request_resync()
+        return {"deleted": deleted}
+
+    except Exception as e:
+        session.rollback()
+        raise HTTPException(400, "Houve um problema ao deletar os Decks!")
+
+
+def _add_card_in_deck(deck_id: int, card_id: int, session: Session) -> Tuple[dict, int]:
+    if session.exec(DECK_ID, params={"deck_id": deck_id}).first() is None:
+        raise HTTPException(404, f"Deck com ID {deck_id} não existe!")
+
+    if session.exec(CARD_ID, params={"card_id": card_id}).first() is None:
+        raise HTTPException(404, f"Card com ID {card_id} não existe!")
+
+    card_in_deck = session.exec(DECK_CARD_LINK, params={"deck_id": deck_id, "card_id": card_id}).first()
+
+    if card_in_deck:
+        if card_in_deck.qty >= MAX_COPIES:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Esta carta já atingiu o limite máximo permitido no deck"
+            )
+
+        card_in_deck.qty += 1
+    else:
+        card_in_deck = DeckCardLink(
+            deck_id=deck_id,
+            card_id=card_id,
+            qty=1
+        )
+    session.add(card_in_deck)
+
+    change = record_change(session, "deck", deck_id, ChangeOperation.update)
+    session.flush()
+    return {
+        "deck_id": deck_id,
+        "card_id": card_id,
+        "qty": card_in_deck.qty
+    }, change.seq
+
+
 @router.post("/{deck_id}/cards/{card_id}", response_model=DeckCardsLinkRead, status_code=status.HTTP_201_CREATED)
 def add_card_in_deck(
     deck_id: int,
@@ -64,47 +154,14 @@ def add_card_in_deck(
     session: Session = Depends(get_session),
 ):
     """add card in deck"""
-    deck = session.get(Deck, deck_id)
-    if not deck:
-        raise HTTPException(404, f"Deck com ID {deck_id} não existe!")
-
-    card = session.get(Card, card_id)
-    if not card:
-        raise HTTPException(404, f"Card com ID {card_id} não existe!")
-
-    card_in_deck = session.exec(
-        select(DeckCardLink)
-        .where(
-            DeckCardLink.deck_id == deck_id,
-            DeckCardLink.card_id == card_id,
-        )
-    ).first()
-
     try:
-        if card_in_deck:
-            if card_in_deck.qty == 3:
-                raise HTTPException(
-                    status_code=status.HTTP_409_CONFLICT,
-                    detail="Esta carta já atingiu o limite máximo permitido no deck"
-                )
-
-            card_in_deck.qty += 1
+        if write_batcher.enabled:
+            result, seq = write_batcher.submit(partial(_add_card_in_deck, deck_id, card_id))
         else:
-            card_in_deck = DeckCardLink(
-                deck_id=deck_id,
-                card_id=card_id,
-                qty=1
-            )
-            session.add(card_in_deck)
-
-        session.commit()
-        session.refresh(card_in_deck)
-
-        return {
-            "deck_id": deck_id,
-            "card_id": card_id,
-            "qty": card_in_deck.qty
-        }
+            result, seq = _add_card_in_deck(deck_id, card_id, session)
+            session.commit()
+        popularity.record(deck_id, card_id, 1, seq)
+        return result
 
     except HTTPException:
         raise
@@ -115,6 +172,30 @@ def add_card_in_deck(
             detail="Erro ao tentar adicionar card ao deck"
         )
 
+
+def _delete_card_in_deck(deck_id: int, card_id: int, session: Session) -> int:
+    if session.exec(DECK_ID, params={"deck_id": deck_id}).first() is None:
+        raise HTTPException(404, f"Deck com ID {deck_id} não existe!")
+
+    if session.exec(CARD_ID, params={"card_id": card_id}).first() is None:
+        raise HTTPException(404, f"Card com ID {card_id} não existe!")
+
+    card_in_deck = session.exec(DECK_CARD_LINK, params={"deck_id": deck_id, "card_id": card_id}).first()
+
+    if not card_in_deck:
+        raise HTTPException(404, "card não existe no deck")
+
+    if card_in_deck.qty > 1:
+        card_in_deck.qty = card_in_deck.qty - 1
+        session.add(card_in_deck)
+    else:
+        session.delete(card_in_deck)
+
+    change = record_change(session, "deck", deck_id, ChangeOperation.update)
+    session.flush()
+    return change.seq
+
+
 @router.delete("/{deck_id}/cards/{card_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_card_in_deck(
     deck_id: int,
@@ -122,33 +203,13 @@ def delete_card_in_deck(
     session: Session = Depends(get_session),
 ):
     """delete card in deck"""
-    deck = session.get(Deck, deck_id)
-    if not deck:
-        raise HTTPException(404, f"Deck com ID {deck_id} não existe!")
-
-    card = session.get(Card, card_id)
-    if not card:
-        raise HTTPException(404, f"Card com ID {card_id} não existe!")
-
-    card_in_deck = session.exec(
-        select(DeckCardLink)
-        .where(
-            DeckCardLink.deck_id == deck_id,
-            DeckCardLink.card_id == card_id,
-        )
-    ).first()
-
     try:
-        if not card_in_deck:
-           raise HTTPException(404, "card não existe no deck")
-        
-        if card_in_deck.qty > 1:
-            card_in_deck.qty = card_in_deck.qty - 1
-            session.add(card_in_deck)
+        if write_batcher.enabled:
+            seq = write_batcher.submit(partial(_delete_card_in_deck, deck_id, card_id))
         else:
-            session.delete(card_in_deck)
-
-        session.commit()
+            seq = _delete_card_in_deck(deck_id, card_id, session)
+            session.commit()
+        popularity.record(deck_id, card_id, -1, seq)
 
     except HTTPException:
         raise
@@ -163,25 +224,34 @@ def delete_card_in_deck(
 @router.put("/{deck_id}", response_model=DeckRead, status_code=status.HTTP_200_OK)
 def put(deck_id : int, updated_deck : DeckUpdate,  session: Session = Depends(get_session)):
     """update a existing deck"""
-    deck = session.get(Deck, deck_id)
-
-    if (not deck):
-        raise HTTPException(404, f"Deck com ID {deck_id} não existe!")
-
     deck_dict = updated_deck.model_dump(exclude_unset=True)
     if not deck_dict:
         raise HTTPException(400, "Nenhum campo para atualizar")
-    
+
     try:
-        for key, value in deck_dict.items():
-            setattr(deck, key, value)
+        deck = session.scalars(
+            update(Deck).where(Deck.id == deck_id).values(**deck_dict).returning(Deck)
+        ).first()
+        if (not deck):
+            raise HTTPException(404, f"Deck com ID {deck_id} não existe!")
+        record_change(session, "deck", deck_id, ChangeOperation.update)
+        updated = DeckRead.model_validate(deck)
         session.commit()
-        session.refresh(deck)
-        return deck
-    
+
+    except HTTPException:
+        raise
+    except IntegrityError as e:
+        session.rollback()
+        if violated_constraint(e) == "unique":
+            raise HTTPException(400, "Usuário já tem deck com esse nome!")
+        raise HTTPException(400, f"Não foi posssível atualizar Deck com ID {deck_id}!")
     except Exception as e:
         session.rollback()
         raise HTTPException(400, f"Não foi posssível atualizar Deck com ID {deck_id}!")
+
+    if "format" in deck_dict:
+        popularity.request_resync()
+    return updated
     
 
 
@@ -194,9 +264,7 @@ def list_decks(
 ):
     """list all decks"""
     try:
-        decks = session.exec(
-            select(Deck).offset(skip).limit(limit)
-        ).all()
+        decks = session.exec(LIST_DECKS, params={"skip": skip, "limit": limit}).all()
         return decks
     
     except Exception as e:
@@ -204,38 +272,21 @@ def list_decks(
 
 
 
-@router.get("/stats/decks-by-format", status_code=status.HTTP_200_OK)
-def decks_by_format(
-    session: Session = Depends(get_session)
-):
-    """decks grouped by format"""
-    try:
-        rows = session.exec(
-            select(
-                Deck.format,
-                func.count(Deck.id).label("total_decks")
-            )
-            .group_by(Deck.format)
-        ).all()
-
-        return [
-            {
-                "format": row[0],
-                "total_decks": row[1],
-            }
-            for row in rows
-        ]
-    
-    except Exception as e:
-        raise HTTPException(status_code=500, detail="Houve um erro interno no servidor")
-    
+def _decks_by_format() -> list:
+    with RoutingSession(read_only=True) as session:
+        rows = session.exec(DECKS_BY_FORMAT).all()
 
+    return [
+        {
+            "format": row[0],
+            "total_decks": row[1],
+        }
+        for row in rows
+    ]
 
 
-@router.get("/average-cards-per-deck", status_code=status.HTTP_200_OK)
-def average_cards_per_deck(session: Session = Depends(get_session)):
-    """Average cards per deck"""
-    try:
+def _average_cards_per_deck() -> dict:
+    with RoutingSession(read_only=True) as session:
         subq = (
             select(
                 Deck.id,
@@ -246,15 +297,121 @@ def average_cards_per_deck(session: Session = Depends(get_session)):
             .subquery()
         )
         avg = session.exec(select(func.avg(subq.c.total_cards))).one()
-        return {
-            "average_cards_per_deck": avg
-        }
+
+    return {
+        "average_cards_per_deck": avg
+    }
+
+
+@router.get("/stats/decks-by-format", status_code=status.HTTP_200_OK)
+def decks_by_format():
+    """decks grouped by format"""
+    try:
+        return stats_cache.get("decks_by_format", _decks_by_format)
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Houve um erro interno no servidor")
+    
+
+
+
+@router.get("/average-cards-per-deck", status_code=status.HTTP_200_OK)
+def average_cards_per_deck():
+    """Average cards per deck"""
+    try:
+        return stats_cache.get("average_cards_per_deck", _average_cards_per_deck)
+
     except Exception as e:
         raise HTTPException(status_code=500, detail="Houve um erro interno no servidor")
     
 
 
 
+@router.get("/codes", status_code=status.HTTP_200_OK)
+def export_deck_codes(user_id: Optional[int] = None, session: Session = Depends(get_session)) -> Dict[int, str]:
+    """Deck codes of every deck (or of one user's decks), encoded in a single batch"""
+    decks = select(Deck.id, Deck.format)
+    links = select(DeckCardLink.deck_id, DeckCardLink.card_id, DeckCardLink.qty)
+    if user_id is not None:
+        decks = decks.where(Deck.user_id == user_id)
+        links = links.join(Deck, Deck.id == DeckCardLink.deck_id).where(Deck.user_id == user_id)
+
+    deck_rows = session.exec(decks).all()
+    link_rows = session.exec(links).all()
+    return encode_deck_codes(
+        [row[0] for row in deck_rows],
+        [row[1] for row in deck_rows],
+        [row[0] for row in link_rows],
+        [row[1] for row in link_rows],
+        [row[2] for row in link_rows],
+    )
+
+
+def _raise_deck_conflict(
+    session: Session, error: IntegrityError, user_ids: List[int], card_ids: Optional[List[int]] = None
+) -> None:
+    """Turn a failed deck insert into the 404/400 the old pre-checks returned; returns if the cause is unknown"""
+    constraint = violated_constraint(error)
+    if constraint == "unique":
+        raise HTTPException(400, "Usuário já tem deck com esse nome!")
+    if constraint != "foreign_key":
+        return
+    found = set(session.exec(select(User.id).where(User.id.in_(user_ids))).all())
+    missing = [user_id for user_id in user_ids if user_id not in found]
+    if len(user_ids) == 1 and missing:
+        raise HTTPException(404, f"Usuário com ID {user_ids[0]} não existe!")
+    if missing:
+        raise HTTPException(404, {"message": "Usuários não existem", "user_ids": missing})
+    if not card_ids:
+        return
+    found = set(session.exec(select(Card.id).where(Card.id.in_(card_ids))).all())
+    missing = [card_id for card_id in card_ids if card_id not in found]
+    if missing:
+        raise HTTPException(400, {"message": "O código tem cartas que não existem", "card_ids": missing})
+
+
+@router.post("/from-code", response_model=DeckWithCardsRead, status_code=status.HTTP_201_CREATED)
+def create_deck_from_code(data: DeckFromCode, session: Session = Depends(get_session)):
+    """Create a deck for a user from a deck code"""
+    try:
+        deck_format, cards = decode_deck_code(data.code)
+    except DeckCodeError as e:
+        raise HTTPException(400, str(e))
+
+    card_ids = [card_id for card_id, _ in cards]
+    try:
+        # usuário, nome e cartas são conferidos pelas constraints; só uma falha custa consultas extras
+        deck = session.scalars(
+            insert(Deck).returning(Deck),
+            [{"name": data.name, "format": deck_format, "user_id": data.user_id, "created_at": datetime.now()}],
+        ).one()
+        if cards:
+            session.execute(
+                insert(DeckCardLink), [{"deck_id": deck.id, "card_id": card_id, "qty": qty} for card_id, qty in cards]
+            )
+        change = record_change(session, "deck", deck.id, ChangeOperation.create)
+        session.flush()
+        seq = change.seq
+        created = DeckRead.model_validate(deck)
+        deck_cards = session.exec(select(Card).where(Card.id.in_(card_ids))).all() if card_ids else []
+        result = DeckWithCardsRead(
+            id=created.id, name=created.name, format=created.format,
+            cards=[CardRead.model_validate(card) for card in deck_cards],
+        )
+        session.commit()
+    except IntegrityError as e:
+        session.rollback()
+        _raise_deck_conflict(session, e, [data.user_id], card_ids)
+        raise HTTPException(500, "Erro ao criar deck!")
+    except Exception:
+        session.rollback()
+        raise HTTPException(500, "Erro ao criar deck!")
+
+    popularity.register_deck(created.id, created.format, created.created_at)
+    popularity.record_many(created.id, dict(cards), seq)
+    return result
+
+
 @router.get("/{deck_id}", response_model=DeckRead,status_code=status.HTTP_200_OK)
 def get_deck_by_id(deck_id : int, session: Session = Depends(get_session)):
     """Get Deck by ID"""
@@ -273,12 +430,7 @@ def search_deck_by_name(
 ):
     """search deck by partial name"""
     try:
-        decks = session.exec(
-            select(Deck)
-            .where(Deck.name.ilike(f"%{name}%"))
-            .offset(skip)
-            .limit(limit)
-        ).all()
+        decks = session.exec(SEARCH_DECKS, params={"pattern": f"%{name}%", "skip": skip, "limit": limit}).all()
 
         return decks
     
@@ -289,11 +441,7 @@ def search_deck_by_name(
 @router.get("/{deck_id}/with-cards", response_model=DeckWithCardsRead, status_code=status.HTTP_200_OK)
 def get_deck_with_cards(deck_id : int, session: Session = Depends(get_session)):
     """get deck informations and their respective cards"""
-    deck = session.exec(
-        select(Deck)
-        .where(Deck.id == deck_id)
-        .options(selectinload(Deck.cards))
-    ).first()
+    deck = session.exec(DECK_WITH_CARDS, params={"deck_id": deck_id}).first()
 
     if (not deck):
         raise HTTPException(404, "Deck não encontrado")
@@ -305,11 +453,266 @@ def get_deck_with_cards(deck_id : int, session: Session = Depends(get_session)):
 def count_cards_in_deck(deck_id : int,session : Session = Depends(get_session)):
     """count the total number of cards in the deck."""
     try:
-        count = session.exec(
-            select(func.sum(DeckCardLink.qty))
-            .where(DeckCardLink.deck_id == deck_id)
-        ).one()
+        count = session.exec(DECK_CARD_COUNT, params={"deck_id": deck_id}).one()
 
         return {"deck_id" : deck_id, "total_cards" : count or 0}
     except Exception as e:
-        raise HTTPException(status_code=500, detail="Houve um erro interno no servidor")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Houve um erro interno no servidor")
+
+
+@router.post("/{deck_id}/import", response_model=DecklistImportResult, status_code=status.HTTP_200_OK)
+def import_decklist(deck_id: int, data: DecklistImport, session: Session = Depends(get_session)):
+    """Fill a deck from a text decklist ("3 Card Name" per line) in one transaction"""
+    deck = session.get(Deck, deck_id)
+    if not deck:
+        raise HTTPException(404, f"Deck com ID {deck_id} não existe!")
+
+    try:
+        entries = parse_decklist(data.text)
+    except DecklistParseError as e:
+        raise HTTPException(400, {"message": "Lista de cartas inválida", "errors": e.errors})
+
+    # todos os nomes resolvidos numa única consulta
+    cards = session.exec(
+        select(Card.id, Card.name).where(func.lower(Card.name).in_(list(entries)))
+    ).all()
+    card_ids = {name.lower(): card_id for card_id, name in cards}
+
+    current = dict(session.exec(
+        select(DeckCardLink.card_id, DeckCardLink.qty).where(DeckCardLink.deck_id == deck_id)
+    ).all())
+
+    unknown, over_limit, wanted = [], [], {}
+    for key, (name, qty) in entries.items():
+        card_id = card_ids.get(key)
+        if card_id is None:
+            unknown.append(name)
+            continue
+        total = qty if data.replace else current.get(card_id, 0) + qty
+        if total > MAX_COPIES:
+            over_limit.append({"name": name, "qty": total, "max": MAX_COPIES})
+        wanted[card_id] = total
+
+    if unknown or over_limit:
+        raise HTTPException(400, {
+            "message": "A lista tem cartas desconhecidas ou acima do limite; nada foi importado",
+            "unknown": unknown,
+            "over_limit": over_limit,
+        })
+
+    try:
+        if data.replace:
+            session.exec(delete(DeckCardLink).where(DeckCardLink.deck_id == deck_id))
+            for card_id, qty in wanted.items():
+                session.add(DeckCardLink(deck_id=deck_id, card_id=card_id, qty=qty))
+        else:
+            existing = session.exec(
+                select(DeckCardLink).where(DeckCardLink.deck_id == deck_id, DeckCardLink.card_id.in_(list(wanted)))
+            ).all()
+            for link in existing:
+                link.qty = wanted.pop(link.card_id)
+                session.add(link)
+            for card_id, qty in wanted.items():
+                session.add(DeckCardLink(deck_id=deck_id, card_id=card_id, qty=qty))
+
+        change = record_change(session, "deck", deck_id, ChangeOperation.update)
+        session.flush()
+        seq = change.seq
+        session.commit()
+
+    except Exception:
+        session.rollback()
+        raise HTTPException(500, "Erro ao importar a lista de cartas")
+
+    links = session.exec(
+        select(DeckCardLink).where(DeckCardLink.deck_id == deck_id).order_by(DeckCardLink.card_id)
+    ).all()
+    imported = {link.card_id: link.qty for link in links}
+    popularity.record_many(
+        deck_id,
+        {card_id: imported.get(card_id, 0) - current.get(card_id, 0) for card_id in imported.keys() | current.keys()},
+        seq,
+    )
+    return {
+        "deck_id": deck_id,
+        "cards": [{"deck_id": deck_id, "card_id": link.card_id, "qty": link.qty} for link in links],
+        "total_cards": sum(link.qty for link in links),
+    }
+
+
+@router.get("/{deck_id}/export.txt", response_class=PlainTextResponse, status_code=status.HTTP_200_OK)
+def export_decklist(deck_id: int, session: Session = Depends(get_session)):
+    """Deck as a text decklist, one "qty Card Name" line per card"""
+    rows = session.exec(
+        select(Deck.id, DeckCardLink.qty, Card.name)
+        .outerjoin(DeckCardLink, DeckCardLink.deck_id == Deck.id)
+        .outerjoin(Card, Card.id == DeckCardLink.card_id)
+        .where(Deck.id == deck_id)
+        .order_by(Card.name)
+    ).all()
+    if not rows:
+        raise HTTPException(404, f"Deck com ID {deck_id} não existe!")
+
+    return format_decklist((qty, name) for _, qty, name in rows if name is not None)
+
+
+@router.get("/{deck_id}/code", response_model=DeckCode, status_code=status.HTTP_200_OK)
+def get_deck_code(deck_id: int, session: Session = Depends(get_session)):
+    """Compact shareable code for a deck"""
+    rows = session.exec(
+        select(Deck.format, DeckCardLink.card_id, DeckCardLink.qty)
+        .outerjoin(DeckCardLink, DeckCardLink.deck_id == Deck.id)
+        .where(Deck.id == deck_id)
+    ).all()
+    if not rows:
+        raise HTTPException(404, f"Deck com ID {deck_id} não existe!")
+
+    cards = [(card_id, qty) for _, card_id, qty in rows if card_id is not None]
+    return {"deck_id": deck_id, "code": encode_deck_code(rows[0][0], cards)}
+
+
+@router.post("/{deck_id}/clone", response_model=DeckRead, status_code=status.HTTP_201_CREATED)
+def clone_deck(deck_id: int, data: DeckClone, session: Session = Depends(get_session)):
+    """Copy a deck and its cards to a user in one transaction"""
+    try:
+        # o deck novo sai do próprio original (INSERT ... SELECT): sem linha, o original não existe
+        deck = session.scalars(
+            insert(Deck)
+            .from_select(
+                ["name", "format", "created_at", "user_id"],
+                select(
+                    literal(data.name, Deck.name.type) if data.name else Deck.name,
+                    Deck.format,
+                    literal(datetime.now(), Deck.created_at.type),
+                    literal(data.user_id),
+                ).where(Deck.id == deck_id),
+            )
+            .returning(Deck)
+        ).first()
+        if deck is None:
+            raise HTTPException(404, f"Deck com ID {deck_id} não existe!")
+        # as cartas são copiadas pelo próprio banco, sem passar pela aplicação
+        copied = session.execute(
+            insert(DeckCardLink)
+            .from_select(
+                ["deck_id", "card_id", "qty"],
+                select(literal(deck.id), DeckCardLink.card_id, DeckCardLink.qty).where(DeckCardLink.deck_id == deck_id),
+            )
+            .returning(DeckCardLink.card_id, DeckCardLink.qty)
+        ).all()
+        change = record_change(session, "deck", deck.id, ChangeOperation.create)
+        session.flush()
+        seq = change.seq
+        created = DeckRead.model_validate(deck)
+        session.commit()
+    except HTTPException:
+        raise
+    except IntegrityError as e:
+        session.rollback()
+        _raise_deck_conflict(session, e, [data.user_id])
+        raise HTTPException(500, "Erro ao clonar deck!")
+    except Exception:
+        session.rollback()
+        raise HTTPException(500, "Erro ao clonar deck!")
+
+    popularity.register_deck(created.id, created.format, created.created_at)
+    popularity.record_many(created.id, dict(copied), seq)
+    return created
+
+
+@router.post("/{deck_id}/clone-many", response_model=List[DeckRead], status_code=status.HTTP_201_CREATED)
+def clone_deck_to_users(deck_id: int, data: DeckCloneMany, session: Session = Depends(get_session)):
+    """Copy a deck to many users: one INSERT for the decks and one INSERT ... SELECT for all their cards"""
+    user_ids = list(dict.fromkeys(data.user_ids))
+    if not user_ids or len(user_ids) > MAX_CLONE_TARGETS:
+        raise HTTPException(400, f"Informe de 1 a {MAX_CLONE_TARGETS} usuários")
+
+    source = session.get(Deck, deck_id)
+    if not source:
+        raise HTTPException(404, f"Deck com ID {deck_id} não existe!")
+
+    name = data.name or source.name
+    cards = dict(session.exec(
+        select(DeckCardLink.card_id, DeckCardLink.qty).where(DeckCardLink.deck_id == deck_id)
+    ).all())
+
+    try:
+        created_at = datetime.now()
+        decks = session.scalars(
+            insert(Deck).returning(Deck),
+            [
+                {"name": name, "format": source.format, "user_id": user_id, "created_at": created_at}
+                for user_id in user_ids
+            ],
+        ).all()
+        new_ids = [deck.id for deck in decks]
+        session.execute(
+            insert(DeckCardLink).from_select(
+                ["deck_id", "card_id", "qty"],
+                select(Deck.id, DeckCardLink.card_id, DeckCardLink.qty)
+                .join_from(Deck, DeckCardLink, DeckCardLink.deck_id == deck_id)
+                .where(Deck.id.in_(new_ids)),
+            )
+        )
+        seq = max(record_changes(session, "deck", new_ids, ChangeOperation.create))
+        # lido antes do commit, que expiraria cada objeto e custaria um SELECT por deck
+        created = [DeckRead.model_validate(deck) for deck in decks]
+        session.commit()
+    except IntegrityError as e:
+        session.rollback()
+        # só numa falha se descobre quais usuários não existem ou já têm o nome
+        if violated_constraint(e) == "unique":
+            taken = session.exec(select(Deck.user_id).where(Deck.name == name, Deck.user_id.in_(user_ids))).all()
+            raise HTTPException(400, {"message": "Usuários já têm deck com esse nome", "user_ids": sorted(taken)})
+        _raise_deck_conflict(session, e, user_ids)
+        raise HTTPException(500, "Erro ao clonar deck!")
+    except Exception:
+        session.rollback()
+        raise HTTPException(500, "Erro ao clonar deck!")
+
+    for deck in created:
+        popularity.register_deck(deck.id, deck.format, deck.created_at)
+        popularity.record_many(deck.id, cards, seq)
+    return created
+
+
+def _simulation_cards(session: Session, deck_id: int) -> Optional[list]:
+    """``(card_id, qty, type)`` of the deck, or None if it does not exist; closes the session before the simulation"""
+    rows = session.exec(
+        select(Deck.id, DeckCardLink.card_id, DeckCardLink.qty, Card.type)
+        .outerjoin(DeckCardLink, DeckCardLink.deck_id == Deck.id)
+        .outerjoin(Card, Card.id == DeckCardLink.card_id)
+        .where(Deck.id == deck_id)
+    ).all()
+    session.close()
+    if not rows:
+        return None
+    return [(card_id, qty, card_type.value) for _, card_id, qty, card_type in rows if card_id is not None]
+
+
+@router.post("/{deck_id}/simulate", response_model=SimulationResult, status_code=status.HTTP_200_OK)
+async def simulate_draws(deck_id: int, data: SimulationRequest, session: Session = Depends(get_session)):
+    """Odds of drawing cards or card types in the opening hand and the next draws"""
+    cards = await run_in_threadpool(_simulation_cards, session, deck_id)
+    if cards is None:
+        raise HTTPException(404, f"Deck com ID {deck_id} não existe!")
+    if not cards:
+        raise HTTPException(400, "O deck não tem cartas")
+
+    request = data.model_dump(mode="json")
+    key = cache_key(cards, request)
+    result = simulation_cache.get(key)
+    cached = result is not None
+    if not cached:
+        try:
+            result = await simulate(
+                cards, data.hand_size, request["queries"], data.trials,
+                get_settings().simulation_parallel_min_trials,
+            )
+        except SimulationError as e:
+            raise HTTPException(400, str(e))
+        except PoolSaturatedError:
+            raise HTTPException(503, "Servidor ocupado, tente novamente", headers={"Retry-After": "1"})
+        simulation_cache.put(key, result)
+
+    return {"deck_id": deck_id, "trials": data.trials, "cached": cached, **result}
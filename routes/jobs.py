@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+from fastapi import APIRouter, HTTPException, Depends, status, Query
+from sqlmodel import Session
+from database import get_session
+from models.models import Job
+from routes.schemas.jobSchema import JobRead, JobEnqueued
+from services.catalog_snapshot import snapshot_store
+from services.changelog import compact_changes
+from services.coalescing import stats_cache
+from services.jobs import JobContext, JobQueueFullError, job_runner
+
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+
+def enqueue_job(session: Session, kind: str, params: Optional[Dict[str, Any]] = None) -> Job:
+    try:
+        return job_runner.enqueue(session, kind, params)
+    except JobQueueFullError:
+        raise HTTPException(503, "Fila de jobs cheia, tente novamente", headers={"Retry-After": "5"})
+
+
+@job_runner.register("rebuild_stats")
+def rebuild_stats_job(ctx: JobContext):
+    refreshed = stats_cache.refresh_all(on_progress=ctx.progress)
+    return {"refreshed": refreshed}
+
+
+@job_runner.register("rebuild_catalog_snapshot")
+def rebuild_catalog_snapshot_job(ctx: JobContext):
+    return {"hash": snapshot_store.rebuild().hash}
+
+
+@job_runner.register("compact_changes")
+def compact_changes_job(ctx: JobContext, older_than_days: int):
+    with ctx.session() as session:
+        deleted = compact_changes(session, datetime.now() - timedelta(days=older_than_days))
+    return {"deleted": deleted}
+
+
+@router.post("/stats-rebuild", response_model=JobEnqueued, status_code=status.HTTP_202_ACCEPTED)
+def enqueue_stats_rebuild(session: Session = Depends(get_session)):
+    """Recompute the cached aggregate stats in the background"""
+    job = enqueue_job(session, "rebuild_stats")
+    return {"job_id": job.id, "status": job.status}
+
+
+@router.post("/catalog-snapshot", response_model=JobEnqueued, status_code=status.HTTP_202_ACCEPTED)
+def enqueue_catalog_snapshot(session: Session = Depends(get_session)):
+    """Rebuild the catalog snapshot in the background"""
+    job = enqueue_job(session, "rebuild_catalog_snapshot")
+    return {"job_id": job.id, "status": job.status}
+
+
+@router.post("/changes-compaction", response_model=JobEnqueued, status_code=status.HTTP_202_ACCEPTED)
+def enqueue_changes_compaction(
+    older_than_days: int = Query(30, ge=0),
+    session: Session = Depends(get_session),
+):
+    """Compact the change log in the background"""
+    job = enqueue_job(session, "compact_changes", {"older_than_days": older_than_days})
+    return {"job_id": job.id, "status": job.status}
+
+
+@router.get("/{job_id}", response_model=JobRead, status_code=status.HTTP_200_OK)
+def get_job_by_id(job_id: int, session: Session = Depends(get_session)):
+    """Get Job by ID, with its progress"""
+    job = session.get(Job, job_id)
+    if not job:
+        raise HTTPException(404, f"Job com ID {job_id} não existe!")
+    return job
+
+
+@router.post("/{job_id}/cancel", response_model=JobRead, status_code=status.HTTP_200_OK)
+def cancel_job(job_id: int, session: Session = Depends(get_session)):
+    """Cancel a queued job, or ask a running one to stop"""
+    job = session.get(Job, job_id)
+    if not job:
+        raise HTTPException(404, f"Job com ID {job_id} não existe!")
+    return job_runner.cancel(session, job)
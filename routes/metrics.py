@@ -0,0 +1,11 @@
+from fastapi import APIRouter, status
+from services.metrics import registry
+
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"])
+
+
+@router.get("/", status_code=status.HTTP_200_OK)
+def read_metrics():
+    """Current value of every registered metric"""
+    return registry.snapshot()
@@ -0,0 +1,21 @@
+from typing import List
+from fastapi import HTTPException, Query
+
+
+def id_list(
+    ids: List[str] = Query([], description="Repeated (?ids=1&ids=2) or comma separated (?ids=1,2)"),
+) -> List[int]:
+    """Ids of a batch route, accepting both query string forms"""
+    parsed = []
+    for value in ids:
+        for part in value.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            try:
+                parsed.append(int(part))
+            except ValueError:
+                raise HTTPException(400, f"Id inválido: '{part}'")
+    if not parsed:
+        raise HTTPException(400, "Informe ao menos um id!")
+    return parsed
@@ -0,0 +1,49 @@
+import hmac
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import HTMLResponse
+import database
+from services.profiling import RequestProfile, profile_store
+
+
+def require_profile_token(x_profile_token: Optional[str] = Header(None)) -> None:
+    token = database.get_settings().profile_token
+    if not token or not x_profile_token or not hmac.compare_digest(x_profile_token, token):
+        raise HTTPException(403, "Acesso negado aos perfis")
+
+
+router = APIRouter(prefix="/profiles", tags=["Profiles"], dependencies=[Depends(require_profile_token)])
+
+
+def _get_profile(profile_id: str) -> RequestProfile:
+    profile = profile_store.get(profile_id)
+    if not profile:
+        raise HTTPException(404, f"Perfil {profile_id} não existe!")
+    return profile
+
+
+@router.get("/", status_code=status.HTTP_200_OK)
+def list_profiles() -> List[dict]:
+    """Most recent request profiles"""
+    return [
+        {"id": p.id, "method": p.method, "path": p.path, "status": p.status, "duration": round(p.duration, 6)}
+        for p in profile_store.list()
+    ]
+
+
+@router.get("/{profile_id}", status_code=status.HTTP_200_OK)
+def get_profile(profile_id: str):
+    """Phase split and hottest functions of a profiled request"""
+    return _get_profile(profile_id).summary()
+
+
+@router.get("/{profile_id}/speedscope", status_code=status.HTTP_200_OK)
+def get_profile_speedscope(profile_id: str):
+    """Sampled stacks in speedscope format (open at https://www.speedscope.app)"""
+    return _get_profile(profile_id).speedscope()
+
+
+@router.get("/{profile_id}/html", response_class=HTMLResponse, status_code=status.HTTP_200_OK)
+def get_profile_html(profile_id: str):
+    """Human readable report"""
+    return _get_profile(profile_id).html()
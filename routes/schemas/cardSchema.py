@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Dict, List, Optional
 from sqlmodel import SQLModel
 from models.models import CardType, CardRarity
 
@@ -25,3 +25,27 @@ class CardUpdate(SQLModel):
     rarity: Optional[CardRarity] = None
     text: Optional[str] = None
     collection_id: Optional[int] = None
+
+
+class CardFacets(SQLModel):
+    type: Dict[str, int] = {}
+    rarity: Dict[str, int] = {}
+    collection: Dict[int, int] = {}
+
+
+class CardQueryPage(SQLModel):
+    cards: List[CardRead]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+    facets: Optional[CardFacets] = None
+
+
+class CardSuggestion(SQLModel):
+    id: int
+    name: str
+
+
+class PopularCard(SQLModel):
+    id: int
+    name: str
+    qty: int
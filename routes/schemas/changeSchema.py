@@ -0,0 +1,18 @@
+from typing import List
+from sqlmodel import SQLModel
+from datetime import datetime
+from models.models import ChangeOperation
+
+
+class ChangeRead(SQLModel):
+    seq: int
+    entity_type: str
+    entity_id: int
+    operation: ChangeOperation
+    changed_at: datetime
+
+
+class ChangePage(SQLModel):
+    changes: List[ChangeRead]
+    next_since: int
+    has_more: bool
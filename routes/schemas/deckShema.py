@@ -1,8 +1,10 @@
 from typing import Optional, List
-from sqlmodel import SQLModel
+from pydantic import model_validator
+from sqlmodel import Field, SQLModel
 from datetime import datetime
-from models.models import DeckFormat
+from models.models import CardType, DeckFormat
 from routes.schemas.cardSchema import CardRead
+from routes.schemas.collectionSchema import CollectionRead
 
 class DeckBase(SQLModel):
     name : str
@@ -29,4 +31,91 @@ class DeckWithCardsRead(SQLModel):
     id: int
     name: str
     format: DeckFormat
-    cards: List[CardRead]
\ No newline at end of file
+    cards: List[CardRead]
+
+class DecklistImport(SQLModel):
+    text: str
+    # True: a lista substitui as cartas do deck; False: soma às que já estão lá
+    replace: bool = True
+
+
+class DecklistImportResult(SQLModel):
+    deck_id: int
+    cards: List[DeckCardsLinkRead]
+    total_cards: int
+
+
+class DeckCode(SQLModel):
+    deck_id: int
+    code: str
+
+
+class DeckFromCode(SQLModel):
+    code: str
+    name: str
+    user_id: int
+
+
+class DeckClone(SQLModel):
+    user_id: int
+    # sem nome, a cópia fica com o nome do deck original
+    name: Optional[str] = None
+
+
+class DeckCloneMany(SQLModel):
+    user_ids: List[int]
+    name: Optional[str] = None
+
+
+class DeckCardEntry(CardRead):
+    qty: int
+    # só vem preenchida com include=cards.collection
+    collection: Optional[CollectionRead] = None
+
+
+class DeckWithCardEntries(DeckRead):
+    cards: List[DeckCardEntry]
+
+
+MAX_SIMULATION_QUERIES = 20
+MAX_SIMULATION_TRIALS = 10_000_000
+
+
+class DrawCondition(SQLModel):
+    # uma carta específica ou um tipo de carta
+    card_id: Optional[int] = None
+    type: Optional[CardType] = None
+    at_least: int = Field(default=1, ge=1)
+
+    @model_validator(mode="after")
+    def card_or_type(self) -> "DrawCondition":
+        if (self.card_id is None) == (self.type is None):
+            raise ValueError("Cada condição precisa de card_id ou de type (só um dos dois)")
+        return self
+
+
+class DrawQuery(SQLModel):
+    # compras depois da mão inicial (0 = só a mão inicial)
+    turn: int = Field(default=0, ge=0)
+    conditions: List[DrawCondition] = Field(min_length=1)
+
+
+class SimulationRequest(SQLModel):
+    hand_size: int = Field(default=7, ge=1)
+    trials: int = Field(default=200_000, ge=1_000, le=MAX_SIMULATION_TRIALS)
+    queries: List[DrawQuery] = Field(min_length=1, max_length=MAX_SIMULATION_QUERIES)
+
+
+class DrawQueryResult(SQLModel):
+    probability: float
+    method: str
+    cards_seen: int
+    stderr: Optional[float] = None
+
+
+class SimulationResult(SQLModel):
+    deck_id: int
+    deck_size: int
+    trials: int
+    cached: bool
+    results: List[DrawQueryResult]
@@ -0,0 +1,25 @@
+from typing import Any, Dict, Optional
+from sqlmodel import SQLModel
+from datetime import datetime
+from models.models import JobStatus
+
+
+class JobRead(SQLModel):
+    id: int
+    kind: str
+    status: JobStatus
+    progress: int
+    total: Optional[int] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    cancel_requested: bool
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    worker_id: Optional[str] = None
+    heartbeat_at: Optional[datetime] = None
+
+
+class JobEnqueued(SQLModel):
+    job_id: int
+    status: JobStatus
@@ -1,6 +1,8 @@
-from typing import Optional
+from typing import Dict, List, Optional
 from sqlmodel import SQLModel
 from datetime import datetime
+from models.models import DeckFormat
+from routes.schemas.deckShema import DeckWithCardEntries
 
 
 class UserBase(SQLModel):
@@ -21,3 +23,29 @@ class UserUpdate(SQLModel):
     name: Optional[str] = None
     email: Optional[str] = None
     password: Optional[str] = None
+
+
+class UserLogin(SQLModel):
+    email: str
+    password: str
+
+
+class UserDeckSummary(SQLModel):
+    id: int
+    name: str
+    format: DeckFormat
+    created_at: datetime
+    total_cards: int
+
+
+class UserSummary(SQLModel):
+    user: UserRead
+    deck_count: int
+    decks_by_format: Dict[str, int]
+    total_cards: int
+    recent_decks: List[UserDeckSummary]
+
+
+class UserDecksPage(SQLModel):
+    decks: List[DeckWithCardEntries]
+    next_cursor: Optional[str] = None
@@ -1,38 +1,94 @@
-from typing import List
-from fastapi import APIRouter, HTTPException, Depends, status
+from typing import List, Optional, Union
+from fastapi import APIRouter, HTTPException, Depends, status, Query
+from starlette.concurrency import run_in_threadpool
 from sqlmodel import Session, select
-from sqlalchemy import func
-from database import get_session
-from models.models import User, Deck
-from routes.schemas.userSchema import UserCreate, UserRead, UserUpdate
+from sqlalchemy import func, delete, insert, update, cast, literal, null, true, union_all, Integer, String, DateTime
+from sqlalchemy.exc import IntegrityError
+from database import get_session, RoutingSession, violated_constraint
+from models.models import User, Card, Collection, Deck, DeckCardLink, ChangeOperation
+from routes.schemas.userSchema import UserCreate, UserRead, UserUpdate, UserLogin, UserSummary, UserDecksPage
 from routes.schemas.deckShema import DeckRead
+from routes.schemas.jobSchema import JobEnqueued
+from routes.jobs import enqueue_job
+from services.changelog import record_change, record_changes, record_changes_from
+from services.coalescing import user_summary_cache
+from services.jobs import JobContext, job_runner
+from services.keyset import InvalidCursorError, decode_cursor, encode_cursor
+from services.popularity import popularity
+from services.process_pool import PoolSaturatedError
+from services.security import hash_password_async, verify_password_async
 from typing import Dict
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
 from pydantic import ValidationError
 
-@router.post("/", response_model=UserRead, status_code=status.HTTP_201_CREATED)
-def create_user(data: UserCreate, session: Session = Depends(get_session)):
-    """"Create a new user"""
-    existing = session.exec(select(User).where(User.email == data.email)).first()
 
-    if existing:
-        raise HTTPException(status_code=400, detail="Email já cadastrado!")
+def _server_busy() -> HTTPException:
+    return HTTPException(503, "Servidor ocupado, tente novamente", headers={"Retry-After": "1"})
+
+
+async def _hash_password(password: str) -> str:
+    try:
+        return await hash_password_async(password)
+    except PoolSaturatedError:
+        raise _server_busy()
+
+
+# as funções abaixo fecham a sessão antes de aguardar o hash, para não segurar
+# uma conexão do pool enquanto a senha é processada
+def _find_user(session: Session, **filters) -> User | None:
+    user = session.exec(select(User).filter_by(**filters)).first()
+    session.close()
+    return user
+
 
+def _insert_user(session: Session, data: UserCreate, password_hash: str) -> UserRead:
     try:
-        user = User.model_validate(data)
-        session.add(user)
+        # email repetido é barrado pela constraint unique, sem SELECT antes
+        user = session.scalars(
+            insert(User).returning(User),
+            [User.model_validate({**data.model_dump(), "password": password_hash}).model_dump(exclude={"id"})],
+        ).one()
+        record_change(session, "user", user.id, ChangeOperation.create)
+        created = UserRead.model_validate(user)
         session.commit()
-        session.refresh(user)
-        return user
+        return created
 
     except ValidationError as e:
         raise HTTPException(status_code=422, detail=e.errors())
 
+    except IntegrityError as e:
+        session.rollback()
+        if violated_constraint(e) == "unique":
+            raise HTTPException(status_code=400, detail="Email já cadastrado!")
+        raise HTTPException(status_code=500, detail="Erro ao criar usuário!")
+
     except Exception:
         raise HTTPException(status_code=500, detail="Erro ao criar usuário!")
 
+
+@router.post("/", response_model=UserRead, status_code=status.HTTP_201_CREATED)
+async def create_user(data: UserCreate, session: Session = Depends(get_session)):
+    """"Create a new user"""
+    password_hash = await _hash_password(data.password)
+    return await run_in_threadpool(_insert_user, session, data, password_hash)
+
+
+@router.post("/login", response_model=UserRead, status_code=status.HTTP_200_OK)
+async def login(data: UserLogin, session: Session = Depends(get_session)):
+    """Check a user's email and password"""
+    user = await run_in_threadpool(_find_user, session, email=data.email)
+
+    try:
+        valid = await verify_password_async(data.password, user.password if user else None)
+    except PoolSaturatedError:
+        raise _server_busy()
+
+    if not valid:
+        raise HTTPException(401, "Email ou senha inválidos!")
+    return user
+
 @router.get("/{user_id}", response_model=UserRead, status_code=status.HTTP_200_OK)
 def get_user_by_id(user_id: int, session: Session = Depends(get_session)):
     """get User by ID"""
@@ -51,12 +107,95 @@ def list_users(session: Session = Depends(get_session)):
 @router.get("/{user_id}/decks/count", response_model=int, status_code=status.HTTP_200_OK)
 def count_user_decks(user_id: int, session: Session = Depends(get_session)):
     """Return the number of decks for a user by ID"""
-    user = session.get(User, user_id)
-    if not user:
+    deck_count = (
+        select(func.count(Deck.id))
+        .where(Deck.user_id == User.id)
+        .scalar_subquery()
+    )
+    row = session.exec(select(User.id, deck_count).where(User.id == user_id)).first()
+    if row is None:
         raise HTTPException(404, f"Usuário com ID {user_id} não existe!")
+    return row[1]
 
-    decks = session.exec(select(Deck).where(Deck.user_id == user_id)).all()
-    return len(decks)
+
+def _user_summary(user_id: int, recent: int) -> dict | None:
+    """User, deck counts, card totals and latest decks from a single query"""
+    deck_totals = (
+        select(
+            Deck.id,
+            Deck.name,
+            Deck.format,
+            Deck.created_at,
+            func.coalesce(func.sum(DeckCardLink.qty), 0).label("cards"),
+        )
+        .outerjoin(DeckCardLink, DeckCardLink.deck_id == Deck.id)
+        .where(Deck.user_id == user_id)
+        .group_by(Deck.id)
+        .cte("deck_totals")
+    )
+    # linhas "format" trazem os agregados; linhas "recent" trazem os últimos decks
+    by_format = select(
+        literal("format", String).label("kind"),
+        deck_totals.c.format,
+        func.count().label("decks"),
+        func.sum(deck_totals.c.cards).label("cards"),
+        cast(null(), Integer).label("deck_id"),
+        cast(null(), String).label("deck_name"),
+        cast(null(), DateTime).label("deck_created_at"),
+    ).group_by(deck_totals.c.format)
+    latest = (
+        select(deck_totals)
+        .order_by(deck_totals.c.created_at.desc(), deck_totals.c.id.desc())
+        .limit(recent)
+        .subquery()
+    )
+    recent_decks = select(
+        literal("recent", String),
+        latest.c.format,
+        literal(1, Integer),
+        latest.c.cards,
+        latest.c.id,
+        latest.c.name,
+        latest.c.created_at,
+    )
+    parts = union_all(by_format, recent_decks).subquery("parts")
+
+    with RoutingSession(read_only=True) as session:
+        rows = session.exec(
+            select(User, parts).outerjoin(parts, true()).where(User.id == user_id)
+        ).all()
+        if not rows:
+            return None
+
+        summary = {
+            "user": UserRead.model_validate(rows[0][0]).model_dump(),
+            "deck_count": 0,
+            "decks_by_format": {},
+            "total_cards": 0,
+            "recent_decks": [],
+        }
+        for _, kind, deck_format, decks, cards, deck_id, name, created_at in rows:
+            if kind == "format":
+                key = getattr(deck_format, "value", str(deck_format))
+                summary["decks_by_format"][key] = int(decks)
+                summary["deck_count"] += int(decks)
+                summary["total_cards"] += int(cards)
+            elif kind == "recent":
+                summary["recent_decks"].append({
+                    "id": deck_id, "name": name, "format": deck_format,
+                    "created_at": created_at, "total_cards": int(cards),
+                })
+        summary["recent_decks"].sort(key=lambda d: (d["created_at"], d["id"]), reverse=True)
+        return summary
+
+
+@router.get("/{user_id}/summary", response_model=UserSummary, status_code=status.HTTP_200_OK)
+def get_user_summary(user_id: int, recent: int = Query(5, ge=0, le=50)):
+    """Return the user with deck counts, total cards and latest decks"""
+    summary = user_summary_cache.get((user_id, recent), lambda: _user_summary(user_id, recent))
+    if summary is None:
+        raise HTTPException(404, f"Usuário com ID {user_id} não existe!")
+    return summary
 
 
 @router.get("/{user_id}/decks/count-by-format", status_code=status.HTTP_200_OK)
@@ -80,15 +219,73 @@ def count_user_decks_by_format(user_id: int, session: Session = Depends(get_sess
     return result
 
 
-@router.get("/{user_id}/decks", response_model=List[DeckRead], status_code=status.HTTP_200_OK)
-def list_user_decks(user_id: int, session: Session = Depends(get_session)):
-    """Return all decks for a user by ID"""
+DECK_INCLUDES = ("cards", "cards.collection")
+
+
+def _user_decks_page(session: Session, user_id: int, include: set, cursor: Optional[str], limit: int) -> dict:
+    """One page of decks (newest first) with their cards: one query per level, whatever the number of decks"""
+    statement = select(Deck).where(Deck.user_id == user_id)
+    if cursor:
+        try:
+            (last_id,) = decode_cursor(cursor, tag="user_decks")
+        except (InvalidCursorError, ValueError):
+            last_id = None
+        if not isinstance(last_id, int):
+            raise HTTPException(400, "Cursor inválido!")
+        statement = statement.where(Deck.id < last_id)
+    decks = session.exec(statement.order_by(Deck.id.desc()).limit(limit + 1)).all()
+
+    next_cursor = None
+    if len(decks) > limit:
+        decks = decks[:limit]
+        next_cursor = encode_cursor([decks[-1].id], tag="user_decks")
+
+    cards_by_deck = {deck.id: [] for deck in decks}
+    rows = session.exec(
+        select(DeckCardLink.deck_id, DeckCardLink.qty, Card)
+        .join(Card, Card.id == DeckCardLink.card_id)
+        .where(DeckCardLink.deck_id.in_(list(cards_by_deck)))
+        .order_by(DeckCardLink.deck_id, Card.name, Card.id)
+    ).all() if decks else []
+
+    collections = {}
+    if "cards.collection" in include and rows:
+        collection_ids = {card.collection_id for _, _, card in rows}
+        collections = {c.id: c for c in session.exec(select(Collection).where(Collection.id.in_(collection_ids))).all()}
+
+    for deck_id, qty, card in rows:
+        entry = card.model_dump()
+        entry["qty"] = qty
+        entry["collection"] = collections.get(card.collection_id)
+        cards_by_deck[deck_id].append(entry)
+
+    return {
+        "decks": [{**deck.model_dump(), "cards": cards_by_deck[deck.id]} for deck in decks],
+        "next_cursor": next_cursor,
+    }
+
+
+@router.get("/{user_id}/decks", response_model=Union[UserDecksPage, List[DeckRead]], status_code=status.HTTP_200_OK)
+def list_user_decks(
+    user_id: int,
+    include: Optional[str] = Query(None, description="cards ou cards.collection: traz as cartas de cada deck"),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    session: Session = Depends(get_session),
+):
+    """Return all decks for a user by ID, or a page of decks with their cards when ``include`` is given"""
     user = session.get(User, user_id)
     if not user:
         raise HTTPException(404, f"Usuário com ID {user_id} não existe!")
 
-    decks = session.exec(select(Deck).where(Deck.user_id == user_id)).all()
-    return decks
+    if not include:
+        decks = session.exec(select(Deck).where(Deck.user_id == user_id)).all()
+        return decks
+
+    requested = {item.strip() for item in include.split(",")}
+    if not requested <= set(DECK_INCLUDES):
+        raise HTTPException(400, f"include inválido: use {' ou '.join(DECK_INCLUDES)}")
+    return _user_decks_page(session, user_id, requested, cursor, limit)
 
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -99,31 +296,87 @@ def delete_user_by_id(user_id: int, session: Session = Depends(get_session)):
         raise HTTPException(404, f"Usuário com ID {user_id} não existe!")
 
     try:
+        # os decks (e suas cartas) saem por ON DELETE CASCADE, sem carregar nada no ORM
+        record_changes_from(session, "deck", select(Deck.id).where(Deck.user_id == user_id), ChangeOperation.delete)
         session.delete(user)
+        record_change(session, "user", user_id, ChangeOperation.delete)
         session.commit()
+        popularity.request_resync()
     except Exception as e:
         session.rollback()
         raise HTTPException(400, f"Houve um problema ao deletar o Usuário com ID {user_id}!")
 
 
-@router.put("/{user_id}", response_model=UserRead, status_code=status.HTTP_200_OK)
-def put(user_id: int, updated_user: UserUpdate,  session: Session = Depends(get_session)):
-    user = session.get(User, user_id)
+DELETE_CHUNK_SIZE = 500
+
+
+@job_runner.register("delete_user")
+def delete_user_job(ctx: JobContext, user_id: int):
+    """Delete a user's decks in chunks, then the user"""
+    with ctx.session() as session:
+        deck_ids = session.exec(select(Deck.id).where(Deck.user_id == user_id)).all()
+
+    ctx.progress(0, len(deck_ids))
+    for start in range(0, len(deck_ids), DELETE_CHUNK_SIZE):
+        chunk = deck_ids[start:start + DELETE_CHUNK_SIZE]
+        with ctx.session() as session:
+            session.execute(delete(Deck).where(Deck.id.in_(chunk)))
+            record_changes(session, "deck", chunk, ChangeOperation.delete)
+            session.commit()
+        popularity.request_resync()
+        ctx.progress(start + len(chunk))
+
+    with ctx.session() as session:
+        session.execute(delete(User).where(User.id == user_id))
+        record_change(session, "user", user_id, ChangeOperation.delete)
+        session.commit()
+
+    return {"deleted_decks": len(deck_ids)}
+
 
+@router.post("/{user_id}/delete-job", response_model=JobEnqueued, status_code=status.HTTP_202_ACCEPTED)
+def enqueue_user_deletion(user_id: int, session: Session = Depends(get_session)):
+    """Delete a user and all their decks in the background"""
+    user = session.get(User, user_id)
     if (not user):
         raise HTTPException(404, f"Usuário com ID {user_id} não existe!")
 
-    user_dict = updated_user.model_dump(exclude_unset=True)
-    if not user_dict:
-        raise HTTPException(400, "Nenhum campo para atualizar")
-    
+    job = enqueue_job(session, "delete_user", {"user_id": user_id})
+    return {"job_id": job.id, "status": job.status}
+
+
+def _apply_user_update(session: Session, user_id: int, user_dict: dict) -> UserRead:
     try:
-        for key, value in user_dict.items():
-            setattr(user, key, value)
+        user = session.scalars(
+            update(User).where(User.id == user_id).values(**user_dict).returning(User)
+        ).first()
+        if (not user):
+            raise HTTPException(404, f"Usuário com ID {user_id} não existe!")
+        record_change(session, "user", user_id, ChangeOperation.update)
+        updated = UserRead.model_validate(user)
         session.commit()
-        session.refresh(user)
-        return user
-    
+        return updated
+
+    except HTTPException:
+        raise
+    except IntegrityError as e:
+        session.rollback()
+        if violated_constraint(e) == "unique":
+            raise HTTPException(400, "Email já cadastrado!")
+        raise HTTPException(400, f"Não foi possível atualizar Usuário com ID {user_id}!")
     except Exception as e:
         session.rollback()
         raise HTTPException(400, f"Não foi possível atualizar Usuário com ID {user_id}!")
+
+
+@router.put("/{user_id}", response_model=UserRead, status_code=status.HTTP_200_OK)
+async def put(user_id: int, updated_user: UserUpdate,  session: Session = Depends(get_session)):
+    user_dict = updated_user.model_dump(exclude_unset=True)
+    if not user_dict:
+        raise HTTPException(400, "Nenhum campo para atualizar")
+
+    # sem SELECT antes: um id inexistente só aparece no UPDATE (404), depois do hash
+    if user_dict.get("password") is not None:
+        user_dict["password"] = await _hash_password(user_dict["password"])
+
+    return await run_in_threadpool(_apply_user_update, session, user_id, user_dict)
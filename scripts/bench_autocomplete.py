@@ -0,0 +1,80 @@
+#BENCHMARK DO AUTOCOMPLETE EM MEMÓRIA COM MUITOS NOMES
+#
+# Gera N nomes de carta sintéticos (padrão: 1 milhão), carrega o índice e mede
+# a latência de buscas por prefixo e com erro de digitação (p50/p99), além do
+# tempo de carga e da memória usada pelo índice.
+#
+#   python scripts/bench_autocomplete.py [--names 1000000] [--queries 5000]
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.autocomplete import AutocompleteIndex
+
+WORDS = [
+    "Dragon", "Blue", "Eyes", "White", "Dark", "Magician", "Ancient", "Warrior", "Flame", "Shadow",
+    "Crystal", "Storm", "Knight", "Mage", "Dinosaur", "Spell", "Golden", "Iron", "Silent", "Thunder",
+    "Ember", "Frost", "Venom", "Celestial", "Abyss", "Raging", "Sacred", "Cursed", "Titan", "Phoenix",
+]
+
+
+def make_names(n: int, rng: random.Random) -> list:
+    names = set()
+    while len(names) < n:
+        names.add(f"{' '.join(rng.sample(WORDS, rng.randint(2, 4)))} {rng.randrange(10_000)}")
+    return list(names)
+
+
+def typo(text: str, rng: random.Random) -> str:
+    i = rng.randrange(1, len(text) - 1)
+    kind = rng.randrange(3)
+    if kind == 0:
+        return text[:i] + text[i + 1:]
+    if kind == 1:
+        return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+    return text[:i] + rng.choice("abcdefghijklmnopqrstuvwxyz") + text[i + 1:]
+
+
+def measure(index: AutocompleteIndex, queries: list) -> tuple:
+    latencies = []
+    hits = 0
+    for q in queries:
+        started = time.perf_counter()
+        results = index.search(q, 10)
+        latencies.append((time.perf_counter() - started) * 1e6)
+        hits += bool(results)
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    return statistics.median(latencies), p99, hits / len(queries)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--names", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=5000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    names = make_names(args.names, rng)
+
+    tracemalloc.start()
+    index = AutocompleteIndex(max_entries=args.names)
+    started = time.perf_counter()
+    index.load(enumerate(names, start=1))
+    load_seconds = time.perf_counter() - started
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{args.names} nomes: carga {load_seconds:.1f}s, índice ~{memory / 2**20:.0f} MiB")
+
+    sample = rng.sample(names, args.queries)
+    prefixes = [name[:rng.randint(2, 10)] for name in sample]
+    typos = [typo(name[:rng.randint(5, 12)], rng) for name in sample]
+    for label, queries in (("prefixo", prefixes), ("com erro", typos)):
+        p50, p99, hit_rate = measure(index, queries)
+        print(f"{label:>9}: p50 {p50:6.0f} µs | p99 {p99:6.0f} µs | com resultado {hit_rate:.0%}")
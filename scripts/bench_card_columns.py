@@ -0,0 +1,100 @@
+#BENCHMARK: ESTATÍSTICAS E FILTROS DE CARTAS NO BANCO x NAS COLUNAS EM MEMÓRIA
+#
+# Cria N cartas sintéticas num SQLite novo, monta as colunas (e as grava em
+# disco para carregar via mmap) e compara o tempo das contagens por tipo,
+# raridade e coleção e da listagem por coleção feitas com SQL e com numpy.
+#
+#   python scripts/bench_card_columns.py [--cards 200000] [--repeat 20]
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import func, insert
+from sqlmodel import SQLModel, Session, select
+
+import database
+from models.models import Card, CardRarity, CardType, Collection
+from services.card_columns import CardColumns
+from settings import Settings
+
+
+def seed(n_cards: int, n_collections: int) -> None:
+    SQLModel.metadata.create_all(database.get_engine())
+    rng = random.Random(42)
+    with Session(database.get_engine()) as session:
+        session.execute(insert(Collection), [
+            {"name": f"Collection {i}", "release_date": date(2024, 1, 1)} for i in range(n_collections)
+        ])
+        session.execute(insert(Card), [
+            {
+                "name": f"Card {i}",
+                "type": rng.choice(list(CardType)),
+                "rarity": rng.choice(list(CardRarity)),
+                "text": None if i % 3 else f"Text {i}",
+                "collection_id": rng.randint(1, n_collections),
+            }
+            for i in range(n_cards)
+        ])
+        session.commit()
+
+
+def timed(fn, repeat: int) -> float:
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        runs.append((time.perf_counter() - started) * 1000)
+    return statistics.median(runs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cards", type=int, default=200_000)
+    parser.add_argument("--collections", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    database.configure(Settings(database_url=f"sqlite:///{directory}/bench.db", sql_echo=False))
+    seed(args.cards, args.collections)
+
+    with Session(database.get_engine()) as session:
+        started = time.perf_counter()
+        cards = session.exec(
+            select(Card.id, Card.collection_id, Card.type, Card.rarity, Card.name, Card.text).order_by(Card.id)
+        ).all()
+        collections = session.exec(select(Collection.id, Collection.name).order_by(Collection.id)).all()
+        built = CardColumns.from_rows(cards, collections)
+        build_ms = (time.perf_counter() - started) * 1000
+    built.save(os.path.join(directory, "columns"))
+    columns = CardColumns.load(os.path.join(directory, "columns"))
+    print(f"{args.cards} cartas: build {build_ms:.0f} ms, {columns.nbytes / 2**20:.1f} MiB em arquivo (mmap)")
+
+    def sql(statement):
+        def run():
+            with Session(database.get_engine()) as session:
+                session.exec(statement).all()
+        return run
+
+    cases = [
+        ("por tipo", sql(select(Card.type, func.count()).group_by(Card.type)), columns.count_by_type),
+        ("por raridade", sql(select(Card.rarity, func.count()).group_by(Card.rarity)), columns.count_by_rarity),
+        ("por coleção", sql(select(Card.collection_id, func.count()).group_by(Card.collection_id)),
+         columns.count_by_collection),
+        ("facetas filtradas", sql(
+            select(Card.type, func.count()).where(Card.rarity.in_([CardRarity.Rare]), Card.collection_id.in_([1, 2, 3]))
+            .group_by(Card.type)
+        ), lambda: columns.count_by_type(columns.mask([1, 2, 3], None, [CardRarity.Rare]))),
+        ("cartas da coleção 7", sql(select(Card).where(Card.collection_id == 7).limit(50)),
+         lambda: columns.by_collection(7, 0, 50)),
+    ]
+    for label, db_fn, columns_fn in cases:
+        db_ms, columns_ms = timed(db_fn, args.repeat), timed(columns_fn, args.repeat)
+        print(f"{label:>20}: banco {db_ms:8.2f} ms | colunas {columns_ms:8.3f} ms | {db_ms / columns_ms:6.0f}x")
@@ -0,0 +1,90 @@
+#BENCHMARK DE COLD START: TEMPO DE IMPORT E TEMPO ATÉ A PRIMEIRA REQUISIÇÃO COM SUCESSO
+#
+# Mede (1) quanto tempo leva `import main` num processo novo e (2) quanto tempo
+# passa entre subir o uvicorn e a primeira resposta 200 de uma rota que usa o
+# banco. Sai com código 1 se algum dos dois passar do orçamento, para poder
+# rodar no CI.
+#
+#   python scripts/bench_cold_start.py [--runs 5] [--import-budget 2.0] [--first-request-budget 5.0]
+#
+# Sem DATABASE_URL definida, usa um SQLite temporário.
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+
+def prepare_env() -> dict:
+    env = dict(os.environ, SQL_ECHO="0")
+    if "DATABASE_URL" not in os.environ:
+        env["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/cold_start.db"
+        subprocess.run(
+            [sys.executable, "-c", "from sqlmodel import SQLModel; import models.models; "
+             "from database import get_engine; SQLModel.metadata.create_all(get_engine())"],
+            cwd=ROOT, env=env, check=True,
+        )
+    return env
+
+
+def measure_import(env: dict) -> float:
+    code = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, check=True, capture_output=True, text=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_first_request(env: dict, path: str, timeout: float = 60.0) -> float:
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError(f"nenhuma resposta 200 em {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/cards/?limit=1")
+    parser.add_argument("--import-budget", type=float, default=2.0)
+    parser.add_argument("--first-request-budget", type=float, default=5.0)
+    args = parser.parse_args()
+
+    env = prepare_env()
+    imports = [measure_import(env) for _ in range(args.runs)]
+    first_requests = [measure_first_request(env, args.path) for _ in range(args.runs)]
+
+    import_time = statistics.median(imports)
+    first_request_time = statistics.median(first_requests)
+    print(f"import main:                     mediana {import_time * 1000:7.1f}ms  (orçamento {args.import_budget * 1000:.0f}ms)")
+    print(f"primeira requisição com sucesso: mediana {first_request_time * 1000:7.1f}ms  (orçamento {args.first_request_budget * 1000:.0f}ms)")
+
+    over_budget = import_time > args.import_budget or first_request_time > args.first_request_budget
+    if over_budget:
+        print("FALHOU: cold start acima do orçamento")
+    sys.exit(1 if over_budget else 0)
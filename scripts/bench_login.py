@@ -0,0 +1,94 @@
+#BENCHMARK: RAJADA DE LOGINS CONCORRENDO COM ROTAS CRUD
+#
+# Compara o hash de senha rodando no threadpool das requisições (modo "inline")
+# com o process pool dedicado (modo "pool"), medindo a latência de GET /users/{id}
+# enquanto uma rajada de logins está em andamento.
+#
+#   python scripts/bench_login.py [--logins 200] [--reads 200]
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_login.db"
+
+import httpx
+from sqlmodel import SQLModel, Session
+
+from main import app
+from database import get_engine
+from models.models import User
+from services import security
+from services.process_pool import BoundedProcessPool
+from services.security import hash_password
+
+logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+
+
+def setup_db() -> int:
+    SQLModel.metadata.create_all(get_engine())
+    with Session(get_engine()) as session:
+        user = User(name="Bench", email="bench@example.com", password=hash_password("secret"))
+        session.add(user)
+        session.commit()
+        return user.id
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(int(len(values) * pct), len(values) - 1)]
+
+
+async def run(mode: str, user_id: int, logins: int, reads: int):
+    workers = os.cpu_count() or 1
+    security.hashing_pool = BoundedProcessPool(
+        f"bench_{mode}", max_workers=0 if mode == "inline" else workers, max_queue=logins
+    )
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # aquece o pool de processos antes de medir
+        await client.post("/users/login", json={"email": "bench@example.com", "password": "secret"})
+
+        async def login():
+            r = await client.post("/users/login", json={"email": "bench@example.com", "password": "secret"})
+            return r.status_code
+
+        async def read_loop(latencies):
+            for _ in range(reads // 10):
+                start = time.perf_counter()
+                r = await client.get(f"/users/{user_id}")
+                latencies.append(time.perf_counter() - start)
+                assert r.status_code == 200
+
+        latencies = []
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *[login() for _ in range(logins)],
+            *[read_loop(latencies) for _ in range(10)],
+        )
+        elapsed = time.perf_counter() - start
+
+    security.hashing_pool.shutdown()
+    statuses = [r for r in results if r is not None]
+    print(
+        f"{mode:>6}: total {elapsed:6.2f}s | logins ok={statuses.count(200)} 503={statuses.count(503)} | "
+        f"GET /users/{{id}} p50={statistics.median(latencies) * 1000:7.1f}ms "
+        f"p95={percentile(latencies, 0.95) * 1000:7.1f}ms max={max(latencies) * 1000:7.1f}ms"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--reads", type=int, default=200)
+    args = parser.parse_args()
+
+    user_id = setup_db()
+    for mode in ("inline", "pool"):
+        asyncio.run(run(mode, user_id, args.logins, args.reads))
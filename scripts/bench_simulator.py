@@ -0,0 +1,47 @@
+#BENCHMARK: MÃOS SIMULADAS POR SEGUNDO E CONFERÊNCIA COM O CÁLCULO EXATO
+#
+# Monta um deck sintético de 40 cartas, roda simulate_chunk direto (um
+# núcleo, sem o pool) para consultas compostas e mostra quantas mãos por
+# segundo cada núcleo sorteia. Depois compara o Monte Carlo com a
+# probabilidade hipergeométrica exata de consultas de uma condição só.
+#
+#   python scripts/bench_simulator.py [--trials 2000000]
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.simulator import at_least_probability, group_cards, simulate_chunk
+
+
+DECK = [(i, 2, ["Dragon", "Spell", "Warrior", "Warrior"][i % 4]) for i in range(20)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--trials", type=int, default=2_000_000)
+    args = parser.parse_args()
+
+    conditions = [{"card_id": None, "type": "Dragon"}, {"card_id": None, "type": "Spell"}, {"card_id": 3, "type": None}]
+    counts, membership = group_cards(DECK, conditions)
+    deck_size = int(counts.sum())
+
+    compound = [
+        {"cards_seen": 7, "conditions": [0, 1], "at_least": [1, 2]},
+        {"cards_seen": 9, "conditions": [0, 1, 2], "at_least": [1, 1, 1]},
+    ]
+    simulate_chunk(counts, membership, compound, 10_000, 0)
+    started = time.perf_counter()
+    simulate_chunk(counts, membership, compound, args.trials, 1)
+    elapsed = time.perf_counter() - started
+    hands = args.trials * len({q["cards_seen"] for q in compound})
+    print(f"{hands} mãos em {elapsed:.2f} s: {hands / elapsed / 1e6:.1f} milhões de mãos/s por núcleo")
+
+    for column, at_least, seen in [(0, 1, 7), (0, 2, 7), (1, 3, 10), (2, 1, 8)]:
+        successes = int(counts[membership[:, column] == 1].sum())
+        exact = at_least_probability(deck_size, successes, seen, at_least)
+        query = {"cards_seen": seen, "conditions": [column], "at_least": [at_least]}
+        estimate = simulate_chunk(counts, membership, [query], args.trials, 2)[0] / args.trials
+        print(f"condição {column}, >= {at_least} em {seen}: exato {exact:.4f} | Monte Carlo {estimate:.4f}")
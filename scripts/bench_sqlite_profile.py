@@ -0,0 +1,97 @@
+#BENCHMARK: LEITURAS E ESCRITAS CONCORRENTES NO SQLITE, PERFIL "default" x "performance"
+#
+# Várias threads fazem uma mistura de leituras (listar cartas) e escritas
+# (criar deck) por alguns segundos, cada perfil num arquivo novo. Mostra
+# operações por segundo e quantas falharam com "database is locked".
+#
+#   python scripts/bench_sqlite_profile.py [--threads 16] [--seconds 5] [--write-ratio 0.2]
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy.exc import OperationalError
+from sqlmodel import SQLModel, Session, select
+
+import database
+from models.models import Card, CardRarity, CardType, Collection, Deck, DeckFormat, User
+from settings import Settings
+
+
+def seed():
+    SQLModel.metadata.create_all(database.get_engine())
+    with Session(database.get_engine()) as session:
+        collection = Collection(name="Bench", release_date=date(2024, 1, 1))
+        user = User(name="Bench", email="bench@example.com", password="x")
+        session.add_all([collection, user])
+        session.flush()
+        session.add_all([
+            Card(name=f"Card {i}", type=CardType.Dragon, rarity=CardRarity.Common, collection_id=collection.id)
+            for i in range(1000)
+        ])
+        session.commit()
+        return user.id
+
+
+def run(profile: str, threads: int, seconds: float, write_ratio: float):
+    database.configure(Settings(
+        database_url=f"sqlite:///{tempfile.mkdtemp()}/bench.db",
+        sqlite_profile=profile,
+        db_pool_size=threads,
+        db_max_overflow=0,
+        sql_echo=False,
+    ))
+    user_id = seed()
+    counts = {"reads": 0, "writes": 0, "locked": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(n):
+        rng = random.Random(n)
+        i = 0
+        while time.perf_counter() < deadline:
+            i += 1
+            write = rng.random() < write_ratio
+            try:
+                with database.RoutingSession(read_only=not write) as session:
+                    if write:
+                        session.add(Deck(name=f"deck-{n}-{i}", format=DeckFormat.Standard, user_id=user_id))
+                        session.commit()
+                    else:
+                        offset = rng.randrange(990)
+                        session.exec(select(Card).offset(offset).limit(10)).all()
+                key = "writes" if write else "reads"
+            except OperationalError:
+                key = "locked"
+            with lock:
+                counts[key] += 1
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    database.dispose()
+
+    total = counts["reads"] + counts["writes"]
+    print(
+        f"{profile:>11}: {total / seconds:8.0f} ops/s | leituras {counts['reads'] / seconds:8.0f}/s | "
+        f"escritas {counts['writes'] / seconds:6.0f}/s | database is locked: {counts['locked']}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+
+    for profile in ("default", "performance"):
+        run(profile, args.threads, args.seconds, args.write_ratio)
@@ -0,0 +1,106 @@
+#BENCHMARK: CPU POR REQUISIÇÃO COM CONSULTAS MONTADAS A CADA CHAMADA x PRONTAS
+#
+# Para as consultas das rotas mais chamadas (cartas no deck, buscas com ilike,
+# listagens e estatísticas), roda o mesmo trabalho de uma requisição (sessão
+# nova + consulta) montando o select() a cada vez, como antes, e usando as
+# consultas prontas dos módulos de rotas. Mostra o tempo de CPU por
+# requisição e o hit ratio da cache de SQL compilado em cada caso; com
+# --no-cache também mede com a cache desligada (query_cache_size=0).
+#
+#   python scripts/bench_statement_cache.py [--requests 3000] [--no-cache]
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("SQL_ECHO", "0")
+
+from sqlalchemy import func
+from sqlmodel import SQLModel, Session, select
+
+import database
+from models.models import Card, CardRarity, CardType, Collection, Deck, DeckCardLink, DeckFormat, User
+from routes import cards, decks
+from settings import Settings
+
+
+def seed() -> None:
+    SQLModel.metadata.create_all(database.get_engine())
+    with Session(database.get_engine()) as session:
+        collection = Collection(name="Bench", release_date=date(2024, 1, 1))
+        user = User(name="Bench", email="bench@example.com", password="x")
+        session.add_all([collection, user])
+        session.flush()
+        session.add_all([
+            Card(name=f"Card {i}", type=list(CardType)[i % len(CardType)], rarity=CardRarity.Common,
+                 collection_id=collection.id)
+            for i in range(500)
+        ])
+        session.add_all([Deck(name=f"Deck {i}", format=DeckFormat.Standard, user_id=user.id) for i in range(50)])
+        session.flush()
+        session.add_all([DeckCardLink(deck_id=d, card_id=d * 3, qty=1) for d in range(1, 51)])
+        session.commit()
+
+
+def inline_queries(session: Session, i: int) -> None:
+    deck_id, card_id = i % 50 + 1, (i % 50 + 1) * 3
+    session.exec(select(Deck.id).where(Deck.id == deck_id)).first()
+    session.exec(select(Card.id).where(Card.id == card_id)).first()
+    session.exec(select(DeckCardLink).where(DeckCardLink.deck_id == deck_id, DeckCardLink.card_id == card_id)).first()
+    session.exec(select(Card).where(Card.name.ilike(f"%{i % 100}%")).offset(0).limit(10)).all()
+    session.exec(select(Deck).where(Deck.name.ilike(f"%{i % 50}%")).offset(0).limit(10)).all()
+    session.exec(select(Card).offset(i % 400).limit(10)).all()
+    session.exec(
+        select(Card.type, func.count(Card.id).label("total_cards")).group_by(Card.type).order_by(func.count(Card.id).desc())
+    ).all()
+
+
+def prebuilt_queries(session: Session, i: int) -> None:
+    deck_id, card_id = i % 50 + 1, (i % 50 + 1) * 3
+    session.exec(decks.DECK_ID, params={"deck_id": deck_id}).first()
+    session.exec(decks.CARD_ID, params={"card_id": card_id}).first()
+    session.exec(decks.DECK_CARD_LINK, params={"deck_id": deck_id, "card_id": card_id}).first()
+    session.exec(cards.SEARCH_CARDS, params={"pattern": f"%{i % 100}%", "skip": 0, "limit": 10}).all()
+    session.exec(decks.SEARCH_DECKS, params={"pattern": f"%{i % 50}%", "skip": 0, "limit": 10}).all()
+    session.exec(cards.LIST_CARDS, params={"skip": i % 400, "limit": 10}).all()
+    session.exec(cards.CARDS_BY_TYPE).all()
+
+
+def counters() -> tuple:
+    return database._cache_hits.value, database._cache_misses.value
+
+
+def run(label: str, queries, requests: int, cache_size: int) -> None:
+    database.configure(Settings(
+        database_url=f"sqlite:///{tempfile.mkdtemp()}/bench.db", sql_echo=False, db_query_cache_size=cache_size,
+    ))
+    seed()
+    for i in range(50):
+        with Session(database.get_engine()) as session:
+            queries(session, i)
+
+    hits, misses = counters()
+    started = time.process_time()
+    for i in range(requests):
+        with Session(database.get_engine()) as session:
+            queries(session, i)
+    cpu = time.process_time() - started
+    hits, misses = counters()[0] - hits, counters()[1] - misses
+    ratio = f"{hits / (hits + misses):.1%}" if hits + misses else "-"
+    print(f"{label:>28}: {cpu / requests * 1e6:7.0f} µs de CPU por requisição | hit ratio {ratio}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args()
+
+    run("montadas a cada chamada", inline_queries, args.requests, 500)
+    run("prontas (bindparam)", prebuilt_queries, args.requests, 500)
+    if args.no_cache:
+        run("montadas, sem cache", inline_queries, args.requests, 0)
+        run("prontas, sem cache", prebuilt_queries, args.requests, 0)
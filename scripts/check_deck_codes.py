@@ -0,0 +1,98 @@
+#VERIFICA OS CÓDIGOS DE DECK: IDA E VOLTA, ENCODER EM LOTE E TAMANHO CONTRA O JSON
+#
+# Gera decks aleatórios e confere que (1) decode(encode(deck)) devolve o mesmo
+# deck, (2) o encoder vetorizado gera exatamente os mesmos códigos que o
+# encoder por deck e (3) códigos inválidos são recusados. No fim mostra o
+# tamanho médio do código contra o JSON de DeckWithCardsRead. Sai com código 1
+# se alguma verificação falhar.
+#
+#   python scripts/check_deck_codes.py [--decks 2000]
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from models.models import CardRarity, CardType, DeckFormat
+from routes.schemas.cardSchema import CardRead
+from routes.schemas.deckShema import DeckWithCardsRead
+from services.deck_code import DeckCodeError, decode_deck_code, encode_deck_code, encode_deck_codes
+
+
+def random_deck(rng: random.Random) -> list:
+    size = rng.choice([0, 1, rng.randint(15, 40), rng.randint(40, 100)])
+    max_id = rng.choice([200, 100_000])
+    return [(card_id, rng.randint(1, 3)) for card_id in rng.sample(range(1, max_id), size)]
+
+
+def deck_json(deck_id: int, deck_format: DeckFormat, cards: list) -> bytes:
+    return DeckWithCardsRead(
+        id=deck_id,
+        name=f"Deck {deck_id}",
+        format=deck_format,
+        cards=[
+            CardRead(
+                id=card_id,
+                name=f"Card number {card_id}",
+                type=CardType.Dragon,
+                rarity=CardRarity.Rare,
+                text="When this card is summoned, draw one card.",
+                collection_id=1,
+            )
+            for card_id, _ in cards
+        ],
+    ).model_dump_json().encode()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--decks", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    decks = {deck_id: (rng.choice(list(DeckFormat)), random_deck(rng)) for deck_id in rng.sample(range(1, 10**6), args.decks)}
+    failures = 0
+
+    started = time.perf_counter()
+    codes = {deck_id: encode_deck_code(fmt, cards) for deck_id, (fmt, cards) in decks.items()}
+    scalar_seconds = time.perf_counter() - started
+
+    for deck_id, (fmt, cards) in decks.items():
+        decoded_format, decoded_cards = decode_deck_code(codes[deck_id])
+        if decoded_format != fmt or sorted(decoded_cards) != sorted(cards):
+            print("ida e volta falhou para o deck", deck_id)
+            failures += 1
+
+    links = [(deck_id, card_id, qty) for deck_id, (_, cards) in decks.items() for card_id, qty in cards]
+    rng.shuffle(links)
+    columns = (
+        list(decks), [fmt for fmt, _ in decks.values()],
+        [l[0] for l in links], [l[1] for l in links], [l[2] for l in links],
+    )
+    started = time.perf_counter()
+    batch = encode_deck_codes(*columns)
+    batch_seconds = time.perf_counter() - started
+    mismatched = [deck_id for deck_id in decks if batch.get(deck_id) != codes[deck_id]]
+    if mismatched:
+        print("encoder em lote diverge em", len(mismatched), "decks")
+        failures += 1
+
+    for bad in ("", "AQ", "!!!", codes[next(iter(codes))] + "AA", "AgA", "AQkAAAA"):
+        try:
+            decode_deck_code(bad)
+            print("código inválido aceito:", repr(bad))
+            failures += 1
+        except DeckCodeError:
+            pass
+
+    non_empty = [deck_id for deck_id, (_, cards) in decks.items() if cards]
+    code_bytes = sum(len(codes[deck_id]) for deck_id in non_empty)
+    json_bytes = sum(len(deck_json(deck_id, *decks[deck_id])) for deck_id in non_empty)
+    print(f"{len(decks)} decks, {len(links)} cartas")
+    print(f"encode por deck: {scalar_seconds * 1000:.1f} ms | em lote: {batch_seconds * 1000:.1f} ms")
+    print(f"tamanho médio: código {code_bytes / len(non_empty):.0f} B | JSON {json_bytes / len(non_empty):.0f} B "
+          f"({json_bytes / code_bytes:.0f}x maior)")
+    print("OK" if not failures else f"{failures} falha(s)")
+    sys.exit(1 if failures else 0)
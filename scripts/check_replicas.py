@@ -0,0 +1,67 @@
+#VERIFICA O ROTEAMENTO PARA RÉPLICAS DE LEITURA USANDO DOIS ARQUIVOS SQLITE
+#
+# O "primário" e a "réplica" são bancos separados, com dados diferentes, para
+# dar para ver de onde cada leitura veio.
+#
+#   python scripts/check_replicas.py
+import logging
+import os
+import shutil
+import sys
+import tempfile
+from datetime import date
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+workdir = tempfile.mkdtemp()
+replica_dir = os.path.join(workdir, "replica")
+os.makedirs(replica_dir)
+os.environ["DATABASE_URL"] = f"sqlite:///{workdir}/primary.db"
+os.environ["DATABASE_REPLICA_URLS"] = f"sqlite:///{replica_dir}/replica.db"
+os.environ["READ_YOUR_WRITES_SECONDS"] = "2"
+
+from fastapi.testclient import TestClient
+from sqlmodel import SQLModel, Session
+
+import database
+from main import app
+from models.models import Collection
+
+logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+
+
+def seed(engine, name):
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(Collection(name=name, release_date=date(2024, 1, 1)))
+        session.commit()
+
+
+def names(response):
+    return [c["name"] for c in response.json()]
+
+
+if __name__ == "__main__":
+    seed(database.get_engine(), "from primary")
+    replica = database.replica_router.replicas[0]
+    seed(replica, "from replica")
+
+    client = TestClient(app)
+    print("GET sem escrita        ->", names(client.get("/collections/")))
+
+    client.post("/collections/", json={"name": "new", "release_date": "2024-02-02"})
+    print("GET após escrita       ->", names(client.get("/collections/")))
+
+    client.cookies.clear()
+    print("GET com X-Read-Primary ->", names(client.get("/collections/", headers={"X-Read-Primary": "1"})))
+
+    # réplica fora do ar: a leitura que a encontra já cai para o primário e a
+    # coloca em cooldown; o cliente não vê erro
+    replica.dispose()
+    shutil.rmtree(replica_dir)
+    response = client.get("/collections/")
+    print("GET réplica fora do ar ->", response.status_code, names(response) if response.status_code == 200 else "")
+    print("GET durante o cooldown ->", names(client.get("/collections/")))
+    print("réplicas saudáveis     ->", len(database.replica_router.healthy_replicas()))
+    if response.status_code != 200:
+        print("FALHA: a leitura na réplica fora do ar não caiu para o primário")
+        sys.exit(1)
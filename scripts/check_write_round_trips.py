@@ -0,0 +1,199 @@
+#VERIFICA AS ESCRITAS "INSERT PRIMEIRO": IDAS AO BANCO, CONFLITOS E CORRIDA
+#
+# Conta as idas ao banco (comandos SQL + commit) de cada rota de criação e
+# atualização e compara com o padrão antigo (SELECT para checar duplicado,
+# INSERT, commit e refresh), refeito aqui com a mesma sessão. Depois confere
+# que nome/email repetido continua dando 400, id inexistente 404, e que N
+# requisições simultâneas criando o mesmo deck resultam em exatamente um 201.
+# Sai com código 1 se alguma verificação falhar.
+#
+#   python scripts/check_write_round_trips.py [--racers 16]
+import argparse
+import logging
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/check.db"
+os.environ["RATE_LIMIT_PER_SECOND"] = "0"
+os.environ.setdefault("HASH_POOL_WORKERS", "1")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlmodel import SQLModel, Session, select
+
+import database
+from main import app
+from models.models import Card, CardRarity, CardType, ChangeOperation, Collection, Deck, DeckFormat, User
+from services.changelog import record_change
+
+logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+
+round_trips = [0]
+
+
+def count_round_trips(engine) -> None:
+    @event.listens_for(engine, "before_cursor_execute")
+    def _statement(*args):
+        round_trips[0] += 1
+
+    @event.listens_for(engine, "commit")
+    def _commit(*args):
+        round_trips[0] += 1
+
+
+def measured(fn) -> tuple:
+    round_trips[0] = 0
+    result = fn()
+    return result, round_trips[0]
+
+
+# padrão antigo: checa duplicado, insere, commit e refresh
+def legacy_create(model, entity_type: str, unique_filter, values: dict) -> None:
+    with Session(database.get_engine()) as session:
+        if session.exec(select(model).where(unique_filter)).first():
+            raise RuntimeError("duplicado")
+        row = model(**values)
+        session.add(row)
+        session.flush()
+        record_change(session, entity_type, row.id, ChangeOperation.create)
+        session.commit()
+        session.refresh(row)
+
+
+def legacy_update(model, entity_type: str, row_id: int, values: dict) -> None:
+    with Session(database.get_engine()) as session:
+        row = session.get(model, row_id)
+        for key, value in values.items():
+            setattr(row, key, value)
+        record_change(session, entity_type, row_id, ChangeOperation.update)
+        session.commit()
+        session.refresh(row)
+
+
+failures = []
+
+
+def check(label: str, ok: bool, detail="") -> None:
+    print(f"{'ok  ' if ok else 'FALHA'} {label} {detail}")
+    if not ok:
+        failures.append(label)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--racers", type=int, default=16)
+    args = parser.parse_args()
+
+    SQLModel.metadata.create_all(database.get_engine())
+    count_round_trips(database.get_engine())
+
+    with TestClient(app) as client:
+        collection = client.post("/collections/", json={"name": "Base", "release_date": "2024-01-01"}).json()
+        user = client.post("/users/", json={"name": "u", "email": "u@example.com", "password": "123"}).json()
+
+        rows = []
+        cases = [
+            ("POST /collections/",
+             lambda: client.post("/collections/", json={"name": "Nova", "release_date": "2024-02-01"}),
+             lambda: legacy_create(Collection, "collection", Collection.name == "Antiga",
+                                   {"name": "Antiga", "release_date": date(2024, 2, 1)})),
+            ("POST /cards/",
+             lambda: client.post("/cards/", json={"name": "Nova", "type": "Dragon", "rarity": "Rare",
+                                                  "collection_id": collection["id"]}),
+             lambda: legacy_create(Card, "card", Card.name == "Antiga",
+                                   {"name": "Antiga", "type": CardType.Dragon, "rarity": CardRarity.Rare,
+                                    "collection_id": collection["id"]})),
+            ("POST /decks/",
+             lambda: client.post("/decks/", json={"name": "Nova", "format": "Standard", "user_id": user["id"]}),
+             lambda: legacy_create(Deck, "deck", (Deck.name == "Antiga") & (Deck.user_id == user["id"]),
+                                   {"name": "Antiga", "format": DeckFormat.Standard, "user_id": user["id"]})),
+        ]
+        for label, route, legacy in cases:
+            response, now = measured(route)
+            _, before = measured(legacy)
+            check(label, response.status_code in (200, 201), f"-> {response.status_code}")
+            rows.append((label, before, now))
+
+        # a rota atualiza o que ela criou e o padrão antigo, o que ele criou
+        with Session(database.get_engine()) as session:
+            old = {model: session.exec(select(model.id).where(model.name == "Antiga")).one()
+                   for model in (Collection, Card, Deck)}
+            new = {model: session.exec(select(model.id).where(model.name == "Nova")).one()
+                   for model in (Collection, Card, Deck)}
+        other = client.post("/users/", json={"name": "v", "email": "v@example.com", "password": "123"}).json()
+
+        cases = [
+            ("PUT /collections/{id}",
+             lambda: client.put(f"/collections/{new[Collection]}", json={"name": "Nova 2"}),
+             lambda: legacy_update(Collection, "collection", old[Collection], {"name": "Antiga 2"})),
+            ("PUT /cards/{id}",
+             lambda: client.put(f"/cards/{new[Card]}", json={"text": "novo"}),
+             lambda: legacy_update(Card, "card", old[Card], {"text": "antigo"})),
+            ("PUT /decks/{id}",
+             lambda: client.put(f"/decks/{new[Deck]}", json={"name": "Nova 2"}),
+             lambda: legacy_update(Deck, "deck", old[Deck], {"name": "Antiga 2"})),
+            ("PUT /users/{id}",
+             lambda: client.put(f"/users/{user['id']}", json={"name": "u2"}),
+             lambda: legacy_update(User, "user", other["id"], {"name": "v2"})),
+        ]
+        for label, route, legacy in cases:
+            response, now = measured(route)
+            _, before = measured(legacy)
+            check(label, response.status_code in (200, 201), f"-> {response.status_code}")
+            rows.append((label, before, now))
+
+        print()
+        print(f"{'rota':>24} | antes | agora")
+        for label, before, now in rows:
+            print(f"{label:>24} | {before:5} | {now:5}")
+            if now >= before:
+                failures.append(f"{label}: {now} idas, antes {before}")
+        print()
+
+        conflicts = [
+            ("collection repetida", client.post("/collections/", json={"name": "Nova 2", "release_date": "2024-01-01"}),
+             400, "Collection com esse nome já existe!"),
+            ("carta repetida", client.post("/cards/", json={"name": "Nova", "type": "Spell", "rarity": "Common",
+                                                           "collection_id": collection["id"]}),
+             400, "Carta com esse nome já existe!"),
+            ("email repetido", client.post("/users/", json={"name": "x", "email": "u@example.com", "password": "1"}),
+             400, "Email já cadastrado!"),
+            ("deck repetido", client.post("/decks/", json={"name": "Nova 2", "format": "Standard",
+                                                         "user_id": user["id"]}),
+             400, "Usuário já tem deck com esse nome!"),
+            ("renomear carta para nome existente", client.put(f"/cards/{new[Card]}", json={"name": "Antiga"}),
+             400, "Carta com esse nome já existe!"),
+            ("renomear deck para nome existente", client.put(f"/decks/{new[Deck]}", json={"name": "Antiga 2"}),
+             400, "Usuário já tem deck com esse nome!"),
+            ("atualizar carta inexistente", client.put("/cards/999", json={"text": "x"}),
+             404, "Carta com ID 999 não existe!"),
+            ("atualizar usuário inexistente", client.put("/users/999", json={"name": "x"}),
+             404, "Usuário com ID 999 não existe!"),
+            ("clonar para usuário inexistente", client.post(f"/decks/{new[Deck]}/clone", json={"user_id": 999}),
+             404, "Usuário com ID 999 não existe!"),
+            ("clonar deck inexistente", client.post("/decks/999/clone", json={"user_id": user["id"]}),
+             404, "Deck com ID 999 não existe!"),
+            ("clonar com nome existente", client.post(f"/decks/{new[Deck]}/clone", json={"user_id": user["id"]}),
+             400, "Usuário já tem deck com esse nome!"),
+        ]
+        for label, response, status, detail in conflicts:
+            body = response.json()
+            check(label, response.status_code == status and body.get("detail") == detail,
+                  f"-> {response.status_code} {body.get('detail', '')}")
+
+        # todas disputam o mesmo nome; sem a checagem antes, quem decide é a constraint
+        def race(_):
+            return client.post("/decks/", json={"name": "Corrida", "format": "Standard", "user_id": user["id"]})
+
+        with ThreadPoolExecutor(args.racers) as executor:
+            statuses = sorted(response.status_code for response in executor.map(race, range(args.racers)))
+        check(f"{args.racers} criações simultâneas do mesmo deck", statuses.count(201) == 1 and set(statuses) <= {201, 400},
+              f"-> {statuses}")
+
+    if failures:
+        print("\nfalhas:", *failures, sep="\n  ")
+        sys.exit(1)
@@ -1,6 +1,7 @@
 from sqlmodel import Session
 from datetime import datetime, date
 from database import engine
+from services.security import hash_password
 
 from models.models import (
     User, Deck, Card, Collection,
@@ -14,16 +15,16 @@ def seed():
         # USERS – nomes reais
         # -----------------------------------------------------------
         users = [
-            User(name="Lucas Almeida", email="lucas.almeida@example.com", password="123"),
-            User(name="Mariana Torres", email="mariana.torres@example.com", password="123"),
-            User(name="Pedro Santos", email="pedro.santos@example.com", password="123"),
-            User(name="Julia Ramos", email="julia.ramos@example.com", password="123"),
-            User(name="Thiago Martins", email="thiago.martins@example.com", password="123"),
-            User(name="Ana Garcia", email="ana.garcia@example.com", password="123"),
-            User(name="Rafael Lima", email="rafael.lima@example.com", password="123"),
-            User(name="Carolina Mota", email="carolina.mota@example.com", password="123"),
-            User(name="Gustavo Freitas", email="gustavo.freitas@example.com", password="123"),
-            User(name="Beatriz Rocha", email="beatriz.rocha@example.com", password="123"),
+            User(name="Lucas Almeida", email="lucas.almeida@example.com", password=hash_password("123")),
+            User(name="Mariana Torres", email="mariana.torres@example.com", password=hash_password("123")),
+            User(name="Pedro Santos", email="pedro.santos@example.com", password=hash_password("123")),
+            User(name="Julia Ramos", email="julia.ramos@example.com", password=hash_password("123")),
+            User(name="Thiago Martins", email="thiago.martins@example.com", password=hash_password("123")),
+            User(name="Ana Garcia", email="ana.garcia@example.com", password=hash_password("123")),
+            User(name="Rafael Lima", email="rafael.lima@example.com", password=hash_password("123")),
+            User(name="Carolina Mota", email="carolina.mota@example.com", password=hash_password("123")),
+            User(name="Gustavo Freitas", email="gustavo.freitas@example.com", password=hash_password("123")),
+            User(name="Beatriz Rocha", email="beatriz.rocha@example.com", password=hash_password("123")),
         ]
         for u in users:
             session.add(u)
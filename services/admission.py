@@ -0,0 +1,253 @@
+import asyncio
+import json
+import math
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+from anyio import to_thread
+from starlette.routing import Match
+
+from services.metrics import registry
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second, up to ``capacity``"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self, now: float) -> Tuple[bool, float]:
+        """Consume one token; returns (allowed, seconds until a token is available)"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True, 0.0
+        return False, (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """In-memory token buckets per client key, keeping at most ``max_keys`` buckets"""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, key: str) -> Tuple[bool, float]:
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket.take(now)
+
+
+class GateSaturatedError(Exception):
+    """The gate is at its concurrency limit and its wait queue is full or timed out"""
+
+
+class ConcurrencyGate:
+    """Caps concurrent requests of a route group, with a bounded wait queue.
+
+    asyncio primitives belong to the loop they were first used on, so the
+    semaphore is kept per event loop: the same app can serve from another
+    loop (a second TestClient, a new ``asyncio.run``) without errors.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int, timeout: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+        self._rejected = registry.counter(f"admission_{name}_rejected_total", "Requests refused with 503")
+        self._wait = registry.histogram(f"admission_{name}_queue_wait_seconds", "Time spent waiting for a slot")
+        registry.gauge(f"admission_{name}_active", "Requests currently running", fn=lambda: self.active)
+        registry.gauge(f"admission_{name}_waiting", "Requests waiting for a slot", fn=lambda: self.waiting)
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.limit)
+        return semaphore
+
+    async def acquire(self) -> None:
+        semaphore = self._semaphore()
+        if semaphore.locked() and self.waiting >= self.max_queue:
+            self._rejected.inc()
+            raise GateSaturatedError(self.name)
+
+        started = time.perf_counter()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(semaphore.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self._rejected.inc()
+            raise GateSaturatedError(self.name)
+        finally:
+            self.waiting -= 1
+            self._wait.observe(time.perf_counter() - started)
+        self.active += 1
+
+    def release(self) -> None:
+        self.active -= 1
+        self._semaphore().release()
+
+
+@dataclass
+class RouteGroup:
+    gate: ConcurrencyGate
+    prefixes: Tuple[str, ...]
+
+    def matches(self, path: str) -> bool:
+        return path.startswith(self.prefixes)
+
+
+def client_key(scope) -> str:
+    client = scope.get("client")
+    return client[0] if client else "anonymous"
+
+
+def header_key(header: str) -> Callable:
+    """Key requests by ``header`` (an API key, or the user id set by a trusted gateway), else by client IP"""
+    name = header.lower().encode("latin-1")
+
+    def key(scope) -> str:
+        for header_name, value in scope["headers"]:
+            if header_name == name and value:
+                return f"{header}:{value.decode('latin-1')}"
+        return client_key(scope)
+
+    return key
+
+
+def runs_in_threadpool(router) -> Callable:
+    """Predicate for ``worker_gate_filter``: True unless the request's route is an ``async def`` endpoint.
+
+    Async endpoints (login, simulate, ...) spend their time awaiting a
+    process pool, not holding a worker thread; gating them with the threads
+    would let a burst of them starve the sync CRUD routes.
+    """
+    def check(scope) -> bool:
+        for route in router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return not asyncio.iscoroutinefunction(getattr(route, "endpoint", None))
+        return True
+
+    return check
+
+
+class AdmissionControlMiddleware:
+    """ASGI middleware that rate limits per client and caps concurrency per route group.
+
+    Over the rate limit the request gets 429; when its route group is
+    saturated it gets 503. Both carry ``Retry-After``. ``worker_gate``, when
+    given, is a second cap shared by every request that passes
+    ``worker_gate_filter`` (all of them by default), sized to the worker
+    threadpool so requests queue here, visibly and bounded, instead of inside
+    the threadpool. Paths under ``exempt_prefixes`` skip both the rate limit
+    and the worker gate.
+    """
+
+    def __init__(
+        self,
+        app,
+        rate_limiter: Optional[RateLimiter] = None,
+        groups: Optional[List[RouteGroup]] = None,
+        worker_gate: Optional[ConcurrencyGate] = None,
+        worker_gate_filter: Optional[Callable] = None,
+        exempt_prefixes: Tuple[str, ...] = ("/metrics",),
+        key_func: Callable = client_key,
+        retry_after: float = 1.0,
+    ):
+        self.app = app
+        self.rate_limiter = rate_limiter
+        self.groups = groups or []
+        self.worker_gate = worker_gate
+        self.worker_gate_filter = worker_gate_filter
+        self.exempt_prefixes = exempt_prefixes
+        self.key_func = key_func
+        self.retry_after = retry_after
+        self._rate_limited = registry.counter("admission_rate_limited_total", "Requests refused with 429")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        exempt = scope["path"].startswith(self.exempt_prefixes)
+        if self.rate_limiter is not None and not exempt:
+            allowed, wait = self.rate_limiter.check(self.key_func(scope))
+            if not allowed:
+                self._rate_limited.inc()
+                return await _reject(send, 429, "Muitas requisições, tente novamente mais tarde", wait)
+
+        # primeiro o gate do grupo: quem espera por ele não ocupa vaga de thread
+        gates = [g.gate for g in self.groups if g.matches(scope["path"])][:1]
+        if self.worker_gate is not None and not exempt:
+            if self.worker_gate_filter is None or self.worker_gate_filter(scope):
+                gates.append(self.worker_gate)
+
+        acquired = []
+        try:
+            for gate in gates:
+                await gate.acquire()
+                acquired.append(gate)
+        except GateSaturatedError:
+            for gate in reversed(acquired):
+                gate.release()
+            return await _reject(send, 503, "Servidor ocupado, tente novamente", self.retry_after)
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            for gate in reversed(acquired):
+                gate.release()
+
+
+def configure_threadpool(size: int) -> None:
+    """Set AnyIO's worker thread limit (sync routes and dependencies run there) and expose its usage.
+
+    Must be called from inside the event loop, e.g. in the app lifespan.
+    """
+    limiter = to_thread.current_default_thread_limiter()
+    limiter.total_tokens = size
+    registry.gauge("threadpool_limit", "Worker threads available to sync routes", fn=lambda: limiter.total_tokens)
+    registry.gauge("threadpool_in_use", "Worker threads currently busy", fn=lambda: limiter.borrowed_tokens)
+    registry.gauge(
+        "threadpool_waiting", "Calls waiting for a worker thread", fn=lambda: limiter.statistics().tasks_waiting
+    )
+
+
+async def _reject(send, status_code: int, detail: str, retry_after: float) -> None:
+    body = json.dumps({"detail": detail}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
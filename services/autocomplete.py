@@ -0,0 +1,277 @@
+import logging
+import threading
+import unicodedata
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlmodel import Session, select
+
+import database
+from models.models import Card
+from services.changelog import has_changes, last_seq
+from services.metrics import registry
+from settings import Settings
+
+
+logger = logging.getLogger(__name__)
+
+# apagar uma coleção também apaga as cartas dela
+ENTITY_TYPES = ("card", "collection")
+
+
+def normalize(text: str) -> str:
+    """Case- and accent-insensitive form used as the index key"""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).strip()
+
+
+class AutocompleteIndex:
+    """Sorted in-memory index of card names for typeahead.
+
+    Prefix lookups are a bisect into the sorted keys plus a short scan. When
+    a prefix has too few matches, a fallback tries the one-edit variants
+    (deletion, transposition, substitution, insertion) of the query around
+    the point where it stopped matching, taking substitution/insertion
+    characters only from the keys actually present, so typos cost a few
+    dozen bisects instead of a scan. Nothing beyond the sorted arrays is
+    stored; past ``max_entries`` the index disables itself and callers fall
+    back to the database.
+
+    This process's writes update the index directly. Every ``reload_interval``
+    seconds the change log is checked for card writes from other workers, and
+    the index is reloaded when there is one; a reload that fits in
+    ``max_entries`` turns a disabled index back on.
+    """
+
+    def __init__(self, max_entries: int, reload_interval: float = 60.0):
+        self.max_entries = max_entries
+        self.reload_interval = reload_interval
+        self._keys: List[str] = []
+        self._ids: List[int] = []
+        self._names: List[str] = []
+        self._key_by_id: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._ready = False
+        # alterações feitas enquanto o load() lê o banco, reaplicadas no fim
+        self._pending: Optional[List[Tuple[int, Optional[str]]]] = None
+        # maior seq do change log já refletido no índice
+        self._seq = 0
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self._lookups = registry.counter("autocomplete_lookups_total", "Autocomplete queries answered from memory")
+        self._fuzzy = registry.counter("autocomplete_fuzzy_total", "Queries that needed the typo fallback")
+        registry.gauge("autocomplete_entries", "Names in the autocomplete index", fn=lambda: len(self._keys))
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def load(self, rows: Iterable[Tuple[int, str]]) -> None:
+        """Rebuild the index from ``(id, name)`` rows"""
+        with self._lock:
+            self._pending = []
+
+        entries = []
+        for card_id, name in rows:
+            entries.append((normalize(name), card_id, name))
+            if len(entries) > self.max_entries:
+                logger.warning("Autocomplete desligado: mais de %d nomes", self.max_entries)
+                with self._lock:
+                    self._pending = None
+                    self._ready = False
+                    self._keys, self._ids, self._names, self._key_by_id = [], [], [], {}
+                return
+        entries.sort()
+
+        with self._lock:
+            self._keys = [e[0] for e in entries]
+            self._ids = [e[1] for e in entries]
+            self._names = [e[2] for e in entries]
+            self._key_by_id = {e[1]: e[0] for e in entries}
+            pending, self._pending = self._pending, None
+            for card_id, name in pending:
+                self._remove(card_id)
+                if name is not None:
+                    self._insert(card_id, name)
+            self._ready = True
+
+    def start(self) -> None:
+        """Load from the database in the background; queries go to the database until it is ready"""
+        if self._thread is None:
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="autocomplete-load", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        self._load_from_database()
+        if not self.reload_interval:
+            return
+        while not self._stopping.wait(self.reload_interval):
+            try:
+                changed = self._changed_elsewhere()
+            except Exception:
+                logger.exception("Falha ao consultar o change log para o autocomplete")
+                continue
+            if changed:
+                self._load_from_database()
+
+    def _changed_elsewhere(self) -> bool:
+        """Whether the change log has card writes newer than the last load"""
+        with Session(database.get_engine()) as session:
+            seq = last_seq(session)
+            changed = has_changes(session, ENTITY_TYPES, self._seq, seq)
+        if not changed:
+            self._seq = seq
+        return changed
+
+    def _load_from_database(self) -> None:
+        try:
+            with Session(database.get_engine()) as session:
+                # lido antes dos nomes: uma escrita entre os dois só causa um reload a mais
+                seq = last_seq(session)
+                # sem .all(): acima do limite o load para de ler antes do fim
+                self.load(session.exec(select(Card.id, Card.name)))
+            self._seq = seq
+        except Exception:
+            logger.exception("Falha ao carregar o índice de autocomplete")
+
+    def upsert(self, card_id: int, name: str) -> None:
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((card_id, name))
+            self._remove(card_id)
+            self._insert(card_id, name)
+
+    def add_many(self, rows: Iterable[Tuple[int, str]]) -> None:
+        for card_id, name in rows:
+            self.upsert(card_id, name)
+
+    def remove(self, card_id: int) -> None:
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((card_id, None))
+            self._remove(card_id)
+
+    def names(self, card_ids: Iterable[int]) -> Dict[int, str]:
+        """Display names of the given ids (ids not in the index are left out)"""
+        found = {}
+        with self._lock:
+            for card_id in card_ids:
+                key = self._key_by_id.get(card_id)
+                if key is None:
+                    continue
+                i = bisect_left(self._keys, key)
+                while self._ids[i] != card_id:
+                    i += 1
+                found[card_id] = self._names[i]
+        return found
+
+    def _insert(self, card_id: int, name: str) -> None:
+        if len(self._keys) >= self.max_entries:
+            self._ready = False
+            return
+        key = normalize(name)
+        i = bisect_left(self._keys, key)
+        # chaves iguais ficam ordenadas por id
+        while i < len(self._keys) and self._keys[i] == key and self._ids[i] < card_id:
+            i += 1
+        self._keys.insert(i, key)
+        self._ids.insert(i, card_id)
+        self._names.insert(i, name)
+        self._key_by_id[card_id] = key
+
+    def _remove(self, card_id: int) -> None:
+        key = self._key_by_id.pop(card_id, None)
+        if key is None:
+            return
+        i = bisect_left(self._keys, key)
+        while self._ids[i] != card_id:
+            i += 1
+        del self._keys[i], self._ids[i], self._names[i]
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[int, str]]:
+        """Names starting with ``query``, then one-typo matches if there are fewer than ``limit``"""
+        q = normalize(query)
+        with self._lock:
+            self._lookups.inc()
+            results: Dict[int, str] = {}
+            matched = self._prefix(q, limit, results)
+            if len(results) < limit and len(q) >= 2:
+                self._fuzzy.inc()
+                for variant in self._one_edit_variants(q, matched):
+                    self._prefix(variant, limit, results)
+                    if len(results) >= limit:
+                        break
+        return list(results.items())[:limit]
+
+    def _prefix(self, prefix: str, limit: int, results: Dict[int, str]) -> bool:
+        i = bisect_left(self._keys, prefix)
+        found = False
+        while i < len(self._keys) and len(results) < limit and self._keys[i].startswith(prefix):
+            results.setdefault(self._ids[i], self._names[i])
+            found = True
+            i += 1
+        return found
+
+    def _has_prefix(self, prefix: str) -> bool:
+        i = bisect_left(self._keys, prefix)
+        return i < len(self._keys) and self._keys[i].startswith(prefix)
+
+    def _next_chars(self, prefix: str) -> List[str]:
+        """Distinct characters that follow ``prefix`` in the index, one bisect each"""
+        chars = []
+        i = bisect_left(self._keys, prefix)
+        n = len(prefix)
+        while i < len(self._keys) and self._keys[i].startswith(prefix):
+            key = self._keys[i]
+            if len(key) == n:
+                i += 1
+                continue
+            chars.append(key[n])
+            i = bisect_left(self._keys, prefix + chr(ord(key[n]) + 1), i)
+        return chars
+
+    def _one_edit_variants(self, q: str, matched: bool):
+        if matched:
+            # a consulta já casa; um erro só pode estar no fim
+            stop = len(q)
+        else:
+            # maior prefixo da consulta que ainda existe no índice
+            lo, hi = 0, len(q)
+            while lo < hi:
+                mid = (lo + hi + 1) // 2
+                if self._has_prefix(q[:mid]):
+                    lo = mid
+                else:
+                    hi = mid - 1
+            stop = lo
+        seen = {q}
+        for k in range(max(0, stop - 1), min(stop, len(q)) + 1):
+            head = q[:k]
+            candidates = []
+            if k < len(q):
+                candidates.append(head + q[k + 1:])
+            if k + 1 < len(q):
+                candidates.append(head + q[k + 1] + q[k] + q[k + 2:])
+            for c in self._next_chars(head):
+                if k < len(q) and c != q[k]:
+                    candidates.append(head + c + q[k + 1:])
+                candidates.append(head + c + q[k:])
+            for candidate in candidates:
+                if candidate and candidate not in seen:
+                    seen.add(candidate)
+                    yield candidate
+
+
+# limite e intervalo de reload vêm do Settings, aplicados pelo create_app
+autocomplete_index = AutocompleteIndex(
+    max_entries=Settings.autocomplete_max_entries,
+    reload_interval=Settings.autocomplete_reload_seconds,
+)
@@ -0,0 +1,363 @@
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from sqlmodel import Session, select
+
+import database
+from models.models import Card, CardRarity, CardType, Collection
+from services.changelog import has_changes, last_seq
+from services.metrics import registry
+
+
+logger = logging.getLogger(__name__)
+
+# código uint8 de cada enum = posição na declaração
+TYPES: List[CardType] = list(CardType)
+RARITIES: List[CardRarity] = list(CardRarity)
+TYPE_CODES = {value: code for code, value in enumerate(TYPES)}
+RARITY_CODES = {value: code for code, value in enumerate(RARITIES)}
+
+POINTER = "CURRENT"
+# escritas nessas entidades mudam as colunas
+ENTITY_TYPES = ("card", "collection")
+
+
+def _strings(values: Sequence[Optional[str]]):
+    """Offsets (n + 1) into one utf-8 buffer; None is stored as empty and flagged in ``present``"""
+    encoded = [(v or "").encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    buffer = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    present = np.fromiter((v is not None for v in values), dtype=bool, count=len(values))
+    return offsets, buffer, present
+
+
+class CardColumns:
+    """Read-only, column-oriented copy of the card catalog.
+
+    One NumPy array per field, rows ordered by card id; names and texts are
+    offsets into a single utf-8 buffer. Filters are boolean masks and counts
+    are ``bincount`` over the uint8 codes. When loaded from a directory the
+    arrays are memory-mapped, so every worker process reading the same files
+    shares one copy in the page cache.
+    """
+
+    ARRAYS = (
+        "ids", "collection_ids", "types", "rarities",
+        "name_offsets", "names", "text_offsets", "texts", "has_text",
+        "collection_table_ids", "collection_name_offsets", "collection_name_bytes",
+    )
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        digest = hashlib.sha256()
+        for name in self.ARRAYS:
+            digest.update(np.ascontiguousarray(arrays[name]).tobytes())
+        self.hash = digest.hexdigest()
+
+    @classmethod
+    def from_rows(cls, cards: Sequence[tuple], collections: Sequence[tuple]) -> "CardColumns":
+        """Build from ``(id, collection_id, type, rarity, name, text)`` and ``(id, name)`` rows, both ordered by id"""
+        n = len(cards)
+        name_offsets, names, _ = _strings([c[4] for c in cards])
+        text_offsets, texts, has_text = _strings([c[5] for c in cards])
+        collection_name_offsets, collection_name_bytes, _ = _strings([c[1] for c in collections])
+        return cls({
+            "ids": np.fromiter((c[0] for c in cards), dtype=np.int64, count=n),
+            "collection_ids": np.fromiter((c[1] for c in cards), dtype=np.int64, count=n),
+            "types": np.fromiter((TYPE_CODES[CardType(c[2])] for c in cards), dtype=np.uint8, count=n),
+            "rarities": np.fromiter((RARITY_CODES[CardRarity(c[3])] for c in cards), dtype=np.uint8, count=n),
+            "name_offsets": name_offsets,
+            "names": names,
+            "text_offsets": text_offsets,
+            "texts": texts,
+            "has_text": has_text,
+            "collection_table_ids": np.fromiter((c[0] for c in collections), dtype=np.int64, count=len(collections)),
+            "collection_name_offsets": collection_name_offsets,
+            "collection_name_bytes": collection_name_bytes,
+        })
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "CardColumns":
+        mode = "r" if mmap else None
+        return cls({name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode) for name in cls.ARRAYS})
+
+    def save(self, path: str) -> None:
+        os.makedirs(path)
+        for name in self.ARRAYS:
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self.ARRAYS)
+
+    def _string(self, offsets: np.ndarray, buffer: np.ndarray, i: int) -> str:
+        return buffer[offsets[i]:offsets[i + 1]].tobytes().decode("utf-8")
+
+    def has_collection(self, collection_id: int) -> bool:
+        i = np.searchsorted(self.collection_table_ids, collection_id)
+        return i < len(self.collection_table_ids) and self.collection_table_ids[i] == collection_id
+
+    def mask(
+        self,
+        collection_ids: Optional[Iterable[int]] = None,
+        types: Optional[Iterable[CardType]] = None,
+        rarities: Optional[Iterable[CardRarity]] = None,
+    ) -> np.ndarray:
+        selected = np.ones(len(self), dtype=bool)
+        if collection_ids:
+            selected &= np.isin(self.collection_ids, np.fromiter(collection_ids, dtype=np.int64))
+        if types:
+            selected &= np.isin(self.types, [TYPE_CODES[CardType(t)] for t in types])
+        if rarities:
+            selected &= np.isin(self.rarities, [RARITY_CODES[CardRarity(r)] for r in rarities])
+        return selected
+
+    def rows(self, indices: Iterable[int]) -> List[dict]:
+        """Cards at the given positions, shaped like ``CardRead``"""
+        return [
+            {
+                "id": int(self.ids[i]),
+                "name": self._string(self.name_offsets, self.names, i),
+                "type": TYPES[self.types[i]],
+                "rarity": RARITIES[self.rarities[i]],
+                "text": self._string(self.text_offsets, self.texts, i) if self.has_text[i] else None,
+                "collection_id": int(self.collection_ids[i]),
+            }
+            for i in indices
+        ]
+
+    def by_collection(self, collection_id: int, skip: int, limit: int) -> List[dict]:
+        positions = np.flatnonzero(self.collection_ids == collection_id)
+        return self.rows(positions[skip:skip + limit].tolist())
+
+    def count_by_type(self, mask: Optional[np.ndarray] = None) -> Dict[str, int]:
+        codes = self.types if mask is None else self.types[mask]
+        counts = np.bincount(codes, minlength=len(TYPES))
+        return {TYPES[code].value: int(count) for code, count in enumerate(counts) if count}
+
+    def count_by_rarity(self, mask: Optional[np.ndarray] = None) -> Dict[str, int]:
+        codes = self.rarities if mask is None else self.rarities[mask]
+        counts = np.bincount(codes, minlength=len(RARITIES))
+        return {RARITIES[code].value: int(count) for code, count in enumerate(counts) if count}
+
+    def count_by_collection(self, mask: Optional[np.ndarray] = None) -> Dict[int, int]:
+        ids = self.collection_ids if mask is None else self.collection_ids[mask]
+        values, counts = np.unique(ids, return_counts=True)
+        return dict(zip(values.tolist(), counts.tolist()))
+
+    def collection_names(self, collection_ids: Iterable[int]) -> Dict[int, str]:
+        wanted = np.fromiter(collection_ids, dtype=np.int64)
+        positions = np.searchsorted(self.collection_table_ids, wanted)
+        found = {}
+        for collection_id, i in zip(wanted.tolist(), positions.tolist()):
+            if i < len(self.collection_table_ids) and self.collection_table_ids[i] == collection_id:
+                found[collection_id] = self._string(self.collection_name_offsets, self.collection_name_bytes, i)
+        return found
+
+
+class CardColumnStore:
+    """Holds the current ``CardColumns`` and rebuilds it in the background.
+
+    Like the catalog snapshot, card and collection writes call
+    ``request_rebuild`` and bursts are coalesced after ``debounce`` seconds.
+    The new columns replace the old ones in a single assignment. ``current``
+    returns None while a rebuild requested by this process is pending, so
+    callers fall back to the database instead of serving a catalog that
+    misses their own write.
+
+    With ``directory`` set, each build is written to ``cards-<hash>/`` and
+    published by atomically replacing the ``CURRENT`` pointer file. Other
+    workers notice the new pointer (checked at most every ``poll`` seconds)
+    and map the same files instead of keeping their own copy.
+
+    Without ``directory`` each worker keeps its own build, so every
+    ``check_interval`` seconds the store looks at the change log for card or
+    collection writes made by other workers and rebuilds when it finds one.
+    """
+
+    def __init__(
+        self,
+        debounce: float = 1.0,
+        directory: Optional[str] = None,
+        keep: int = 3,
+        poll: float = 1.0,
+        check_interval: float = 5.0,
+    ):
+        self.debounce = debounce
+        self.directory = directory
+        self.keep = keep
+        self.poll = poll
+        self.check_interval = check_interval
+        self._columns: Optional[CardColumns] = None
+        self._requested = 0
+        self._built = 0
+        self._pointer: Optional[tuple] = None
+        # maior seq do change log já refletido nas colunas
+        self._seq = 0
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._dirty = threading.Event()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+        self._build_time = registry.histogram("card_columns_build_seconds", "Time to rebuild the card columns")
+        registry.gauge("card_columns_rows", "Cards in the columnar catalog", fn=lambda: len(self._columns or ()))
+        registry.gauge(
+            "card_columns_bytes", "Size of the columnar catalog arrays",
+            fn=lambda: self._columns.nbytes if self._columns is not None else 0,
+        )
+
+    @property
+    def current(self) -> Optional[CardColumns]:
+        if self._built != self._requested:
+            return None
+        if self.directory and time.monotonic() - self._checked_at >= self.poll:
+            self._checked_at = time.monotonic()
+            try:
+                self._follow_pointer()
+            except Exception:
+                logger.exception("Falha ao carregar as colunas do catálogo publicadas por outro worker")
+        return self._columns
+
+    def rebuild(self) -> CardColumns:
+        started = time.time()
+        with self._build_time.time():
+            with Session(database.get_engine()) as session:
+                # lido antes das cartas: uma escrita entre os dois só causa um rebuild a mais
+                seq = last_seq(session)
+                cards = session.exec(
+                    select(Card.id, Card.collection_id, Card.type, Card.rarity, Card.name, Card.text).order_by(Card.id)
+                ).all()
+                collections = session.exec(select(Collection.id, Collection.name).order_by(Collection.id)).all()
+            columns = CardColumns.from_rows(cards, collections)
+            self._seq = seq
+            if self._columns is not None and self._columns.hash == columns.hash:
+                return self._columns
+            if self.directory:
+                columns = self._publish(columns, started)
+        self._columns = columns
+        return columns
+
+    def _publish(self, columns: CardColumns, started: float) -> CardColumns:
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"cards-{columns.hash[:16]}"
+        path = os.path.join(self.directory, name)
+        if not os.path.isdir(path):
+            tmp_path = f"{path}.tmp{os.getpid()}"
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            columns.save(tmp_path)
+            try:
+                os.replace(tmp_path, path)
+            except OSError:
+                # outro worker publicou o mesmo conteúdo primeiro
+                shutil.rmtree(tmp_path, ignore_errors=True)
+
+        with self._lock:
+            # o ponteiro só anda para frente: um build que leu o banco antes não sobrescreve um mais novo
+            published = self._read_pointer()
+            if published is None or published[0] <= started:
+                pointer_path = os.path.join(self.directory, POINTER)
+                tmp_pointer = f"{pointer_path}.tmp{os.getpid()}"
+                with open(tmp_pointer, "w") as f:
+                    f.write(f"{started!r} {name}\n")
+                os.replace(tmp_pointer, pointer_path)
+                published = (started, name)
+            self._pointer = published
+            self._cleanup(published[1])
+            return CardColumns.load(os.path.join(self.directory, published[1]))
+
+    def _read_pointer(self) -> Optional[tuple]:
+        try:
+            with open(os.path.join(self.directory, POINTER)) as f:
+                started, name = f.read().split()
+        except (FileNotFoundError, ValueError):
+            return None
+        return float(started), name
+
+    def _follow_pointer(self) -> None:
+        with self._lock:
+            published = self._read_pointer()
+            if published is None or published == self._pointer:
+                return
+            columns = CardColumns.load(os.path.join(self.directory, published[1]))
+            self._pointer = published
+            self._columns = columns
+
+    def _cleanup(self, current: str) -> None:
+        # arquivos apagados continuam válidos para quem ainda os tem mapeados
+        builds = sorted(
+            (
+                e for e in os.scandir(self.directory)
+                if e.is_dir() and e.name.startswith("cards-") and ".tmp" not in e.name and e.name != current
+            ),
+            key=lambda e: e.stat().st_mtime,
+        )
+        for entry in builds[:max(len(builds) - (self.keep - 1), 0)]:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+    def request_rebuild(self) -> None:
+        with self._lock:
+            self._requested += 1
+        self._dirty.set()
+
+    def _changed_elsewhere(self) -> bool:
+        """Whether the change log has card or collection writes newer than the current build"""
+        # com diretório, quem escreveu publica e os outros seguem o ponteiro
+        if self.directory or self._columns is None:
+            return False
+        with Session(database.get_engine()) as session:
+            seq = last_seq(session)
+            changed = has_changes(session, ENTITY_TYPES, self._seq, seq)
+        if not changed:
+            self._seq = seq
+        return changed
+
+    def _run(self) -> None:
+        while True:
+            requested_here = self._dirty.wait(self.check_interval or None)
+            if self._stopping:
+                return
+            if requested_here:
+                # junta várias escritas seguidas em um único rebuild
+                time.sleep(self.debounce)
+                self._dirty.clear()
+                # o stop pode ter chegado durante o debounce, e o clear acima apagou o aviso
+                if self._stopping:
+                    return
+            requested = self._requested
+            try:
+                if not requested_here and not self._changed_elsewhere():
+                    continue
+                self.rebuild()
+                self._built = requested
+            except Exception:
+                logger.exception("Falha ao gerar as colunas do catálogo")
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="card-columns", daemon=True)
+            self._thread.start()
+        self.request_rebuild()
+
+    def stop(self) -> None:
+        self._stopping = True
+        self._dirty.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+# debounce, diretório e intervalo de checagem vêm do Settings, aplicados pelo create_app
+card_columns = CardColumnStore()
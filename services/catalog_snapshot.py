@@ -0,0 +1,248 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from sqlmodel import Session, select
+
+import database
+from models.models import Card, Collection
+from routes.schemas.cardSchema import CardRead
+from routes.schemas.collectionSchema import CollectionRead
+from services.metrics import registry
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional, sem ele servimos só gzip e identity
+    brotli = None
+
+
+logger = logging.getLogger(__name__)
+
+HASH_PATTERN = re.compile(r"[0-9a-f]{64}")
+SUFFIXES = {"identity": ".json", "gzip": ".json.gz", "br": ".json.br"}
+POINTER = "CURRENT"
+
+
+@dataclass
+class CatalogSnapshot:
+    hash: str
+    created_at: float
+    # corpo pronto para envio, por Content-Encoding ("identity", "gzip", "br")
+    bodies: Dict[str, bytes] = field(default_factory=dict)
+
+
+def serialize_catalog(session: Session) -> bytes:
+    """All collections and cards as deterministic JSON, so equal catalogs hash equally"""
+    collections = session.exec(select(Collection).order_by(Collection.id)).all()
+    cards = session.exec(select(Card).order_by(Card.id)).all()
+    payload = {
+        "collections": [CollectionRead.model_validate(c).model_dump(mode="json") for c in collections],
+        "cards": [CardRead.model_validate(c).model_dump(mode="json") for c in cards],
+    }
+    return json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def build_snapshot(raw: bytes) -> CatalogSnapshot:
+    snapshot = CatalogSnapshot(hash=hashlib.sha256(raw).hexdigest(), created_at=time.time())
+    snapshot.bodies["identity"] = raw
+    snapshot.bodies["gzip"] = gzip.compress(raw, compresslevel=9, mtime=0)
+    if brotli is not None:
+        snapshot.bodies["br"] = brotli.compress(raw, quality=11)
+    return snapshot
+
+
+class SnapshotStore:
+    """Keeps the latest catalog snapshots in memory and rebuilds them in the background.
+
+    Writes to the catalog call ``request_rebuild``; bursts of writes are
+    coalesced into a single rebuild after ``debounce`` seconds. The last
+    ``keep`` snapshots stay available so clients that just read
+    ``/catalog/latest`` can still download the previous hash.
+
+    Every worker builds its own snapshots, so ``load`` answers hashes this
+    process never built: with ``directory`` set it reads the files any worker
+    wrote there (and ``latest`` follows the ``CURRENT`` pointer, checked every
+    ``poll`` seconds); without it, it rebuilds from the database, since the
+    same catalog always serializes to the same hash.
+    """
+
+    def __init__(self, debounce: float = 1.0, keep: int = 3, directory: Optional[str] = None, poll: float = 1.0):
+        self.debounce = debounce
+        self.keep = keep
+        self.directory = directory
+        self.poll = poll
+        self._snapshots: "OrderedDict[str, CatalogSnapshot]" = OrderedDict()
+        self._latest: Optional[CatalogSnapshot] = None
+        self._pointer: Optional[tuple] = None
+        self._lock = threading.Lock()
+        self._miss_lock = threading.Lock()
+        self._miss_rebuilt_at = float("-inf")
+        self._dirty = threading.Event()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+        self._build_time = registry.histogram("catalog_snapshot_build_seconds", "Time to rebuild the catalog snapshot")
+        registry.gauge(
+            "catalog_snapshot_bytes",
+            "Uncompressed size of the latest snapshot",
+            fn=lambda: len(self._latest.bodies["identity"]) if self._latest else 0,
+        )
+
+    @property
+    def latest(self) -> Optional[CatalogSnapshot]:
+        return self._latest
+
+    def get(self, snapshot_hash: str) -> Optional[CatalogSnapshot]:
+        """Snapshot already in this process's memory"""
+        return self._snapshots.get(snapshot_hash)
+
+    def load(self, snapshot_hash: str) -> Optional[CatalogSnapshot]:
+        """Snapshot built by any worker; may read files or the database, so call it from a thread"""
+        snapshot = self.get(snapshot_hash)
+        if snapshot is not None or not HASH_PATTERN.fullmatch(snapshot_hash):
+            return snapshot
+
+        if self.directory:
+            snapshot = self._read_files(snapshot_hash)
+            if snapshot is not None:
+                self._remember(snapshot)
+            return snapshot
+
+        # no máximo um rebuild por janela de debounce, para hashes inválidos não martelarem o banco
+        with self._miss_lock:
+            snapshot = self.get(snapshot_hash)
+            if snapshot is None and time.monotonic() - self._miss_rebuilt_at >= self.debounce:
+                self._miss_rebuilt_at = time.monotonic()
+                self.rebuild()
+                snapshot = self.get(snapshot_hash)
+        return snapshot
+
+    def rebuild(self) -> CatalogSnapshot:
+        started = time.time()
+        with self._build_time.time():
+            with Session(database.get_engine()) as session:
+                raw = serialize_catalog(session)
+
+            if self._latest is not None and self._latest.bodies["identity"] == raw:
+                return self._latest
+
+            snapshot = build_snapshot(raw)
+            if self.directory:
+                self._write_files(snapshot)
+                snapshot = self._publish(snapshot, started)
+
+        self._remember(snapshot)
+        self._latest = snapshot
+        return snapshot
+
+    def _remember(self, snapshot: CatalogSnapshot) -> None:
+        with self._lock:
+            self._snapshots[snapshot.hash] = snapshot
+            self._snapshots.move_to_end(snapshot.hash)
+            while len(self._snapshots) > self.keep:
+                self._snapshots.popitem(last=False)
+
+    def _write_files(self, snapshot: CatalogSnapshot) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        for encoding, body in snapshot.bodies.items():
+            path = os.path.join(self.directory, f"catalog-{snapshot.hash}{SUFFIXES[encoding]}")
+            tmp_path = f"{path}.tmp{os.getpid()}"
+            with open(tmp_path, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+
+    def _read_files(self, snapshot_hash: str) -> Optional[CatalogSnapshot]:
+        snapshot = CatalogSnapshot(hash=snapshot_hash, created_at=time.time())
+        for encoding, suffix in SUFFIXES.items():
+            try:
+                with open(os.path.join(self.directory, f"catalog-{snapshot_hash}{suffix}"), "rb") as f:
+                    snapshot.bodies[encoding] = f.read()
+            except FileNotFoundError:
+                continue
+        return snapshot if "identity" in snapshot.bodies else None
+
+    def _publish(self, snapshot: CatalogSnapshot, started: float) -> CatalogSnapshot:
+        with self._lock:
+            # o ponteiro só anda para frente: um build que leu o banco antes não sobrescreve um mais novo
+            published = self._read_pointer()
+            if published is None or published[0] <= started:
+                pointer_path = os.path.join(self.directory, POINTER)
+                tmp_pointer = f"{pointer_path}.tmp{os.getpid()}"
+                with open(tmp_pointer, "w") as f:
+                    f.write(f"{started!r} {snapshot.hash}\n")
+                os.replace(tmp_pointer, pointer_path)
+                published = (started, snapshot.hash)
+            self._pointer = published
+        if published[1] == snapshot.hash:
+            return snapshot
+        return self.get(published[1]) or self._read_files(published[1]) or snapshot
+
+    def _read_pointer(self) -> Optional[tuple]:
+        try:
+            with open(os.path.join(self.directory, POINTER)) as f:
+                started, snapshot_hash = f.read().split()
+        except (FileNotFoundError, ValueError):
+            return None
+        return float(started), snapshot_hash
+
+    def _follow_pointer(self) -> None:
+        published = self._read_pointer()
+        if published is None or published == self._pointer:
+            return
+        snapshot = self.get(published[1]) or self._read_files(published[1])
+        if snapshot is None:
+            return
+        self._pointer = published
+        self._remember(snapshot)
+        self._latest = snapshot
+
+    def request_rebuild(self) -> None:
+        self._dirty.set()
+
+    def _run(self) -> None:
+        while True:
+            # com diretório, acorda a cada ``poll`` para seguir o que outros workers publicaram
+            if not self._dirty.wait(self.poll if self.directory else None):
+                try:
+                    self._follow_pointer()
+                except Exception:
+                    logger.exception("Falha ao carregar o snapshot publicado por outro worker")
+                continue
+            if self._stopping:
+                return
+            # junta várias escritas seguidas em um único rebuild
+            time.sleep(self.debounce)
+            self._dirty.clear()
+            # o stop pode ter chegado durante o debounce, e o clear acima apagou o aviso
+            if self._stopping:
+                return
+            try:
+                self.rebuild()
+            except Exception:
+                logger.exception("Falha ao gerar snapshot do catálogo")
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="catalog-snapshot", daemon=True)
+            self._thread.start()
+        self.request_rebuild()
+
+    def stop(self) -> None:
+        self._stopping = True
+        self._dirty.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+# debounce e diretório vêm do Settings, aplicados pelo create_app
+snapshot_store = SnapshotStore()
@@ -0,0 +1,119 @@
+from datetime import datetime
+from typing import Iterable, List
+
+from sqlalchemy import Select, delete, func, insert, literal, select, text
+from sqlalchemy.orm import aliased
+from sqlmodel import Session
+
+from models.models import ChangeLog, ChangeOperation
+
+
+# chave do advisory lock que serializa as escritas no change log (Postgres)
+CHANGE_LOG_LOCK = 0x6368616E6765
+
+
+def _serialize_changes(session: Session) -> None:
+    """Make ``seq`` order match commit order, so paging with ``seq > since`` never skips an entry.
+
+    The seq is taken at INSERT but becomes visible at COMMIT; without this a
+    transaction could commit seq 11 while seq 10 is still in flight, and a
+    client that read up to 11 would never see 10. On Postgres a transaction
+    advisory lock, held until commit, lets one change-logging transaction
+    through at a time; SQLite already has a single writer.
+    """
+    if session.get_bind().dialect.name != "postgresql":
+        return
+    # uma vez por transação; o lock é liberado sozinho no commit ou rollback
+    locked = session.info.get("change_log_lock")
+    if locked is not None and locked is session.get_transaction():
+        return
+    session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": CHANGE_LOG_LOCK})
+    session.info["change_log_lock"] = session.get_transaction()
+
+
+def record_change(session: Session, entity_type: str, entity_id: int, operation: ChangeOperation) -> ChangeLog:
+    """Append an entry to the change log; it is committed together with the caller's transaction.
+
+    The entry's ``seq`` is set once the session flushes.
+    """
+    _serialize_changes(session)
+    change = ChangeLog(entity_type=entity_type, entity_id=entity_id, operation=operation)
+    session.add(change)
+    return change
+
+
+def record_changes(
+    session: Session, entity_type: str, entity_ids: Iterable[int], operation: ChangeOperation
+) -> List[int]:
+    """Same as ``record_change`` for many ids, in a single INSERT; returns the new ``seq`` values"""
+    now = datetime.now()
+    rows = [
+        {"entity_type": entity_type, "entity_id": entity_id, "operation": operation, "changed_at": now}
+        for entity_id in entity_ids
+    ]
+    if not rows:
+        return []
+    _serialize_changes(session)
+    return list(session.scalars(insert(ChangeLog).returning(ChangeLog.seq), rows))
+
+
+def record_changes_from(session: Session, entity_type: str, ids_query: Select, operation: ChangeOperation) -> None:
+    """Log one entry per id returned by ``ids_query`` with INSERT ... SELECT, without loading the ids.
+
+    Used before set-based deletes whose rows go away through ON DELETE CASCADE.
+    """
+    columns = ChangeLog.__table__.c
+    _serialize_changes(session)
+    session.execute(
+        insert(ChangeLog).from_select(
+            ["entity_type", "entity_id", "operation", "changed_at"],
+            select(
+                literal(entity_type, columns.entity_type.type),
+                ids_query.subquery().c[0],
+                literal(operation, columns.operation.type),
+                literal(datetime.now(), columns.changed_at.type),
+            ),
+        )
+    )
+
+
+def last_seq(session: Session) -> int:
+    """Highest ``seq`` in the change log (0 when empty); a primary key lookup"""
+    return session.execute(select(func.max(ChangeLog.seq))).scalar() or 0
+
+
+def has_changes(session: Session, entity_types: Iterable[str], after: int, up_to: int) -> bool:
+    """Whether any entity of ``entity_types`` changed with ``after < seq <= up_to``.
+
+    Only the entries in that range are read, so polling with ``after`` set to
+    the previous ``last_seq`` stays cheap however long the log is.
+    """
+    return session.execute(
+        select(ChangeLog.seq)
+        .where(ChangeLog.seq > after, ChangeLog.seq <= up_to, ChangeLog.entity_type.in_(list(entity_types)))
+        .limit(1)
+    ).first() is not None
+
+
+def compact_changes(session: Session, older_than: datetime) -> int:
+    """Delete entries older than ``older_than`` that a newer entry for the same entity supersedes.
+
+    The latest entry of every entity is always kept, so a client that syncs
+    from any ``since`` still sees the final state of each entity it missed.
+    """
+    newer = aliased(ChangeLog)
+    superseded = (
+        select(newer.seq)
+        .where(
+            newer.entity_type == ChangeLog.entity_type,
+            newer.entity_id == ChangeLog.entity_id,
+            newer.seq > ChangeLog.seq,
+        )
+        .exists()
+    )
+    result = session.execute(
+        delete(ChangeLog).where(ChangeLog.changed_at < older_than, superseded)
+    )
+    session.commit()
+    return result.rowcount
+
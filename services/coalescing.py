@@ -0,0 +1,144 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from services.metrics import registry
+from settings import Settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlightCache:
+    """Collapses concurrent identical computations and caches the result briefly.
+
+    - within ``ttl`` seconds the cached value is returned as is;
+    - up to ``stale_ttl`` seconds after that the stale value is returned while
+      a single background refresh recomputes it;
+    - otherwise the first caller computes and concurrent callers with the same
+      key wait for that one execution instead of running their own.
+
+    With ``max_entries`` the least recently used keys are evicted, for caches
+    keyed by something unbounded such as a user id.
+    """
+
+    def __init__(self, name: str, ttl: float, stale_ttl: float, max_entries: Optional[int] = None):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._computes: "OrderedDict[Hashable, Callable[[], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._requests = registry.counter(f"{name}_cache_requests_total", "Lookups")
+        self._executions = registry.counter(f"{name}_cache_executions_total", "Computations actually run")
+        self._stale = registry.counter(f"{name}_cache_stale_served_total", "Lookups answered with a stale value")
+        registry.gauge(
+            f"{name}_cache_collapse_ratio",
+            "Fraction of lookups that did not run their own computation",
+            fn=lambda: 1 - self._executions.value / self._requests.value if self._requests.value else 0.0,
+        )
+
+    def get(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        self._requests.inc()
+        now = time.monotonic()
+
+        with self._lock:
+            self._computes[key] = compute
+            self._computes.move_to_end(key)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                value, computed_at = entry
+                age = now - computed_at
+                if age < self.ttl:
+                    return value
+                if age < self.ttl + self.stale_ttl:
+                    self._stale.inc()
+                    if key not in self._flights:
+                        self._flights[key] = _Flight()
+                        threading.Thread(target=self._run, args=(key, compute), daemon=True).start()
+                    return value
+
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if leader:
+            self._run(key, compute)
+        else:
+            flight.done.wait()
+
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def _run(self, key: Hashable, compute: Callable[[], Any]) -> None:
+        flight = self._flights[key]
+        self._executions.inc()
+        try:
+            flight.value = compute()
+            with self._lock:
+                self._store(key, flight.value)
+        except BaseException as e:
+            flight.error = e
+            logger.warning("Falha ao calcular %s[%r]: %s", self.name, key, e)
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def refresh_all(self, on_progress: Optional[Callable[[int, int], None]] = None) -> int:
+        """Recompute every key seen so far, e.g. from a maintenance job"""
+        with self._lock:
+            computes = list(self._computes.items())
+        for done, (key, compute) in enumerate(computes, start=1):
+            value = compute()
+            with self._lock:
+                self._store(key, value)
+            if on_progress is not None:
+                on_progress(done, len(computes))
+        return len(computes)
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        if self.max_entries is not None:
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            while len(self._computes) > self.max_entries:
+                self._computes.popitem(last=False)
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+
+# TTLs e tamanho vêm do Settings, aplicados pelo create_app
+stats_cache = SingleFlightCache(
+    "stats",
+    ttl=Settings.stats_cache_ttl,
+    stale_ttl=Settings.stats_cache_stale_ttl,
+)
+
+user_summary_cache = SingleFlightCache(
+    "user_summary",
+    ttl=Settings.user_summary_cache_ttl,
+    stale_ttl=0,
+    max_entries=Settings.user_summary_cache_max_entries,
+)
@@ -0,0 +1,186 @@
+import base64
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from models.models import DeckFormat
+
+
+# formato do código (versão 1), antes do base64url sem padding:
+#   versão | formato | n1 ids... | n2 ids... | n3 ids...
+# cada grupo traz os ids das cartas com aquela quantidade (1, 2 e 3 cópias),
+# ordenados e guardados como diferença para o anterior; tudo em varint
+VERSION = 1
+FORMAT_CODES: Dict[DeckFormat, int] = {
+    DeckFormat.Standard: 0,
+    DeckFormat.Modern: 1,
+    DeckFormat.Commander: 2,
+    DeckFormat.Pauper: 3,
+}
+FORMATS_BY_CODE = {code: deck_format for deck_format, code in FORMAT_CODES.items()}
+MAX_QTY = 3
+
+
+class DeckCodeError(ValueError):
+    pass
+
+
+def _varint(value: int, out: bytearray) -> None:
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def encode_deck_code(deck_format: DeckFormat, cards: Iterable[Tuple[int, int]]) -> str:
+    """Deck code for ``(card_id, qty)`` pairs"""
+    groups: List[List[int]] = [[] for _ in range(MAX_QTY)]
+    for card_id, qty in cards:
+        if not 1 <= qty <= MAX_QTY:
+            raise DeckCodeError(f"Quantidade inválida: {qty}")
+        groups[qty - 1].append(card_id)
+
+    out = bytearray([VERSION, FORMAT_CODES[DeckFormat(deck_format)]])
+    for ids in groups:
+        _varint(len(ids), out)
+        previous = 0
+        for card_id in sorted(ids):
+            _varint(card_id - previous, out)
+            previous = card_id
+    return _b64(bytes(out))
+
+
+def decode_deck_code(code: str) -> Tuple[DeckFormat, List[Tuple[int, int]]]:
+    """Inverse of ``encode_deck_code``: the format and ``(card_id, qty)`` pairs"""
+    try:
+        raw = base64.urlsafe_b64decode(code + "=" * (-len(code) % 4))
+    except (ValueError, TypeError):
+        raise DeckCodeError("Código de deck inválido")
+
+    position = 0
+
+    def read() -> int:
+        nonlocal position
+        value, shift = 0, 0
+        while True:
+            if position >= len(raw) or shift > 63:
+                raise DeckCodeError("Código de deck truncado")
+            byte = raw[position]
+            position += 1
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
+
+    if len(raw) < 2 or raw[0] != VERSION:
+        raise DeckCodeError("Versão de código de deck não suportada")
+    if raw[1] not in FORMATS_BY_CODE:
+        raise DeckCodeError("Formato de deck desconhecido")
+    deck_format = FORMATS_BY_CODE[raw[1]]
+    position = 2
+
+    cards = []
+    for qty in range(1, MAX_QTY + 1):
+        card_id = 0
+        for _ in range(read()):
+            card_id += read()
+            cards.append((card_id, qty))
+    if position != len(raw):
+        raise DeckCodeError("Código de deck com bytes sobrando")
+    if len({card_id for card_id, _ in cards}) != len(cards):
+        raise DeckCodeError("Carta repetida no código de deck")
+    return deck_format, cards
+
+
+def _int_array(values: Sequence[int]) -> np.ndarray:
+    if isinstance(values, np.ndarray):
+        return values.astype(np.int64, copy=False)
+    return np.fromiter(values, dtype=np.int64, count=len(values))
+
+
+def encode_deck_codes(
+    deck_ids: Sequence[int],
+    deck_formats: Sequence[DeckFormat],
+    link_deck_ids: Sequence[int],
+    link_card_ids: Sequence[int],
+    link_qtys: Sequence[int],
+) -> Dict[int, str]:
+    """Vectorized ``encode_deck_code`` for many decks at once.
+
+    ``deck_ids``/``deck_formats`` list every deck (including empty ones); the
+    ``link_*`` arrays hold their cards in any order. Every token of every
+    code (version, format, group sizes, id deltas) is laid out in one flat
+    array and varint-encoded with numpy; only the final base64 runs per deck.
+    """
+    deck_ids = _int_array(deck_ids)
+    n_decks = len(deck_ids)
+    if n_decks == 0:
+        return {}
+    formats = np.array([FORMAT_CODES[DeckFormat(f)] for f in deck_formats], dtype=np.int64)
+
+    link_decks = _int_array(link_deck_ids)
+    cards = _int_array(link_card_ids)
+    qtys = _int_array(link_qtys)
+    if ((qtys < 1) | (qtys > MAX_QTY)).any():
+        raise DeckCodeError("Quantidade inválida")
+
+    # grupo = posição do deck * 3 + (qty - 1); linhas ordenadas por grupo e id da carta
+    max_deck_id = int(deck_ids.max())
+    if max_deck_id < 8 * n_decks + 2**20:
+        # ids densos: tabela id -> posição, sem busca binária
+        position = np.empty(max_deck_id + 1, dtype=np.int64)
+        position[deck_ids] = np.arange(n_decks)
+        deck_index = position[link_decks]
+    else:
+        order = np.argsort(deck_ids)
+        deck_index = order[np.searchsorted(deck_ids[order], link_decks)]
+    group = deck_index * MAX_QTY + (qtys - 1)
+    # (grupo, carta) é único: uma chave só ordena bem mais rápido que lexsort;
+    # ids muito grandes viram sua posição entre os ids distintos para a chave caber em int64
+    span = int(cards.max()) + 1 if len(cards) else 1
+    card_key = cards
+    if n_decks * MAX_QTY * span >= 2**62:
+        distinct, card_key = np.unique(cards, return_inverse=True)
+        span = len(distinct)
+    rows = np.argsort(group * span + card_key)
+    group, cards = group[rows], cards[rows]
+
+    deltas = cards.copy()
+    same_group = group[1:] == group[:-1]
+    deltas[1:][same_group] -= cards[:-1][same_group]
+
+    counts = np.bincount(group, minlength=n_decks * MAX_QTY)
+    before = np.cumsum(counts) - counts
+    group_ids = np.arange(n_decks * MAX_QTY)
+    # tokens antes do cabeçalho do grupo: cartas dos grupos anteriores,
+    # 5 tokens fixos por deck anterior, versão/formato e cabeçalhos anteriores do mesmo deck
+    header_pos = before + (2 + MAX_QTY) * (group_ids // MAX_QTY) + 2 + group_ids % MAX_QTY
+    deck_start = before[::MAX_QTY] + (2 + MAX_QTY) * np.arange(n_decks)
+
+    tokens = np.empty(len(cards) + (2 + MAX_QTY) * n_decks, dtype=np.int64)
+    tokens[deck_start] = VERSION
+    tokens[deck_start + 1] = formats
+    tokens[header_pos] = counts
+    tokens[header_pos[group] + 1 + np.arange(len(cards)) - before[group]] = deltas
+
+    # varint vetorizado: uma linha de até max_bytes bytes por token, e a máscara
+    # "byte existe" achata tudo na ordem certa
+    sizes = np.ones(len(tokens), dtype=np.int64)
+    limit = 0x80
+    while (tokens >= limit).any():
+        sizes += tokens >= limit
+        limit <<= 7
+    positions = np.arange(int(sizes.max()))
+    chunks = (tokens[:, None] >> (7 * positions)) & 0x7F
+    chunks |= np.where(positions < sizes[:, None] - 1, 0x80, 0)
+    out = chunks[positions < sizes[:, None]].astype(np.uint8)
+    offsets = np.cumsum(sizes) - sizes
+
+    starts = offsets[deck_start]
+    ends = np.append(starts[1:], len(out))
+    raw = out.tobytes()
+    return {deck_id: _b64(raw[s:e]) for deck_id, s, e in zip(deck_ids.tolist(), starts.tolist(), ends.tolist())}
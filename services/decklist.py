@@ -0,0 +1,48 @@
+import re
+from typing import Dict, Iterable, List, Tuple
+
+
+# "3 Swift Raptor", "3x Swift Raptor"; linhas vazias e comentários (# ou //) são ignorados
+_LINE = re.compile(r"^\s*(\d+)\s*[xX]?\s+(\S.*?)\s*$")
+
+
+class DecklistParseError(ValueError):
+    def __init__(self, errors: List[str]):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+def parse_decklist(text: str, max_lines: int = 500) -> Dict[str, Tuple[str, int]]:
+    """Quantities per card name from a text decklist.
+
+    Keys are lowercased names (so repeated lines with different case add up);
+    values keep the name as first written and the total quantity.
+    """
+    entries: Dict[str, Tuple[str, int]] = {}
+    errors = []
+    # número da linha no texto enviado, contando cabeçalhos, comentários e linhas em branco
+    lines = [
+        (number, line) for number, line in enumerate(text.splitlines(), start=1)
+        if line.strip() and not line.lstrip().startswith(("#", "//"))
+    ]
+    if len(lines) > max_lines:
+        raise DecklistParseError([f"Lista com mais de {max_lines} linhas"])
+
+    for number, line in lines:
+        match = _LINE.match(line)
+        if not match or int(match.group(1)) < 1:
+            errors.append(f"Linha {number} inválida: {line.strip()!r}")
+            continue
+        qty, name = int(match.group(1)), match.group(2)
+        key = name.lower()
+        first_name, total = entries.get(key, (name, 0))
+        entries[key] = (first_name, total + qty)
+
+    if errors:
+        raise DecklistParseError(errors)
+    return entries
+
+
+def format_decklist(rows: Iterable[Tuple[int, str]]) -> str:
+    """``qty name`` lines, one per card"""
+    return "".join(f"{qty} {name}\n" for qty, name in rows)
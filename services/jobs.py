@@ -0,0 +1,338 @@
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import func, update
+from sqlmodel import Session, select
+
+import database
+from models.models import Job, JobStatus
+from services.metrics import registry
+from settings import Settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when cancellation was requested"""
+
+
+class JobInterrupted(Exception):
+    """Raised inside a job when the runner is shutting down and stopped waiting for it"""
+
+
+class JobLeaseLost(Exception):
+    """Raised inside a job when its lease expired and another worker took it over"""
+
+
+class JobQueueFullError(RuntimeError):
+    """The runner already has its maximum number of pending jobs"""
+
+
+class JobContext:
+    """Handed to job functions: progress reporting and cancellation checks"""
+
+    def __init__(self, runner: "JobRunner", job_id: int, params: Dict[str, Any]):
+        self.runner = runner
+        self.job_id = job_id
+        self.params = params
+
+    def session(self) -> Session:
+        return Session(database.get_engine())
+
+    def check_cancelled(self) -> None:
+        if self.runner._interrupting:
+            raise JobInterrupted()
+        with self.session() as session:
+            cancel_requested, worker_id = session.exec(
+                select(Job.cancel_requested, Job.worker_id).where(Job.id == self.job_id)
+            ).one()
+        if worker_id != self.runner.worker_id:
+            raise JobLeaseLost()
+        if cancel_requested:
+            raise JobCancelled()
+
+    def progress(self, done: int, total: Optional[int] = None) -> None:
+        """Record progress and stop the job if it was cancelled in the meantime"""
+        values = {"progress": done}
+        if total is not None:
+            values["total"] = total
+        with self.session() as session:
+            session.execute(
+                update(Job).where(Job.id == self.job_id, Job.worker_id == self.runner.worker_id).values(**values)
+            )
+            session.commit()
+        self.check_cancelled()
+
+
+class JobRunner:
+    """Runs registered job kinds on a bounded thread pool, persisting state in the ``job`` table.
+
+    A running job is leased to the worker that claimed it: that worker
+    renews ``heartbeat_at`` every ``lease_seconds / 3``, and any runner puts
+    back in the queue the running jobs whose lease is older than
+    ``lease_seconds`` (their worker died), on ``start`` and periodically
+    after that. Jobs still running in live workers are left alone. ``stop``
+    lets running jobs finish for up to ``drain_timeout`` seconds; jobs still
+    running after that are interrupted and queued again. A job that ignores
+    the interruption for ``interrupt_timeout`` more seconds is abandoned: it
+    is logged and handed back to the queue, and since the job threads are
+    daemons it does not hold the process open.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        max_pending: int,
+        drain_timeout: float,
+        lease_seconds: float = 60.0,
+        interrupt_timeout: float = 10.0,
+    ):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.drain_timeout = drain_timeout
+        self.lease_seconds = lease_seconds
+        self.interrupt_timeout = interrupt_timeout
+        self.worker_id: Optional[str] = None
+        self._handlers: Dict[str, Callable[..., Any]] = {}
+        self._queue: "queue.Queue[Optional[int]]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._running: set = set()
+        self._heartbeat_thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._accepting = False
+        self._interrupting = False
+
+        self._finished = {status: registry.counter(f"jobs_{status.value}_total") for status in (
+            JobStatus.succeeded, JobStatus.failed, JobStatus.cancelled
+        )}
+        registry.gauge("jobs_pending", "Jobs queued or running in this process", fn=lambda: self._pending)
+
+    def register(self, kind: str):
+        """Decorator that registers ``fn(ctx, **params)`` as the handler of a job kind"""
+        def decorator(fn):
+            self._handlers[kind] = fn
+            return fn
+        return decorator
+
+    def start(self) -> None:
+        # definido aqui e não no import: com fork, cada processo precisa do seu
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # fila nova a cada start: uma thread abandonada no stop anterior não consome dela
+        self._queue = queue.Queue()
+        self._threads = [
+            threading.Thread(target=self._work, args=(self._queue,), name=f"job-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+        self._accepting = True
+        self._interrupting = False
+        self._stopped.clear()
+
+        self._reclaim()
+        with Session(database.get_engine()) as session:
+            pending = session.exec(
+                select(Job.id).where(Job.status == JobStatus.queued).order_by(Job.id)
+            ).all()
+        for job_id in pending:
+            self._submit(job_id)
+
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+        self._heartbeat_thread.start()
+
+    def _heartbeat(self) -> None:
+        while not self._stopped.wait(self.lease_seconds / 3):
+            try:
+                with Session(database.get_engine()) as session:
+                    session.execute(
+                        update(Job)
+                        .where(Job.worker_id == self.worker_id, Job.status == JobStatus.running)
+                        .values(heartbeat_at=datetime.now())
+                    )
+                    session.commit()
+                if self._accepting:
+                    for job_id in self._reclaim():
+                        self._submit(job_id)
+            except Exception:
+                logger.exception("Falha ao renovar os leases dos jobs")
+
+    def _reclaim(self) -> List[int]:
+        """Queue again the running jobs whose worker stopped renewing the lease"""
+        expired = datetime.now() - timedelta(seconds=self.lease_seconds)
+        with Session(database.get_engine()) as session:
+            job_ids = session.execute(
+                update(Job)
+                .where(Job.status == JobStatus.running, func.coalesce(Job.heartbeat_at, Job.started_at) < expired)
+                .values(status=JobStatus.queued, started_at=None, worker_id=None, heartbeat_at=None)
+                .returning(Job.id)
+            ).scalars().all()
+            session.commit()
+        if job_ids:
+            logger.warning("Jobs %s sem lease renovado há %.0fs, de volta à fila", job_ids, self.lease_seconds)
+        return list(job_ids)
+
+    def stop(self) -> None:
+        self._accepting = False
+        if not self._threads:
+            self._stopped.set()
+            return
+
+        # jobs que ainda não começaram continuam "queued" no banco e voltam no próximo start
+        while True:
+            try:
+                job_id = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job_id is not None:
+                with self._lock:
+                    self._pending -= 1
+        for _ in self._threads:
+            self._queue.put(None)
+
+        if not self._join(self.drain_timeout):
+            logger.warning("Jobs ainda rodando após %.1fs, interrompendo", self.drain_timeout)
+            self._interrupting = True
+            if not self._join(self.interrupt_timeout):
+                self._abandon()
+        # sem heartbeat, os leases dos jobs que sobrarem vencem e outro worker os retoma
+        self._stopped.set()
+        self._threads = []
+
+    def _join(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(deadline - time.monotonic(), 0))
+        return not any(thread.is_alive() for thread in self._threads)
+
+    def _abandon(self) -> None:
+        with self._lock:
+            abandoned = sorted(self._running)
+        logger.error(
+            "Jobs %s não pararam %.1fs após a interrupção; abandonados e devolvidos à fila",
+            abandoned, self.interrupt_timeout,
+        )
+        for job_id in abandoned:
+            # a thread continua viva, mas sem o lease não consegue mais gravar nada no job
+            self._set(job_id, status=JobStatus.queued, started_at=None, worker_id=None, heartbeat_at=None)
+
+    def enqueue(self, session: Session, kind: str, params: Optional[Dict[str, Any]] = None) -> Job:
+        if kind not in self._handlers:
+            raise ValueError(f"Tipo de job desconhecido: {kind}")
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise JobQueueFullError()
+
+        job = Job(kind=kind, params=params or {})
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+        if self._accepting:
+            self._submit(job.id)
+        return job
+
+    def cancel(self, session: Session, job: Job) -> Job:
+        if job.status in (JobStatus.succeeded, JobStatus.failed, JobStatus.cancelled):
+            return job
+        job.cancel_requested = True
+        if job.status == JobStatus.queued:
+            job.status = JobStatus.cancelled
+            job.finished_at = datetime.now()
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+        return job
+
+    def _submit(self, job_id: int) -> None:
+        with self._lock:
+            self._pending += 1
+        self._queue.put(job_id)
+
+    def _work(self, jobs: "queue.Queue[Optional[int]]") -> None:
+        while True:
+            job_id = jobs.get()
+            if job_id is None:
+                return
+            try:
+                self._execute(job_id)
+            except Exception:
+                logger.exception("Falha ao executar o job %s", job_id)
+
+    def _set(self, job_id: int, **values) -> bool:
+        # só grava se o job ainda for deste worker (o lease pode ter vencido)
+        with Session(database.get_engine()) as session:
+            updated = session.execute(
+                update(Job).where(Job.id == job_id, Job.worker_id == self.worker_id).values(**values)
+            )
+            session.commit()
+        if updated.rowcount == 0:
+            logger.warning("Job %s foi retomado por outro worker, resultado deste descartado", job_id)
+        return updated.rowcount > 0
+
+    def _execute(self, job_id: int) -> None:
+        try:
+            with Session(database.get_engine()) as session:
+                # só começa se ainda estiver na fila (pode ter sido cancelado antes)
+                started = session.execute(
+                    update(Job)
+                    .where(Job.id == job_id, Job.status == JobStatus.queued)
+                    .values(
+                        status=JobStatus.running,
+                        started_at=datetime.now(),
+                        worker_id=self.worker_id,
+                        heartbeat_at=datetime.now(),
+                    )
+                )
+                session.commit()
+                if started.rowcount == 0:
+                    return
+                with self._lock:
+                    self._running.add(job_id)
+                job = session.get(Job, job_id)
+                kind, params = job.kind, dict(job.params or {})
+
+            ctx = JobContext(self, job_id, params)
+            try:
+                result = self._handlers[kind](ctx, **params)
+            except JobInterrupted:
+                self._set(job_id, status=JobStatus.queued, started_at=None, worker_id=None, heartbeat_at=None)
+                return
+            except JobLeaseLost:
+                logger.warning("Job %s (%s) perdeu o lease, parando", job_id, kind)
+                return
+            except JobCancelled:
+                self._finish(job_id, JobStatus.cancelled)
+                return
+            except Exception as e:
+                logger.exception("Job %s (%s) falhou", job_id, kind)
+                self._finish(job_id, JobStatus.failed, error=str(e))
+                return
+
+            self._finish(job_id, JobStatus.succeeded, result=result)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._running.discard(job_id)
+
+    def _finish(self, job_id: int, status: JobStatus, **values) -> None:
+        if self._set(job_id, status=status, finished_at=datetime.now(), **values):
+            self._finished[status].inc()
+
+
+# dimensionado pelo create_app a partir do Settings
+job_runner = JobRunner(
+    workers=Settings.job_workers,
+    max_pending=Settings.job_max_pending,
+    drain_timeout=Settings.job_drain_timeout,
+    lease_seconds=Settings.job_lease_seconds,
+    interrupt_timeout=Settings.job_interrupt_timeout,
+)
@@ -0,0 +1,45 @@
+import base64
+import json
+from typing import Any, List, Sequence, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.sql.elements import ColumnElement
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def encode_cursor(values: Sequence[Any], tag: str = "") -> str:
+    """Opaque, URL-safe cursor holding the sort values of the last row of a page"""
+    payload = json.dumps({"t": tag, "v": [getattr(v, "value", v) for v in values]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, tag: str = "") -> List[Any]:
+    """Inverse of ``encode_cursor``; ``tag`` must match (e.g. the sort it was built for)"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        values = payload["v"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursorError(str(e))
+    if payload.get("t") != tag or not isinstance(values, list):
+        raise InvalidCursorError("cursor de outra ordenação")
+    return values
+
+
+def keyset_condition(keys: Sequence[Tuple[ColumnElement, bool]], values: Sequence[Any]) -> ColumnElement:
+    """Rows strictly after ``values`` in the order given by ``keys`` ((column, descending) pairs).
+
+    Expands to ``k1 > v1 OR (k1 = v1 AND k2 > v2) OR ...`` so each key can have
+    its own direction; the last key must be unique (usually the primary key).
+    """
+    if len(keys) != len(values):
+        raise InvalidCursorError("cursor com número de chaves errado")
+
+    clauses = []
+    for i, (column, descending) in enumerate(keys):
+        equal = [keys[j][0] == values[j] for j in range(i)]
+        after = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*equal, after))
+    return or_(*clauses)
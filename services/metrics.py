@@ -0,0 +1,152 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Optional, Sequence
+
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter:
+    """Monotonic counter"""
+
+    def __init__(self, name: str, description: str = ""):
+        self.name = name
+        self.description = description
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def snapshot(self):
+        return self._value
+
+
+class Gauge:
+    """Value that goes up and down, or is read from a callback when scraped"""
+
+    def __init__(self, name: str, description: str = "", fn: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.description = description
+        self._fn = fn
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        with self._lock:
+            self._value -= amount
+
+    @property
+    def value(self) -> float:
+        return self._fn() if self._fn is not None else self._value
+
+    def snapshot(self):
+        return self.value
+
+
+class Histogram:
+    """Cumulative bucketed distribution, in the same spirit as Prometheus"""
+
+    def __init__(self, name: str, description: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def time(self):
+        return _Timer(self)
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+
+        cumulative, running = {}, 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            running += bucket_count
+            cumulative[str(bound)] = running
+        cumulative["+Inf"] = count
+
+        return {
+            "count": count,
+            "sum": total,
+            "avg": total / count if count else 0.0,
+            "buckets": cumulative,
+        }
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._histogram.observe(time.perf_counter() - self._start)
+        return False
+
+
+class MetricsRegistry:
+    """Process-wide registry of named metrics, exposed by GET /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, name: str, factory):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = factory()
+                self._metrics[name] = metric
+            return metric
+
+    def counter(self, name: str, description: str = "") -> Counter:
+        return self._get_or_create(name, lambda: Counter(name, description))
+
+    def gauge(self, name: str, description: str = "", fn: Optional[Callable[[], float]] = None) -> Gauge:
+        gauge = self._get_or_create(name, lambda: Gauge(name, description, fn))
+        # quem registra por último define de onde o valor é lido (ex.: um novo create_app)
+        if fn is not None:
+            gauge._fn = fn
+        return gauge
+
+    def histogram(self, name: str, description: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(name, lambda: Histogram(name, description, buckets))
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            metrics = dict(self._metrics)
+        return {name: metric.snapshot() for name, metric in sorted(metrics.items())}
+
+
+registry = MetricsRegistry()
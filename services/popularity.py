@@ -0,0 +1,243 @@
+import heapq
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+from operator import itemgetter
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, true
+from sqlmodel import Session, select
+
+import database
+from models.models import ChangeLog, Deck, DeckCardLink, DeckFormat
+from services.metrics import registry
+
+
+logger = logging.getLogger(__name__)
+
+
+def _day(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
+
+class PopularityTracker:
+    """Card popularity (sum of DeckCardLink.qty) per deck format, kept in memory.
+
+    Counts are bucketed by the creation day of the deck, so a window such as
+    "decks created in the last 30 days" is a sum of day buckets. The deck-card
+    write paths report their deltas after commit (``record``), together with
+    the change log ``seq`` written in the same transaction. Rarer changes
+    that would need a lookup to know what they removed (deleting decks, cards
+    or users, changing a deck's format) call ``request_resync``, and a full
+    resync also runs every ``resync_interval`` seconds to correct any drift.
+    A resync reads the highest ``seq`` in the same statement as the counts,
+    so a delta at or below it is already counted and is not applied again.
+
+    The top ``top_k`` of each (format, window) is computed with a heap on
+    first use and cached; after a change to that format it is recomputed at
+    most once every ``refresh_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        top_k: int = 100,
+        resync_interval: float = 300.0,
+        debounce: float = 1.0,
+        refresh_interval: float = 1.0,
+    ):
+        self.top_k = top_k
+        self.resync_interval = resync_interval
+        self.debounce = debounce
+        self.refresh_interval = refresh_interval
+        self._days: Dict[DeckFormat, Dict[date, Counter]] = defaultdict(lambda: defaultdict(Counter))
+        self._totals: Dict[DeckFormat, Counter] = defaultdict(Counter)
+        self._decks: Dict[int, Tuple[DeckFormat, date]] = {}
+        self._versions: Counter = Counter()
+        self._cache: Dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+        self._ready = False
+        # deltas registrados durante um resync, reaplicados sobre o resultado dele se o seq for mais novo
+        self._pending: Optional[list] = None
+        # maior seq do change log já contado pelo último resync
+        self._synced_seq = 0
+        self._dirty = threading.Event()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+        self._resync_time = registry.histogram("popularity_resync_seconds", "Time to rebuild popularity counters")
+        self._misses = registry.counter("popularity_unknown_deck_total", "Deltas for decks not yet tracked")
+        registry.gauge(
+            "popularity_tracked_cards", "Cards with a popularity count",
+            fn=lambda: sum(len(c) for c in list(self._totals.values())),
+        )
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def register_deck(self, deck_id: int, deck_format: DeckFormat, created_at) -> None:
+        with self._lock:
+            self._decks[deck_id] = (DeckFormat(deck_format), _day(created_at))
+            if self._pending is not None:
+                self._pending.append(("deck", deck_id, (DeckFormat(deck_format), _day(created_at))))
+
+    def record(self, deck_id: int, card_id: int, delta: int, seq: int) -> None:
+        self.record_many(deck_id, {card_id: delta}, seq)
+
+    def record_many(self, deck_id: int, deltas: Dict[int, int], seq: int) -> None:
+        """Apply committed qty changes of one deck (card_id -> delta) logged with change log ``seq``"""
+        with self._lock:
+            # commitado antes do snapshot do último resync: já está na contagem
+            if seq <= self._synced_seq:
+                return
+            meta = self._decks.get(deck_id)
+            if meta is None:
+                self._misses.inc()
+                self._dirty.set()
+                return
+            if self._pending is not None:
+                self._pending.append(("cards", deck_id, (dict(deltas), seq)))
+            self._apply(meta, deltas)
+
+    def _apply(self, meta: Tuple[DeckFormat, date], deltas: Dict[int, int]) -> None:
+        deck_format, day = meta
+        bucket = self._days[deck_format][day]
+        totals = self._totals[deck_format]
+        for card_id, delta in deltas.items():
+            if not delta:
+                continue
+            bucket[card_id] += delta
+            totals[card_id] += delta
+            if bucket[card_id] <= 0:
+                del bucket[card_id]
+            if totals[card_id] <= 0:
+                del totals[card_id]
+        self._versions[deck_format] += 1
+
+    def top(self, deck_format: Optional[DeckFormat] = None, window_days: Optional[int] = None,
+            limit: int = 20) -> List[Tuple[int, int]]:
+        """``(card_id, qty)`` of the most used cards, optionally in decks created in the last ``window_days``"""
+        formats = [DeckFormat(deck_format)] if deck_format else list(DeckFormat)
+        today = date.today()
+        key = (tuple(formats), window_days)
+        with self._lock:
+            version = tuple(self._versions[f] for f in formats)
+            cached = self._cache.get(key)
+            # sob escrita contínua a versão muda a todo instante; o ranking é refeito no máximo a cada refresh_interval
+            if cached is not None and cached[1] == today and (
+                cached[0] == version or time.monotonic() - cached[3] < self.refresh_interval
+            ):
+                return cached[2][:limit]
+
+            if window_days is None:
+                counters = [self._totals[f] for f in formats]
+            else:
+                since = today - timedelta(days=window_days - 1)
+                counters = [c for f in formats for day, c in self._days[f].items() if day >= since]
+            if len(counters) == 1:
+                merged = counters[0]
+            else:
+                merged = Counter()
+                for counter in counters:
+                    merged.update(counter)
+            ranking = heapq.nlargest(self.top_k, merged.items(), key=itemgetter(1))
+            self._cache[key] = (version, today, ranking, time.monotonic())
+        return ranking[:limit]
+
+    def resync(self) -> None:
+        """Rebuild every counter from the database"""
+        with self._lock:
+            self._pending = []
+        try:
+            with self._resync_time.time():
+                with Session(database.get_engine()) as session:
+                    decks = session.exec(select(Deck.id, Deck.format, Deck.created_at)).all()
+                    counts = (
+                        select(Deck.format, func.date(Deck.created_at).label("day"), DeckCardLink.card_id,
+                               func.sum(DeckCardLink.qty).label("qty"))
+                        .join(DeckCardLink, DeckCardLink.deck_id == Deck.id)
+                        .group_by(Deck.format, func.date(Deck.created_at), DeckCardLink.card_id)
+                        .subquery()
+                    )
+                    # o seq sai na mesma consulta que as contagens, para os dois virem do mesmo snapshot
+                    synced = select(func.max(ChangeLog.seq).label("seq")).subquery()
+                    rows = session.exec(
+                        select(synced.c.seq, counts.c.format, counts.c.day, counts.c.card_id, counts.c.qty)
+                        .select_from(synced)
+                        .outerjoin(counts, true())
+                    ).all()
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+
+        synced_seq = (rows[0][0] if rows else None) or 0
+        days: Dict[DeckFormat, Dict[date, Counter]] = defaultdict(lambda: defaultdict(Counter))
+        totals: Dict[DeckFormat, Counter] = defaultdict(Counter)
+        for _, deck_format, day, card_id, qty in rows:
+            if card_id is None:
+                continue
+            deck_format = DeckFormat(deck_format)
+            days[deck_format][_day(day)][card_id] += qty
+            totals[deck_format][card_id] += qty
+
+        with self._lock:
+            self._days, self._totals = days, totals
+            self._decks = {deck_id: (deck_format, _day(created_at)) for deck_id, deck_format, created_at in decks}
+            pending, self._pending = self._pending, None
+            self._synced_seq = synced_seq
+            for kind, deck_id, payload in pending:
+                if kind == "deck":
+                    self._decks[deck_id] = payload
+                    continue
+                deltas, seq = payload
+                if seq > synced_seq and deck_id in self._decks:
+                    self._apply(self._decks[deck_id], deltas)
+            for deck_format in DeckFormat:
+                self._versions[deck_format] += 1
+            # contagens novas: nenhum ranking antigo vale, nem dentro do refresh_interval
+            self._cache.clear()
+            self._ready = True
+
+    def request_resync(self) -> None:
+        self._dirty.set()
+
+    def _run(self) -> None:
+        while True:
+            self._dirty.wait(self.resync_interval)
+            if self._stopping:
+                return
+            # junta várias exclusões seguidas num único resync
+            time.sleep(self.debounce)
+            self._dirty.clear()
+            # o stop pode ter chegado durante o debounce, e o clear acima apagou o aviso
+            if self._stopping:
+                return
+            try:
+                self.resync()
+            except Exception:
+                logger.exception("Falha ao recalcular a popularidade das cartas")
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="card-popularity", daemon=True)
+            self._thread.start()
+        self.request_resync()
+
+    def stop(self) -> None:
+        self._stopping = True
+        self._dirty.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+# top_k e intervalos de resync e de refresh do ranking vêm do Settings, aplicados pelo create_app
+popularity = PopularityTracker()
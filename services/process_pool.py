@@ -0,0 +1,112 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from services.metrics import registry
+
+
+class PoolSaturatedError(RuntimeError):
+    """Raised when a bounded pool already has its maximum number of queued tasks"""
+
+
+class BoundedProcessPool:
+    """Process pool for CPU-heavy work with a hard limit on queued tasks.
+
+    At most ``max_workers + max_queue`` tasks can be in flight; further
+    submissions fail immediately with ``PoolSaturatedError`` instead of piling
+    up behind the workers. With ``max_workers=0`` the tasks run in the
+    request threadpool instead (useful for comparisons and local dev).
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(max_workers, 1) + max_queue)
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+
+        self._submitted = registry.counter(f"{name}_submitted_total", "Tasks accepted by the pool")
+        self._rejected = registry.counter(f"{name}_rejected_total", "Tasks refused because the queue was full")
+        self._failed = registry.counter(f"{name}_failed_total", "Tasks that raised")
+        self._latency = registry.histogram(f"{name}_task_seconds", "Time from submission to result, queueing included")
+        registry.gauge(f"{name}_in_flight", "Tasks queued or running", fn=lambda: self._in_flight)
+        registry.gauge(
+            f"{name}_queue_depth",
+            "Tasks waiting for a free worker",
+            fn=lambda: max(self._in_flight - max(self.max_workers, 1), 0),
+        )
+
+    def configure(self, max_workers: int, max_queue: int) -> None:
+        """Resize the pool; meant to be called before it takes any work"""
+        self.shutdown()
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._slots = threading.BoundedSemaphore(max(max_workers, 1) + max_queue)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def _acquire(self) -> None:
+        if not self._slots.acquire(blocking=False):
+            self._rejected.inc()
+            raise PoolSaturatedError(f"{self.name} está com a fila cheia")
+        with self._in_flight_lock:
+            self._in_flight += 1
+        self._submitted.inc()
+
+    def _release(self, started: float, failed: bool) -> None:
+        with self._in_flight_lock:
+            self._in_flight -= 1
+        self._slots.release()
+        self._latency.observe(time.perf_counter() - started)
+        if failed:
+            self._failed.inc()
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """Schedule ``fn(*args)`` on a worker process"""
+        self._acquire()
+        started = time.perf_counter()
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._release(started, failed=True)
+            raise
+        future.add_done_callback(
+            lambda f: self._release(started, failed=f.cancelled() or f.exception() is not None)
+        )
+        return future
+
+    async def run(self, fn: Callable, *args):
+        """Await ``fn(*args)`` without holding a request thread while it runs"""
+        if self.max_workers > 0:
+            return await asyncio.wrap_future(self.submit(fn, *args))
+
+        self._acquire()
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = await run_in_threadpool(fn, *args)
+            failed = False
+            return result
+        finally:
+            self._release(started, failed)
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait, cancel_futures=True)
+                self._executor = None
@@ -0,0 +1,381 @@
+import asyncio
+import functools
+import hmac
+import html
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import Engine, event
+
+
+# perfil da requisição atual; None em todas as requisições não perfiladas
+_current: ContextVar[Optional["RequestProfile"]] = ContextVar("request_profile", default=None)
+_hooks_installed = False
+_hooks_lock = threading.Lock()
+
+Frame = Tuple[str, str, int]
+
+
+class RequestProfile:
+    """Sampled stacks and per-phase timings of a single request.
+
+    A sampler thread reads the stacks of the threads working on the request
+    (the event loop and the threadpool worker running the endpoint) every
+    ``interval`` seconds. Samples of the event loop thread may include other
+    requests being served at the same time.
+    """
+
+    def __init__(self, method: str, path: str, interval: float):
+        self.id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.interval = interval
+        self.started_at = time.time()
+        self.duration = 0.0
+        self._started = 0.0
+        self.status: Optional[int] = None
+        self.timers: Dict[str, float] = defaultdict(float)
+        self.samples: List[Tuple[Tuple[Frame, ...], float]] = []
+        self._threads: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    def add(self, timer: str, seconds: float) -> None:
+        with self._lock:
+            self.timers[timer] += seconds
+
+    @contextmanager
+    def timed(self, timer: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(timer, time.perf_counter() - started)
+
+    def watch_thread(self, ident: int) -> None:
+        with self._lock:
+            self._threads[ident] = self._threads.get(ident, 0) + 1
+
+    def unwatch_thread(self, ident: int) -> None:
+        with self._lock:
+            if self._threads.get(ident, 0) <= 1:
+                self._threads.pop(ident, None)
+            else:
+                self._threads[ident] -= 1
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+        self._sampler = threading.Thread(target=self._sample, name=f"profile-{self.id[:8]}", daemon=True)
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self.duration = time.perf_counter() - self._started
+        self._stopped.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+    def _sample(self) -> None:
+        me = threading.get_ident()
+        last = time.perf_counter()
+        while not self._stopped.wait(self.interval):
+            now = time.perf_counter()
+            frames = sys._current_frames()
+            with self._lock:
+                idents = [i for i in self._threads if i != me]
+            for ident in idents:
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_name, code.co_filename, frame.f_lineno))
+                    frame = frame.f_back
+                if stack:
+                    self.samples.append((tuple(reversed(stack)), now - last))
+            last = now
+
+    def phases(self) -> Dict[str, float]:
+        """Request time split into phases.
+
+        ``orm`` is the endpoint time spent outside the database driver: ORM
+        hydration and route code (and, for async routes, whatever they await).
+        """
+        timers = self.timers
+        db = timers["db"]
+        serialization = timers["encode"] + timers["render"]
+        validation = max(timers["serialize_response"] - timers["encode"], 0.0)
+        orm = max(timers["endpoint"] - db, 0.0)
+        other = max(self.duration - db - orm - validation - serialization, 0.0)
+        return {"db": db, "orm": orm, "validation": validation, "serialization": serialization, "other": other}
+
+    def summary(self, top: int = 30) -> dict:
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for stack, weight in self.samples:
+            own[stack[-1]] += weight
+            for frame in set(stack):
+                total[frame] += weight
+
+        def rows(counter: Counter) -> list:
+            return [
+                {"function": name, "file": filename, "line": line, "seconds": round(seconds, 6)}
+                for (name, filename, line), seconds in counter.most_common(top)
+            ]
+
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_at": self.started_at,
+            "duration": round(self.duration, 6),
+            "phases": {name: round(seconds, 6) for name, seconds in self.phases().items()},
+            "samples": len(self.samples),
+            "top_self": rows(own),
+            "top_total": rows(total),
+        }
+
+    def speedscope(self) -> dict:
+        """Samples in the speedscope file format (https://www.speedscope.app)"""
+        index: Dict[Frame, int] = {}
+        frames, samples, weights = [], [], []
+        for stack, weight in self.samples:
+            ids = []
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                ids.append(index[frame])
+            samples.append(ids)
+            weights.append(weight)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": f"{self.method} {self.path}",
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }],
+            "name": f"{self.method} {self.path} ({self.id})",
+            "exporter": "tcg-api",
+        }
+
+    def html(self) -> str:
+        summary = self.summary()
+        phase_rows = "".join(
+            f"<tr><td>{name}</td><td>{seconds * 1000:.2f} ms</td></tr>" for name, seconds in summary["phases"].items()
+        )
+
+        def table(rows: list) -> str:
+            body = "".join(
+                f"<tr><td>{r['seconds'] * 1000:.2f} ms</td><td>{html.escape(r['function'])}</td>"
+                f"<td>{html.escape(r['file'])}:{r['line']}</td></tr>"
+                for r in rows
+            )
+            return f"<table><tr><th>tempo</th><th>função</th><th>arquivo</th></tr>{body}</table>"
+
+        return (
+            "<!doctype html><html><head><meta charset='utf-8'>"
+            f"<title>Perfil {summary['id']}</title>"
+            "<style>body{font-family:sans-serif}td,th{padding:2px 8px;text-align:left}</style></head><body>"
+            f"<h1>{html.escape(summary['method'])} {html.escape(summary['path'])}</h1>"
+            f"<p>status {summary['status']} &middot; {summary['duration'] * 1000:.1f} ms &middot; "
+            f"{summary['samples']} amostras</p>"
+            f"<h2>Fases</h2><table>{phase_rows}</table>"
+            f"<h2>Tempo próprio</h2>{table(summary['top_self'])}"
+            f"<h2>Tempo total</h2>{table(summary['top_total'])}"
+            "</body></html>"
+        )
+
+
+class ProfileStore:
+    """Keeps the last ``max_profiles`` profiles in memory"""
+
+    def __init__(self, max_profiles: int = 50):
+        self.max_profiles = max_profiles
+        self._profiles: "OrderedDict[str, RequestProfile]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._profiles[profile.id] = profile
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def list(self) -> List[RequestProfile]:
+        with self._lock:
+            return list(reversed(self._profiles.values()))
+
+
+profile_store = ProfileStore()
+
+
+def _install_hooks() -> None:
+    """Timing hooks for the DB, response validation and serialization phases.
+
+    Installed only when profiling is configured; for requests that are not
+    being profiled each hook is a single context variable lookup.
+    """
+    global _hooks_installed
+    with _hooks_lock:
+        if _hooks_installed:
+            return
+        _hooks_installed = True
+
+    import fastapi.routing
+    from starlette.responses import JSONResponse
+
+    @event.listens_for(Engine, "before_cursor_execute")
+    def _before_cursor(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None:
+            conn.info.setdefault("profile_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(Engine, "after_cursor_execute")
+    def _after_cursor(conn, cursor, statement, parameters, context, executemany):
+        profile = _current.get()
+        starts = conn.info.get("profile_query_start")
+        if profile is not None and starts:
+            profile.add("db", time.perf_counter() - starts.pop())
+
+    # o FastAPI valida e codifica a resposta em serialize_response (jsonable_encoder dentro dela)
+    serialize_response = fastapi.routing.serialize_response
+    jsonable_encoder = fastapi.routing.jsonable_encoder
+    render = JSONResponse.render
+
+    @functools.wraps(serialize_response)
+    async def timed_serialize_response(*args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return await serialize_response(*args, **kwargs)
+        with profile.timed("serialize_response"):
+            return await serialize_response(*args, **kwargs)
+
+    @functools.wraps(jsonable_encoder)
+    def timed_jsonable_encoder(*args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return jsonable_encoder(*args, **kwargs)
+        with profile.timed("encode"):
+            return jsonable_encoder(*args, **kwargs)
+
+    @functools.wraps(render)
+    def timed_render(self, content):
+        profile = _current.get()
+        if profile is None:
+            return render(self, content)
+        with profile.timed("render"):
+            return render(self, content)
+
+    fastapi.routing.serialize_response = timed_serialize_response
+    fastapi.routing.jsonable_encoder = timed_jsonable_encoder
+    JSONResponse.render = timed_render
+
+
+def _instrument(call):
+    if asyncio.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def endpoint(**kwargs):
+            profile = _current.get()
+            if profile is None:
+                return await call(**kwargs)
+            with profile.timed("endpoint"):
+                return await call(**kwargs)
+    else:
+        @functools.wraps(call)
+        def endpoint(**kwargs):
+            profile = _current.get()
+            if profile is None:
+                return call(**kwargs)
+            # rotas síncronas rodam no threadpool; essa thread passa a ser amostrada
+            ident = threading.get_ident()
+            profile.watch_thread(ident)
+            try:
+                with profile.timed("endpoint"):
+                    return call(**kwargs)
+            finally:
+                profile.unwatch_thread(ident)
+    return endpoint
+
+
+def instrument_routes(app) -> None:
+    """Wrap every route endpoint so its time (and thread) is attributed to the request profile"""
+    from fastapi.routing import APIRoute
+
+    for route in app.routes:
+        if isinstance(route, APIRoute) and not getattr(route.dependant.call, "_profiled", False):
+            route.dependant.call = _instrument(route.dependant.call)
+            route.dependant.call._profiled = True
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles requests carrying the admin token header, or a random sample.
+
+    The profile id is returned in ``X-Profile-Id`` and the result can be
+    fetched from /profiles/{id}. Requests that are not profiled go straight
+    through.
+    """
+
+    HEADER = b"x-profile-token"
+
+    def __init__(
+        self,
+        app,
+        store: ProfileStore = profile_store,
+        token: str = "",
+        sample_rate: float = 0.0,
+        interval: float = 0.001,
+    ):
+        self.app = app
+        self.store = store
+        self.token = token.encode() if token else None
+        self.sample_rate = sample_rate
+        self.interval = interval
+        _install_hooks()
+
+    def _wants_profile(self, scope) -> bool:
+        if scope["path"].startswith("/profiles"):
+            return False
+        if self.token is not None:
+            for name, value in scope["headers"]:
+                if name == self.HEADER:
+                    return hmac.compare_digest(value, self.token)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wants_profile(scope):
+            return await self.app(scope, receive, send)
+
+        profile = RequestProfile(scope["method"], scope["path"], self.interval)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile.id.encode())]
+            await send(message)
+
+        reset = _current.set(profile)
+        ident = threading.get_ident()
+        profile.watch_thread(ident)
+        profile.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profile.unwatch_thread(ident)
+            profile.stop()
+            _current.reset(reset)
+            self.store.put(profile)
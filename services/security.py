@@ -0,0 +1,88 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import logging
+import os
+
+from services.process_pool import BoundedProcessPool
+from settings import Settings
+
+
+logger = logging.getLogger(__name__)
+
+# parâmetros do scrypt (~50ms por hash em uma CPU atual)
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SCRYPT_DKLEN = 32
+SALT_BYTES = 16
+HASH_PREFIX = "scrypt"
+
+# dimensionado pelo create_app a partir do Settings
+hashing_pool = BoundedProcessPool(
+    "password_hashing",
+    max_workers=Settings.hash_pool_workers,
+    max_queue=Settings.hash_pool_max_queue,
+)
+
+
+def _b64(raw: bytes) -> str:
+    return base64.b64encode(raw).decode("ascii")
+
+
+def hash_password(password: str, salt: bytes | None = None) -> str:
+    """Hash a password as ``scrypt$n$r$p$salt$digest``"""
+    salt = salt or os.urandom(SALT_BYTES)
+    digest = hashlib.scrypt(
+        password.encode("utf-8"), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, dklen=SCRYPT_DKLEN
+    )
+    return f"{HASH_PREFIX}${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(digest)}"
+
+
+def verify_password(password: str, hashed: str) -> bool:
+    """Check a password against a value produced by ``hash_password``.
+
+    A malformed or legacy value never matches (it is logged instead of raising).
+    """
+    try:
+        prefix, n, r, p, salt, digest = hashed.split("$")
+        if prefix != HASH_PREFIX:
+            raise ValueError(f"prefixo {prefix!r}")
+        expected = base64.b64decode(digest, validate=True)
+        candidate = hashlib.scrypt(
+            password.encode("utf-8"),
+            salt=base64.b64decode(salt, validate=True),
+            n=int(n),
+            r=int(r),
+            p=int(p),
+            dklen=len(expected),
+        )
+    except (ValueError, binascii.Error) as e:
+        # não loga o valor: pode ser uma senha antiga em texto puro
+        logger.warning("Hash de senha em formato inválido, tratado como senha errada: %s", e)
+        return False
+    return hmac.compare_digest(candidate, expected)
+
+
+def is_password_hash(value: str) -> bool:
+    return value.startswith(f"{HASH_PREFIX}$")
+
+
+# usado quando o email não existe, para o login levar o mesmo tempo nos dois casos;
+# é uma constante (sem rodar o scrypt), mas verificar contra ela custa o mesmo e nunca bate
+_DUMMY_HASH = (
+    f"{HASH_PREFIX}${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}"
+    f"${_b64(bytes(SALT_BYTES))}${_b64(bytes(SCRYPT_DKLEN))}"
+)
+
+
+async def hash_password_async(password: str) -> str:
+    return await hashing_pool.run(hash_password, password)
+
+
+async def verify_password_async(password: str, hashed: str | None) -> bool:
+    if hashed is None:
+        await hashing_pool.run(verify_password, password, _DUMMY_HASH)
+        return False
+    return await hashing_pool.run(verify_password, password, hashed)
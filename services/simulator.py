@@ -0,0 +1,187 @@
+import asyncio
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from math import comb, sqrt
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.metrics import registry
+from services.process_pool import BoundedProcessPool
+from settings import Settings
+
+
+# mãos sorteadas em blocos, para a matriz (mãos x grupos) caber folgada na memória
+CHUNK_TRIALS = 250_000
+
+# dimensionado pelo create_app a partir do Settings
+simulation_pool = BoundedProcessPool(
+    "simulation",
+    max_workers=Settings.simulation_pool_workers,
+    max_queue=Settings.simulation_pool_max_queue,
+)
+
+
+class SimulationError(ValueError):
+    pass
+
+
+def at_least_probability(population: int, successes: int, draws: int, at_least: int) -> float:
+    """Exact hypergeometric P(X >= at_least) when drawing ``draws`` of ``population`` cards"""
+    if at_least <= 0:
+        return 1.0
+    total = comb(population, draws)
+    below = sum(comb(successes, i) * comb(population - successes, draws - i) for i in range(min(at_least, draws + 1)))
+    return 1.0 - below / total
+
+
+def group_cards(cards: Sequence[Tuple[int, int, str]], conditions: Sequence[dict]) -> Tuple[np.ndarray, np.ndarray]:
+    """Collapse the deck into groups of cards that match the same conditions.
+
+    Returns the copies in each group and a (groups x conditions) 0/1 matrix;
+    the simulation only needs to know which group each drawn card comes from.
+    """
+    groups: Dict[Tuple[bool, ...], int] = {}
+    for card_id, qty, card_type in cards:
+        signature = tuple(
+            (c.get("card_id") is not None and c["card_id"] == card_id)
+            or (c.get("type") is not None and c["type"] == card_type)
+            for c in conditions
+        )
+        groups[signature] = groups.get(signature, 0) + qty
+    signatures = list(groups)
+    counts = np.array([groups[s] for s in signatures], dtype=np.int64)
+    membership = np.array(signatures, dtype=np.int64).reshape(len(signatures), len(conditions))
+    return counts, membership
+
+
+def simulate_chunk(
+    counts: np.ndarray, membership: np.ndarray, queries: List[dict], trials: int, seed: int
+) -> List[int]:
+    """Monte Carlo over ``trials`` hands; runs in a worker process.
+
+    Each hand only needs how many cards of each group it holds, which is one
+    multivariate hypergeometric sample: numpy draws all the hands of a chunk
+    in a single call, and one matrix product turns group counts into hits
+    per condition. Returns how many hands satisfied each query.
+    """
+    rng = np.random.default_rng(seed)
+    by_seen: Dict[int, List[int]] = {}
+    for i, query in enumerate(queries):
+        by_seen.setdefault(query["cards_seen"], []).append(i)
+    successes = [0] * len(queries)
+
+    for start in range(0, trials, CHUNK_TRIALS):
+        size = min(CHUNK_TRIALS, trials - start)
+        for seen, indices in by_seen.items():
+            hands = rng.multivariate_hypergeometric(counts, seen, size=size, method="count")
+            hits = hands @ membership
+            for i in indices:
+                query = queries[i]
+                met = hits[:, query["conditions"]] >= np.array(query["at_least"])
+                successes[i] += int(met.all(axis=1).sum())
+    return successes
+
+
+class SimulationCache:
+    """LRU of simulation results keyed by deck contents and request"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = registry.counter("simulation_cache_hits_total", "Simulations answered from the cache")
+        self._misses = registry.counter("simulation_cache_misses_total", "Simulations computed")
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self._misses.inc()
+                return None
+            self._entries.move_to_end(key)
+            self._hits.inc()
+            return value
+
+    def put(self, key: str, value: dict) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+simulation_cache = SimulationCache(max_entries=Settings.simulation_cache_size)
+
+
+def cache_key(cards: Sequence[Tuple[int, int, str]], request: dict) -> str:
+    """Same deck contents (the deck "version") and same request give the same key"""
+    payload = json.dumps({"cards": sorted(cards), "request": request}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+async def simulate(
+    cards: Sequence[Tuple[int, int, str]],
+    hand_size: int,
+    queries: List[dict],
+    trials: int,
+    parallel_min_trials: int = Settings.simulation_parallel_min_trials,
+) -> dict:
+    """Probabilities for each query over a deck of ``(card_id, qty, type)``.
+
+    A query is ``{"turn": t, "conditions": [{"card_id" | "type", "at_least"}]}``
+    and succeeds when every condition holds in the first ``hand_size + turn``
+    cards. Single-condition queries are answered exactly (hypergeometric);
+    compound ones by Monte Carlo, split across the process pool from
+    ``parallel_min_trials`` trials on.
+    """
+    deck_size = sum(qty for _, qty, _ in cards)
+    conditions: List[dict] = []
+    prepared = []
+    for query in queries:
+        seen = hand_size + query["turn"]
+        if seen > deck_size:
+            raise SimulationError(f"O deck tem só {deck_size} cartas; não dá para ver {seen}")
+        columns, at_least = [], []
+        for condition in query["conditions"]:
+            key = {"card_id": condition.get("card_id"), "type": condition.get("type")}
+            if key not in conditions:
+                conditions.append(key)
+            columns.append(conditions.index(key))
+            at_least.append(condition["at_least"])
+        prepared.append({"cards_seen": seen, "conditions": columns, "at_least": at_least})
+
+    counts, membership = group_cards(cards, conditions)
+    results: List[Optional[dict]] = [None] * len(prepared)
+    simulated = []
+    for i, query in enumerate(prepared):
+        if len(query["conditions"]) == 1:
+            column = query["conditions"][0]
+            successes = int(counts[membership[:, column] == 1].sum())
+            probability = at_least_probability(deck_size, successes, query["cards_seen"], query["at_least"][0])
+            results[i] = {"probability": probability, "method": "exact", "cards_seen": query["cards_seen"]}
+        else:
+            simulated.append(i)
+
+    if simulated:
+        batch = [prepared[i] for i in simulated]
+        workers = max(simulation_pool.max_workers, 1)
+        parts = workers if trials >= parallel_min_trials else 1
+        sizes = [trials // parts + (1 if p < trials % parts else 0) for p in range(parts)]
+        seeds = np.random.SeedSequence().generate_state(parts).tolist()
+        outcomes = await asyncio.gather(*[
+            simulation_pool.run(simulate_chunk, counts, membership, batch, size, seed)
+            for size, seed in zip(sizes, seeds)
+        ])
+        for j, i in enumerate(simulated):
+            probability = sum(outcome[j] for outcome in outcomes) / trials
+            results[i] = {
+                "probability": probability,
+                "method": "monte_carlo",
+                "cards_seen": prepared[i]["cards_seen"],
+                "stderr": sqrt(probability * (1 - probability) / trials),
+            }
+
+    return {"deck_size": deck_size, "results": results}
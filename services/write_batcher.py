@@ -0,0 +1,156 @@
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+from sqlmodel import Session
+
+import database
+from services.metrics import registry
+from settings import Settings
+
+
+logger = logging.getLogger(__name__)
+
+WriteOp = Callable[[Session], Any]
+
+
+class WriteBatcher:
+    """Group commit for small, frequent writes.
+
+    Each op receives a session, does its reads/validation and mutations and
+    returns its result without committing. Ops queued within ``window``
+    seconds (or until ``max_batch`` ops) run in the same transaction and share
+    one commit. Each op runs inside its own SAVEPOINT, so an op that raises
+    (even after writing, e.g. a unique violation) only rolls back and fails
+    its own caller; if the commit fails, the batch is rolled back and its ops
+    are re-run one transaction each, so every caller still gets its own result
+    or error.
+    """
+
+    def __init__(self, enabled: bool, window: float, max_batch: int):
+        self.enabled = enabled
+        self.window = window
+        self.max_batch = max(max_batch, 1)
+        self._queue: "queue.Queue[Optional[Tuple[WriteOp, Future]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._commit_times: deque = deque(maxlen=10_000)
+
+        self._batch_size = registry.histogram(
+            "write_batch_size", "Ops committed per transaction", buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+        )
+        self._commit_seconds = registry.histogram("write_batch_commit_seconds", "Time to run and commit a batch")
+        self._commits = registry.counter("write_batch_commits_total", "Transactions committed by the batcher")
+        self._fallbacks = registry.counter("write_batch_fallbacks_total", "Batches re-run op by op after a failure")
+        registry.gauge("write_batch_commits_per_second", "Commits in the last second", fn=self._commits_last_second)
+        registry.gauge("write_batch_queue_depth", "Ops waiting for the next batch", fn=lambda: self._queue.qsize())
+
+    def submit(self, op: WriteOp) -> Any:
+        """Run ``op`` in the next batch and block until its transaction is committed"""
+        if not self.enabled:
+            return self._run_alone(op)
+
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((op, future))
+        return future.result()
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="write-batcher", daemon=True)
+                self._thread.start()
+
+    def stop(self) -> None:
+        """Commit what is already queued and stop the worker thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout=10)
+
+    def _loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.window
+            stopping = False
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._run_batch(batch)
+            if stopping:
+                return
+
+    def _run_batch(self, batch: List[Tuple[WriteOp, Future]]) -> None:
+        results: List[Tuple[Future, Any, Optional[BaseException]]] = []
+        started = time.perf_counter()
+        try:
+            # expire_on_commit=False: os objetos retornados continuam legíveis depois do commit
+            with Session(database.get_engine(), expire_on_commit=False) as session:
+                for op, future in batch:
+                    try:
+                        # o savepoint desfaz só esta op; no Postgres a transação do lote continua válida
+                        with session.begin_nested():
+                            value = op(session)
+                    except Exception as e:
+                        results.append((future, None, e))
+                        continue
+                    results.append((future, value, None))
+                session.commit()
+        except Exception as e:
+            self._fallbacks.inc()
+            logger.warning("Lote de %d escritas falhou (%s), repetindo uma a uma", len(batch), e)
+            for op, future in batch:
+                try:
+                    future.set_result(self._run_alone(op))
+                except Exception as op_error:
+                    future.set_exception(op_error)
+            return
+
+        self._record_commit(len(batch), time.perf_counter() - started)
+        for future, value, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(value)
+
+    def _run_alone(self, op: WriteOp) -> Any:
+        started = time.perf_counter()
+        with Session(database.get_engine(), expire_on_commit=False) as session:
+            value = op(session)
+            session.commit()
+        self._record_commit(1, time.perf_counter() - started)
+        return value
+
+    def _record_commit(self, size: int, seconds: float) -> None:
+        self._commits.inc()
+        self._batch_size.observe(size)
+        self._commit_seconds.observe(seconds)
+        self._commit_times.append(time.monotonic())
+
+    def _commits_last_second(self) -> int:
+        cutoff = time.monotonic() - 1
+        return sum(1 for t in list(self._commit_times) if t >= cutoff)
+
+
+# ligado e dimensionado pelo create_app a partir do Settings
+write_batcher = WriteBatcher(
+    enabled=Settings.write_batching,
+    window=Settings.write_batch_window_ms / 1000,
+    max_batch=Settings.write_batch_max_ops,
+)
@@ -0,0 +1,182 @@
+import os
+from dataclasses import dataclass, field
+from typing import List, Optional
+from dotenv import load_dotenv
+
+
+def _bool(value: str) -> bool:
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _list(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+@dataclass
+class Settings:
+    """Application configuration, read from the environment (and .env) by ``from_env``"""
+
+    database_url: Optional[str] = None
+    database_replica_urls: List[str] = field(default_factory=list)
+    database_replica_strategy: str = "round_robin"
+    database_replica_cooldown: float = 30.0
+    read_your_writes_seconds: float = 5.0
+
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    # conexões abertas no startup, antes de aceitar requisições
+    db_prewarm_connections: int = 0
+    # SQL compilado guardado por engine (padrão do SQLAlchemy); 0 desliga a cache
+    db_query_cache_size: int = 500
+    sql_echo: bool = True
+
+    # "performance": WAL, pragmas ajustados, um único writer e leitores somente leitura
+    sqlite_profile: str = "default"
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_cache_size: int = -64000
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_write_queue_timeout: float = 30.0
+
+    # threads para rotas síncronas; 0 = db_pool_size + db_max_overflow (uma conexão por thread)
+    threadpool_size: int = 0
+    request_max_queue: int = 100
+    request_queue_timeout: float = 5.0
+
+    # processos para o scrypt; 0 roda o hash no threadpool
+    hash_pool_workers: int = os.cpu_count() or 1
+    hash_pool_max_queue: int = 64
+
+    catalog_snapshot_debounce: float = 1.0
+    # diretório compartilhado entre os workers: snapshots em disco e ponteiro CURRENT para o mais novo
+    catalog_snapshot_dir: str = ""
+
+    # 0 desliga; atrás de um proxy todos chegam com o mesmo IP, então configure
+    # rate_limit_key_header (chave de API ou usuário autenticado repassado pelo gateway)
+    rate_limit_per_second: float = 0.0
+    rate_limit_burst: float = 40.0
+    rate_limit_key_header: str = ""
+    stats_max_concurrency: int = 4
+    stats_max_queue: int = 16
+    stats_queue_timeout: float = 2.0
+    search_max_concurrency: int = 8
+    search_max_queue: int = 32
+    search_queue_timeout: float = 2.0
+
+    stats_cache_ttl: float = 5.0
+    stats_cache_stale_ttl: float = 30.0
+    # 0 desliga o cache (só junta requisições simultâneas do mesmo usuário)
+    user_summary_cache_ttl: float = 0.0
+    user_summary_cache_max_entries: int = 10000
+
+    job_workers: int = 2
+    job_max_pending: int = 100
+    # no shutdown, quanto esperar os jobs em andamento antes de interrompê-los
+    job_drain_timeout: float = 30.0
+    # depois de interrompido, quanto esperar um job que não para antes de abandoná-lo
+    job_interrupt_timeout: float = 10.0
+    # job "running" sem heartbeat há mais que isso é de um worker que morreu e volta para a fila
+    job_lease_seconds: float = 60.0
+
+    # junta escritas de requisições simultâneas em um único commit
+    write_batching: bool = False
+    write_batch_window_ms: float = 5.0
+    write_batch_max_ops: int = 64
+
+    # acima disso o índice em memória se desliga e o autocomplete vai ao banco
+    autocomplete_max_entries: int = 2_000_000
+    # de quanto em quanto tempo procurar no change log cartas alteradas por outros workers; 0 desliga
+    autocomplete_reload_seconds: float = 60.0
+
+    popularity_top_k: int = 100
+    popularity_resync_seconds: float = 300.0
+    # sob escrita contínua, o ranking de cada formato é refeito no máximo uma vez nesse intervalo
+    popularity_refresh_seconds: float = 1.0
+
+    card_columns_debounce: float = 1.0
+    # diretório compartilhado: os workers mapeiam os mesmos arquivos em vez de cada um ter sua cópia
+    card_columns_dir: str = ""
+    # sem card_columns_dir: de quanto em quanto tempo procurar no change log escritas de outros workers; 0 desliga
+    card_columns_check_seconds: float = 5.0
+
+    # processos para o Monte Carlo do /decks/{id}/simulate
+    simulation_pool_workers: int = os.cpu_count() or 1
+    simulation_pool_max_queue: int = 32
+    # abaixo disso a simulação roda inteira num worker; acima, é dividida entre eles
+    simulation_parallel_min_trials: int = 500_000
+    simulation_cache_size: int = 1000
+
+    # perfilamento sob demanda: header X-Profile-Token com esse valor, ou uma amostra aleatória
+    profile_token: str = ""
+    profile_sample_rate: float = 0.0
+    profile_interval_ms: float = 1.0
+    profile_store_size: int = 50
+
+    @property
+    def worker_threads(self) -> int:
+        return self.threadpool_size or self.db_pool_size + self.db_max_overflow
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        load_dotenv()
+        env = os.environ
+        return cls(
+            database_url=env.get("DATABASE_URL"),
+            database_replica_urls=_list(env.get("DATABASE_REPLICA_URLS", "")),
+            database_replica_strategy=env.get("DATABASE_REPLICA_STRATEGY", "round_robin"),
+            database_replica_cooldown=float(env.get("DATABASE_REPLICA_COOLDOWN", "30")),
+            read_your_writes_seconds=float(env.get("READ_YOUR_WRITES_SECONDS", "5")),
+            db_pool_size=int(env.get("DB_POOL_SIZE", "5")),
+            db_max_overflow=int(env.get("DB_MAX_OVERFLOW", "10")),
+            db_prewarm_connections=int(env.get("DB_PREWARM_CONNECTIONS", "0")),
+            db_query_cache_size=int(env.get("DB_QUERY_CACHE_SIZE", "500")),
+            sql_echo=_bool(env.get("SQL_ECHO", "1")),
+            sqlite_profile=env.get("SQLITE_PROFILE", "default"),
+            sqlite_mmap_size=int(env.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+            sqlite_cache_size=int(env.get("SQLITE_CACHE_SIZE", "-64000")),
+            sqlite_busy_timeout_ms=int(env.get("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+            sqlite_write_queue_timeout=float(env.get("SQLITE_WRITE_QUEUE_TIMEOUT", "30")),
+            threadpool_size=int(env.get("THREADPOOL_SIZE", "0")),
+            request_max_queue=int(env.get("REQUEST_MAX_QUEUE", "100")),
+            request_queue_timeout=float(env.get("REQUEST_QUEUE_TIMEOUT", "5")),
+            hash_pool_workers=int(env.get("HASH_POOL_WORKERS", str(os.cpu_count() or 1))),
+            hash_pool_max_queue=int(env.get("HASH_POOL_MAX_QUEUE", "64")),
+            catalog_snapshot_debounce=float(env.get("CATALOG_SNAPSHOT_DEBOUNCE", "1.0")),
+            catalog_snapshot_dir=env.get("CATALOG_SNAPSHOT_DIR", ""),
+            rate_limit_per_second=float(env.get("RATE_LIMIT_PER_SECOND", "0")),
+            rate_limit_burst=float(env.get("RATE_LIMIT_BURST", "40")),
+            rate_limit_key_header=env.get("RATE_LIMIT_KEY_HEADER", ""),
+            stats_max_concurrency=int(env.get("STATS_MAX_CONCURRENCY", "4")),
+            stats_max_queue=int(env.get("STATS_MAX_QUEUE", "16")),
+            stats_queue_timeout=float(env.get("STATS_QUEUE_TIMEOUT", "2")),
+            search_max_concurrency=int(env.get("SEARCH_MAX_CONCURRENCY", "8")),
+            search_max_queue=int(env.get("SEARCH_MAX_QUEUE", "32")),
+            search_queue_timeout=float(env.get("SEARCH_QUEUE_TIMEOUT", "2")),
+            stats_cache_ttl=float(env.get("STATS_CACHE_TTL", "5")),
+            stats_cache_stale_ttl=float(env.get("STATS_CACHE_STALE_TTL", "30")),
+            user_summary_cache_ttl=float(env.get("USER_SUMMARY_CACHE_TTL", "0")),
+            user_summary_cache_max_entries=int(env.get("USER_SUMMARY_CACHE_MAX_ENTRIES", "10000")),
+            job_workers=int(env.get("JOB_WORKERS", "2")),
+            job_max_pending=int(env.get("JOB_MAX_PENDING", "100")),
+            job_drain_timeout=float(env.get("JOB_DRAIN_TIMEOUT", "30")),
+            job_interrupt_timeout=float(env.get("JOB_INTERRUPT_TIMEOUT", "10")),
+            job_lease_seconds=float(env.get("JOB_LEASE_SECONDS", "60")),
+            write_batching=_bool(env.get("WRITE_BATCHING", "0")),
+            write_batch_window_ms=float(env.get("WRITE_BATCH_WINDOW_MS", "5")),
+            write_batch_max_ops=int(env.get("WRITE_BATCH_MAX_OPS", "64")),
+            autocomplete_max_entries=int(env.get("AUTOCOMPLETE_MAX_ENTRIES", "2000000")),
+            autocomplete_reload_seconds=float(env.get("AUTOCOMPLETE_RELOAD_SECONDS", "60")),
+            popularity_top_k=int(env.get("POPULARITY_TOP_K", "100")),
+            popularity_resync_seconds=float(env.get("POPULARITY_RESYNC_SECONDS", "300")),
+            popularity_refresh_seconds=float(env.get("POPULARITY_REFRESH_SECONDS", "1")),
+            card_columns_debounce=float(env.get("CARD_COLUMNS_DEBOUNCE", "1.0")),
+            card_columns_dir=env.get("CARD_COLUMNS_DIR", ""),
+            card_columns_check_seconds=float(env.get("CARD_COLUMNS_CHECK_SECONDS", "5")),
+            simulation_pool_workers=int(env.get("SIMULATION_POOL_WORKERS", str(os.cpu_count() or 1))),
+            simulation_pool_max_queue=int(env.get("SIMULATION_POOL_MAX_QUEUE", "32")),
+            simulation_parallel_min_trials=int(env.get("SIMULATION_PARALLEL_MIN_TRIALS", "500000")),
+            simulation_cache_size=int(env.get("SIMULATION_CACHE_SIZE", "1000")),
+            profile_token=env.get("PROFILE_TOKEN", ""),
+            profile_sample_rate=float(env.get("PROFILE_SAMPLE_RATE", "0")),
+            profile_interval_ms=float(env.get("PROFILE_INTERVAL_MS", "1")),
+            profile_store_size=int(env.get("PROFILE_STORE_SIZE", "50")),
+        )